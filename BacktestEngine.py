@@ -0,0 +1,156 @@
+# BacktestEngine.py
+
+"""
+BacktestEngine.py
+
+A vectorized backtest over NumPy arrays. Signals decided at a bar's close are
+held from the next bar on, each change of position pays commission on the
+traded fraction of equity, and the equity curve compounds the per-bar
+returns of long (+1), short (-1) or flat (0) positions sized as a fraction of
+equity. There is no Python loop over bars, so decades of daily bars run in
+milliseconds.
+"""
+
+import numpy as np
+import pandas as pd
+
+LONG = 1
+SHORT = -1
+FLAT = 0
+
+# the model's classes: buy (0), sell (1) or hold (2)
+SIGNAL_BUY = 0
+SIGNAL_SELL = 1
+SIGNAL_HOLD = 2
+
+
+def positions_from_signals(signals, allow_short: bool = True) -> np.ndarray:
+    """
+    Turn model classes into target positions: buy goes long, sell goes short (or flat if shorting is
+    not allowed) and hold keeps the previous position. Bars before the first buy or sell are flat.
+
+    Parameters:
+    signals (array-like): One class per bar, SIGNAL_BUY, SIGNAL_SELL or SIGNAL_HOLD.
+    allow_short (bool): Whether a sell opens a short position.
+
+    Returns:
+    numpy.ndarray: int8 target positions, LONG, SHORT or FLAT.
+    """
+    signals = np.asarray(signals)
+    targets = np.where(signals == SIGNAL_BUY, LONG, np.where(signals == SIGNAL_SELL, SHORT if allow_short else FLAT,
+                                                             FLAT)).astype("int8")
+    decided = signals != SIGNAL_HOLD
+    # carry the last decided position forward over hold bars
+    last_decided = np.maximum.accumulate(np.where(decided, np.arange(len(signals)), -1))
+    return np.where(last_decided >= 0, targets[np.maximum(last_decided, 0)], FLAT).astype("int8")
+
+
+class BacktestResult:
+    """The outcome of a backtest: per-bar arrays and the list of trades."""
+
+    def __init__(self, equity, returns, positions, targets, costs, trades, dates=None):
+        self.equity = equity  # account value at each bar's close
+        self.returns = returns  # the strategy's return over each bar, after commission
+        self.positions = positions  # the position held over each bar
+        self.targets = targets  # the position decided at each bar's close
+        self.costs = costs  # commission paid at each bar, as a fraction of equity
+        self.trades = trades  # a DataFrame with one row per trade
+        self.dates = dates
+
+    def to_frame(self) -> pd.DataFrame:
+        """The per-bar arrays as a DataFrame, indexed by date when dates were given."""
+        return pd.DataFrame({"equity": self.equity, "returns": self.returns, "position": self.positions,
+                             "target": self.targets, "cost": self.costs}, index=self.dates)
+
+
+def run_backtest(close, targets, initial_capital: float = 100000.0, commission: float = 0.001,
+                 position_size: float = 1.0, dates=None) -> BacktestResult:
+    """
+    Backtest target positions over a price series.
+
+    Parameters:
+    close (array-like): The close price of every bar.
+    targets (array-like): The position decided at each bar's close (LONG, SHORT or FLAT), held from the
+        next bar on; see positions_from_signals.
+    initial_capital (float): The starting account value.
+    commission (float): The commission rate on the traded value; going from long to short trades twice the
+        position size.
+    position_size (float): The fraction of equity a position takes.
+    dates (array-like): Optional bar dates, used in the trade list and to_frame().
+
+    Returns:
+    BacktestResult: The equity curve, returns, positions, commission per bar and trades.
+
+    Raises:
+    ValueError: If close and targets differ in length.
+    """
+    close = np.asarray(close, dtype="float64")
+    targets = np.asarray(targets, dtype="int8")
+    if len(close) != len(targets):
+        raise ValueError(f"Expected one target per bar, got {len(targets)} for {len(close)} bars")
+    n = len(close)
+
+    # hold yesterday's decision over today's bar, so a signal never trades on its own bar's return
+    positions = np.zeros(n, dtype="int8")
+    positions[1:] = targets[:-1]
+    bar_returns = np.zeros(n)
+    if n > 1:
+        bar_returns[1:] = close[1:] / close[:-1] - 1.0
+
+    # commission is paid when the target changes, on the fraction of equity traded
+    turnover = np.abs(np.diff(targets.astype("float64"), prepend=0.0)) * position_size
+    costs = turnover * commission
+    returns = positions * position_size * bar_returns - costs
+    equity = initial_capital * np.cumprod(1.0 + returns)
+
+    return BacktestResult(equity, returns, positions, targets, costs,
+                          trade_list(close, targets, position_size, commission, dates), dates)
+
+
+def trade_list(close, targets, position_size: float = 1.0, commission: float = 0.001, dates=None) -> pd.DataFrame:
+    """
+    List every run of a constant, non-flat target position as a trade.
+
+    Returns:
+    pandas.DataFrame: entry and exit bar index (and date), direction, entry and exit price, the price
+    return in the trade's direction, the return on equity of the sized position net of its entry and
+    exit commission, and whether the trade is still open at the last bar.
+    """
+    close = np.asarray(close, dtype="float64")
+    targets = np.asarray(targets, dtype="int8")
+    n = len(targets)
+    changes = np.flatnonzero(np.diff(targets, prepend=FLAT))
+    starts = changes[targets[changes] != FLAT]
+    # a trade is decided at one close, held over the following bars and closed at the next change of target,
+    # or is still open at the last bar
+    next_change = np.searchsorted(changes, starts, side="right")
+    is_open = next_change >= len(changes)
+    exits = np.where(is_open, n - 1, changes[np.minimum(next_change, len(changes) - 1)])
+
+    direction = targets[starts].astype("int64")
+    entry_price = close[starts]
+    exit_price = close[exits]
+    # compound the position's bar returns between entry and exit, from one running product over all bars
+    bar_returns = np.zeros(n)
+    bar_returns[1:] = close[1:] / close[:-1] - 1.0
+    held = np.zeros(n)
+    held[1:] = targets[:-1]
+    growth = np.cumprod(1.0 + held * position_size * bar_returns)
+    fee = 1.0 - commission * position_size
+    net_return = growth[exits] / growth[starts] * fee ** np.where(is_open, 1, 2) - 1.0
+
+    trades = pd.DataFrame({
+        "entry_index": starts,
+        "exit_index": exits,
+        "direction": direction,
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "price_return": direction * (exit_price / entry_price - 1.0),
+        "net_return": net_return,
+        "open": is_open,
+    })
+    if dates is not None:
+        dates = np.asarray(dates)
+        trades.insert(1, "entry_date", dates[starts])
+        trades.insert(3, "exit_date", dates[exits])
+    return trades
@@ -0,0 +1,332 @@
+# BackupManager.py
+
+"""
+BackupManager.py
+
+Incremental, parallel and compressed backups of a MongoDB database. Each
+backup writes one gzip-compressed BSON file per collection and a manifest
+with document counts, SHA-256 checksums and the per-collection high-water
+mark. Incremental backups export the documents past the previous mark, and
+restores replay the last full backup followed by its incrementals. ObjectIds
+and timestamps from concurrent writers do not arrive in order, so each
+incremental re-reads an overlap window behind the mark and skips the
+documents the previous backup already exported from that window. Backups of
+one database run one at a time within the process, whichever BackupManager
+starts them, so they never race on its state file.
+
+    <backup_path>/<database>/<backup_id>/manifest.json
+    <backup_path>/<database>/<backup_id>/<collection>.bson.gz
+    <backup_path>/<database>/state.json
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import bson
+from bson import ObjectId, json_util
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+STATE_FILE = "state.json"
+
+# one lock per backed-up database directory, shared by every BackupManager of the process
+_database_locks = {}
+_database_locks_lock = threading.Lock()
+
+
+def database_lock(database_path: str) -> threading.Lock:
+    """The lock serializing the backups written to one database directory."""
+    with _database_locks_lock:
+        return _database_locks.setdefault(os.path.abspath(database_path), threading.Lock())
+
+
+class BackupError(Exception):
+    """An exception raised when a backup cannot be written, verified or restored."""
+
+    def __init__(self, message: str, backup_id: Optional[str] = None) -> None:
+        """Initialize the exception with a message and the backup it refers to."""
+        super().__init__(message)
+        self.backup_id = backup_id
+
+
+class BackupManager:
+    """Writes and restores collection-level backups of one database."""
+
+    def __init__(self, db, backup_path: str = "database_backup", high_water_fields: Optional[Dict[str, str]] = None,
+                 max_workers: int = 4, batch_size: int = 1000, compress_level: int = 6,
+                 overlap: float = 300.0, max_recent_ids: int = 10000) -> None:
+        """
+        Parameters:
+        db (pymongo.database.Database): The database to back up.
+        backup_path (str): The directory holding backups, one sub-directory per database.
+        high_water_fields (dict): Per-collection field that grows as documents are inserted; it is indexed.
+            Collections default to "_id", so incremental backups capture inserts but not in-place updates.
+        max_workers (int): The number of collections exported or restored in parallel.
+        batch_size (int): The cursor batch size when exporting and the bulk size when restoring.
+        compress_level (int): The gzip compression level.
+        overlap (float): Seconds behind the high-water mark re-read by every incremental backup, covering
+            writers whose ObjectIds or timestamps land out of order. Marks that are neither an ObjectId
+            nor a datetime, e.g. an ingest sequence number, must be strictly increasing and are not re-read.
+        max_recent_ids (int): The most ids per collection kept in the state file to skip in the next overlap
+            window. When a bulk load puts more documents in the window, the oldest of them are exported
+            again by the next backup; restores upsert by _id, so this only costs space.
+        """
+        self.db = db
+        self.database_path = os.path.join(backup_path, db.name)
+        self.high_water_fields = high_water_fields or {}
+        self.overlap = timedelta(seconds=overlap)
+        self.max_recent_ids = max_recent_ids
+        self.lock = database_lock(self.database_path)
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.compress_level = compress_level
+        # background backups run on one thread; the database lock also serializes them with backups started
+        # by other BackupManagers of the same database
+        self.background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+        os.makedirs(self.database_path, exist_ok=True)
+        # incremental exports range over and sort on the high-water fields
+        for name, field in self.high_water_fields.items():
+            if field != "_id":
+                self.db[name].create_index(field)
+
+    def backup(self, incremental: bool = True, collections: Optional[List[str]] = None) -> dict:
+        """
+        Export collections in parallel into a new backup.
+
+        Parameters:
+        incremental (bool): Only export documents past the last backup's high-water mark.
+            The first backup of a database is always a full backup.
+        collections (list[str]): The collections to export. If None, export all of them.
+
+        Returns:
+        dict: The backup manifest.
+        """
+        with self.lock:
+            return self._backup(incremental, collections)
+
+    def _backup(self, incremental, collections):
+        state = self._read_state()
+        incremental = incremental and state.get("last_backup") is not None
+        backup_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        backup_dir = os.path.join(self.database_path, backup_id)
+        os.makedirs(backup_dir)
+
+        if collections is None:
+            collections = [name for name in self.db.list_collection_names() if not name.startswith("system.")]
+        marks = state.get("high_water_marks", {}) if incremental else {}
+        recent_ids = state.get("recent_ids", {}) if incremental else {}
+
+        start = time.perf_counter()
+        exported = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._export_collection, backup_dir, name, marks.get(name),
+                                       recent_ids.get(name, [])): name
+                       for name in collections}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    exported[name], recent_ids[name] = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to back up collection {name} of {self.db.name}. Error: {e}")
+                    raise BackupError(f"Failed to back up collection {name}: {e}", backup_id) from e
+
+        manifest = {
+            "backup_id": backup_id,
+            "database": self.db.name,
+            "incremental": incremental,
+            "parent": state.get("last_backup") if incremental else None,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "collections": exported,
+        }
+        with open(os.path.join(backup_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        # the new marks are only recorded once every file and the manifest are on disk
+        new_marks = dict(state.get("high_water_marks", {})) if incremental else {}
+        for name, entry in exported.items():
+            if entry["high_water_mark"] is not None:
+                new_marks[name] = entry["high_water_mark"]
+        self._write_state({"last_backup": backup_id, "high_water_marks": new_marks, "recent_ids": recent_ids})
+
+        documents = sum(entry["documents"] for entry in exported.values())
+        logger.info(f"{'Incremental' if incremental else 'Full'} backup {backup_id} of {self.db.name}: "
+                    f"{documents} document(s) from {len(exported)} collection(s) "
+                    f"({time.perf_counter() - start:.3f}s)")
+        return manifest
+
+    def backup_in_background(self, incremental: bool = True, collections: Optional[List[str]] = None):
+        """Start a backup without blocking the caller and return its Future."""
+        return self.background.submit(self.backup, incremental, collections)
+
+    def verify(self, backup_id: str) -> bool:
+        """
+        Check every file of a backup against the checksums in its manifest.
+
+        Raises:
+        BackupError: If a file is missing or its checksum does not match.
+        """
+        manifest = self._read_manifest(backup_id)
+        backup_dir = os.path.join(self.database_path, backup_id)
+        for name, entry in manifest["collections"].items():
+            path = os.path.join(backup_dir, entry["file"])
+            if not os.path.exists(path):
+                raise BackupError(f"Backup file for {name} is missing", backup_id)
+            if self._checksum(path) != entry["sha256"]:
+                raise BackupError(f"Checksum mismatch for {name}", backup_id)
+        return True
+
+    def list_backups(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.database_path)
+                      if os.path.exists(os.path.join(self.database_path, name, MANIFEST_FILE)))
+
+    def restore(self, backup_id: Optional[str] = None) -> int:
+        """
+        Restore the database to a backup: its full base backup followed by every incremental up to it.
+        Documents are upserted by _id, so restoring over existing data is safe to repeat.
+
+        Parameters:
+        backup_id (str): The backup to restore to. If None, restore the latest backup.
+
+        Returns:
+        int: The number of documents restored.
+        """
+        chain = self._restore_chain(backup_id)
+        for manifest in chain:
+            self.verify(manifest["backup_id"])
+
+        restored = 0
+        for manifest in chain:
+            backup_dir = os.path.join(self.database_path, manifest["backup_id"])
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(self._restore_collection, os.path.join(backup_dir, entry["file"]), name)
+                           for name, entry in manifest["collections"].items()]
+                restored += sum(future.result() for future in futures)
+        logger.info(f"Restored {restored} document(s) into {self.db.name} from {len(chain)} backup(s)")
+        return restored
+
+    def _export_collection(self, backup_dir, name, high_water_mark, recent_ids):
+        field = self.high_water_fields.get(name, "_id")
+        mark = self._comparable(json_util.loads(high_water_mark)) if high_water_mark is not None else None
+        query = {}
+        if mark is not None:
+            # re-read the overlap window behind the mark; the documents exported from it last time are skipped
+            window_start = self._window_start(mark)
+            query[field] = {"$gte": window_start} if window_start is not None else {"$gt": mark}
+        exported_ids = set(recent_ids)
+
+        start = time.perf_counter()
+        path = os.path.join(backup_dir, f"{name}.bson.gz")
+        documents = 0
+        # (value, _id) of the newest documents inside the overlap window behind the newest value seen
+        recent = deque(maxlen=self.max_recent_ids)
+        cursor = self.db[name].find(query).sort(field, 1).batch_size(self.batch_size)
+        with gzip.open(path, "wb", compresslevel=self.compress_level) as f:
+            for document in cursor:
+                document_id = json_util.dumps(document["_id"])
+                if document_id not in exported_ids:
+                    f.write(bson.encode(document))
+                    documents += 1
+                value = self._comparable(document.get(field))
+                if value is None:
+                    continue
+                mark = value if mark is None else max(mark, value)
+                window_start = self._window_start(mark)
+                if window_start is not None:
+                    recent.append((value, document_id))
+                    while recent and recent[0][0] < window_start:
+                        recent.popleft()
+
+        entry = {
+            "file": os.path.basename(path),
+            "documents": documents,
+            "sha256": self._checksum(path),
+            "high_water_field": field,
+            "high_water_mark": json_util.dumps(mark) if mark is not None else None,
+            "seconds": time.perf_counter() - start,
+        }
+        return entry, [document_id for _, document_id in recent]
+
+    def _comparable(self, value):
+        # marks read back from the state file are timezone-aware, stored datetimes usually are not
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def _window_start(self, mark):
+        # the lowest value re-read behind a mark, or None for marks that are strictly increasing
+        if isinstance(mark, ObjectId):
+            return ObjectId.from_datetime(mark.generation_time - self.overlap)
+        if isinstance(mark, datetime):
+            return mark - self.overlap
+        return None
+
+    def _restore_collection(self, path, name):
+        collection = self.db[name]
+        restored = 0
+        batch = []
+        with gzip.open(path, "rb") as f:
+            for document in bson.decode_file_iter(f):
+                batch.append(ReplaceOne({"_id": document["_id"]}, document, upsert=True))
+                if len(batch) == self.batch_size:
+                    collection.bulk_write(batch, ordered=False)
+                    restored += len(batch)
+                    batch = []
+        if batch:
+            collection.bulk_write(batch, ordered=False)
+            restored += len(batch)
+        return restored
+
+    def _restore_chain(self, backup_id):
+        backups = self.list_backups()
+        if not backups:
+            raise BackupError(f"No backups found for {self.db.name} in {self.database_path}")
+        backup_id = backups[-1] if backup_id is None else backup_id
+        if backup_id not in backups:
+            raise BackupError(f"Backup {backup_id} not found", backup_id)
+
+        chain = []
+        current = backup_id
+        while current is not None:
+            manifest = self._read_manifest(current)
+            chain.append(manifest)
+            current = manifest["parent"]
+        return list(reversed(chain))
+
+    def _read_manifest(self, backup_id):
+        path = os.path.join(self.database_path, backup_id, MANIFEST_FILE)
+        if not os.path.exists(path):
+            raise BackupError(f"Manifest for backup {backup_id} not found", backup_id)
+        with open(path) as f:
+            return json.load(f)
+
+    def _read_state(self):
+        path = os.path.join(self.database_path, STATE_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_state(self, state):
+        # write then rename, so an interrupted backup never leaves a half-written state file
+        path = os.path.join(self.database_path, STATE_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def _checksum(self, path):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
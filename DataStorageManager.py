@@ -1,33 +1,175 @@
 import pymongo
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne, ReplaceOne, IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+import numpy as np
+import pandas as pd
+from bson import Binary, json_util
+from BackupManager import BackupManager
+from QueryCache import QueryCache, query_symbols
+import SeriesCodec
 import logging
 import os
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+# bucketed bar documents hold one ticker's bars for one period as parallel arrays:
+# {"symbol", "bucket", "start", "end", "count", "dates": [...], "<field>": [...], ...}
+BUCKET_DATES_FIELD = "dates"
+# encoded buckets store every array as a SeriesCodec blob instead of a BSON array
+BUCKET_ENCODING = "delta-varint-zlib"
+# the bucket document fields that are not bar series
+BUCKET_METADATA_FIELDS = {"_id", "symbol", "bucket", "encoding", "start", "end", "count", BUCKET_DATES_FIELD}
+
+# upsert_bars stores a hash of each bar's non-key fields here to skip rewriting unchanged bars
+CONTENT_HASH_FIELD = "content_hash"
+
+# the per-bar fields read by query_frame when no projection is given
+DEFAULT_BAR_FIELDS = ("open", "high", "low", "close", "volume")
+
+# declarative index definitions, created at startup; creating an index that already exists is a no-op
+COLLECTION_INDEXES = {
+    "bars": [
+        IndexModel([("symbol", ASCENDING), ("date", ASCENDING)], unique=True, name="symbol_date"),
+    ],
+    "bar_buckets": [
+        IndexModel([("symbol", ASCENDING), ("bucket", ASCENDING)], unique=True, name="symbol_bucket"),
+    ],
+    "signals": [
+        IndexModel([("symbol", ASCENDING), ("date", DESCENDING)], name="symbol_date"),
+        IndexModel([("signal", ASCENDING), ("date", DESCENDING)], name="signal_date"),
+    ],
+    "trades": [
+        IndexModel([("symbol", ASCENDING), ("entry_date", DESCENDING)], name="symbol_entry_date"),
+        IndexModel([("status", ASCENDING)], name="status"),
+    ],
+}
+
+# connection pool settings for clients created by get_client
+DEFAULT_CLIENT_OPTIONS = {
+    "maxPoolSize": 100,
+    "minPoolSize": 0,
+    "maxIdleTimeMS": 300000,
+    "serverSelectionTimeoutMS": 10000,
+    "connectTimeoutMS": 10000,
+    "socketTimeoutMS": 60000,
+}
+
+# MongoClient is thread-safe and pools its connections, so the process keeps one client
+# per host and options and every DataStorageManager in it shares that client
+_clients = {}
+_indexed_databases = set()
+# query caches are shared the same way, per process, client and database, so a write through any
+# DataStorageManager in the process invalidates what every other one has cached
+_caches = {}
+_clients_lock = threading.Lock()
+# held while a database's indexes are checked and created, so concurrent first opens create them once
+_indexes_lock = threading.Lock()
+
+
+def get_client(host=None, **options):
+    # host: a MongoDB URI or host name, None for localhost
+    # options: MongoClient keyword arguments overriding DEFAULT_CLIENT_OPTIONS
+    client_options = {**DEFAULT_CLIENT_OPTIONS, **options}
+    # a client must not be used across fork, so children get their own
+    key = (os.getpid(), host, tuple(sorted(client_options.items())))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = MongoClient(host, **client_options)
+            _clients[key] = client
+        return client
+
+
+def get_query_cache(client, database_name, max_bytes, ttl):
+    # the first DataStorageManager to ask sizes the cache for the rest of the process
+    key = (os.getpid(), id(client), database_name)
+    with _clients_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = QueryCache(max_bytes, ttl)
+            _caches[key] = cache
+        return cache
+
+
+def close_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+        _indexed_databases.clear()
+        _caches.clear()
+
+
+def frame_for_storage(frame):
+    # keep a meaningful index (e.g. the bar dates) as a regular field
+    if isinstance(frame.index, pd.RangeIndex):
+        return frame
+    if frame.index.name is None and isinstance(frame.index, pd.DatetimeIndex):
+        return frame.rename_axis("date").reset_index()
+    return frame.reset_index()
+
 
 class DataStorageManager:
-    def __init__(self, database_name):
+    def __init__(self, database_name, indexes=None, create_indexes=True, host=None, client_options=None,
+                 cache_bytes=0, cache_ttl=60, client=None, backup_path="database_backup",
+                 log_path="data_storage_manager.log"):
+        # indexes: a mapping of collection name to a list of IndexModel, defaults to COLLECTION_INDEXES
+        # create_indexes: create any missing indexes the first time the process opens this database
+        # host, client_options: passed to get_client to pick the shared, pooled MongoClient
+        # client: an existing client (or an in-process stand-in such as mongomock) used instead of get_client
+        # cache_bytes: the size of the read-through cache for query_data/query_frame, 0 (the default) disables it;
+        #   the cache is shared by every DataStorageManager of the process on the same client and database, and
+        #   writes through any of them invalidate it, including those created with the cache disabled
+        # cache_ttl: seconds a cached result may be served, bounding staleness from writers in other processes
+        # backup_path: the directory holding the database backups
+        # log_path: the log file of the shared logger, set up by the first instance; None logs to the console only
         self.database_name = database_name
-        self.backup_path = "database_backup"
-        self.logger = self.setup_logger()
+        self.backup_path = backup_path
+        self.indexes = COLLECTION_INDEXES if indexes is None else indexes
+        self.cache = None
+        self.logger = self.setup_logger(log_path)
         self.setup_backup_folder()
 
         try:
-            self.client = MongoClient()
+            self.client = client if client is not None else get_client(host, **(client_options or {}))
             self.db = self.client[self.database_name]
             self.logger.info(f"Connected to database: {self.database_name}")
         except Exception as e:
             self.logger.error(f"Failed to connect to database: {self.database_name}. Error: {e}")
             raise
 
-    def setup_logger(self):
+        if cache_bytes:
+            self.cache = get_query_cache(self.client, self.database_name, cache_bytes, cache_ttl)
+
+        self.backup_manager = BackupManager(self.db, self.backup_path)
+
+        if create_indexes:
+            # keyed on the full index definitions, so changed definitions are applied
+            index_specs = tuple(sorted(
+                (collection_name, tuple(json_util.dumps(model.document) for model in index_models))
+                for collection_name, index_models in self.indexes.items()))
+            index_key = (id(self.client), self.database_name, index_specs)
+            with _indexes_lock:
+                if index_key not in _indexed_databases:
+                    self.ensure_indexes()
+                    _indexed_databases.add(index_key)
+
+    def setup_logger(self, log_path="data_storage_manager.log"):
         logger = logging.getLogger("DataStorageManager")
+        # every instance shares the named logger, so only the first one attaches handlers
+        if logger.handlers:
+            return logger
         logger.setLevel(logging.INFO)
         formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
         # Set up file handler for logging
-        file_handler = logging.FileHandler("data_storage_manager.log")
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        if log_path is not None:
+            file_handler = logging.FileHandler(log_path)
+            file_handler.setFormatter(formatter)
+            logger.addHandler(file_handler)
 
         # Set up console handler for logging
         console_handler = logging.StreamHandler()
@@ -36,6 +178,65 @@ class DataStorageManager:
 
         return logger
 
+    def ensure_indexes(self):
+        for collection_name, index_models in self.indexes.items():
+            try:
+                created = self.db[collection_name].create_indexes(index_models)
+                self.logger.info(f"Ensured indexes on {collection_name}: {', '.join(created)}")
+            except Exception as e:
+                self.logger.error(f"Failed to create indexes on {collection_name}. Error: {e}")
+                raise
+
+    def explain_query(self, collection_name, query, sort=None, hint=None):
+        # runs the query planner for query and reports whether it is served by an index
+        # returns a dict with the winning plan's stages, the index used and the examined/returned counts
+        try:
+            cursor = self.db[collection_name].find(query)
+            if sort is not None:
+                cursor = cursor.sort(sort)
+            if hint is not None:
+                cursor = cursor.hint(hint)
+            explanation = cursor.explain()
+        except Exception as e:
+            self.logger.error(f"Failed to explain query on {collection_name}. Error: {e}")
+            raise
+
+        diagnostics = self.summarize_query_plan(explanation)
+        if diagnostics["collection_scan"]:
+            self.logger.warning(f"Query on {collection_name} does a collection scan: {query} "
+                                f"({diagnostics['docs_examined']} document(s) examined, "
+                                f"{diagnostics['returned']} returned)")
+        return diagnostics
+
+    def summarize_query_plan(self, explanation):
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        # servers using the slot-based engine nest the classic plan under "queryPlan"
+        winning_plan = winning_plan.get("queryPlan", winning_plan)
+
+        stages = []
+        index_names = []
+        pending = [winning_plan]
+        while pending:
+            stage = pending.pop()
+            if not stage:
+                continue
+            stages.append(stage.get("stage"))
+            if "indexName" in stage:
+                index_names.append(stage["indexName"])
+            if "inputStage" in stage:
+                pending.append(stage["inputStage"])
+            pending.extend(stage.get("inputStages", []))
+
+        execution_stats = explanation.get("executionStats", {})
+        return {
+            "collection_scan": "COLLSCAN" in stages,
+            "stages": stages,
+            "indexes": index_names,
+            "docs_examined": execution_stats.get("totalDocsExamined"),
+            "keys_examined": execution_stats.get("totalKeysExamined"),
+            "returned": execution_stats.get("nReturned"),
+        }
+
     def setup_backup_folder(self):
         if not os.path.exists(self.backup_path):
             os.makedirs(self.backup_path)
@@ -45,66 +246,539 @@ class DataStorageManager:
         try:
             collection = self.db[collection_name]
             result = collection.insert_one(data)
+            self._invalidate(collection_name, [data["symbol"]] if "symbol" in data else None)
             self.logger.info(f"Inserted data into {collection_name}: {result.inserted_id}")
         except Exception as e:
             self.logger.error(f"Failed to insert data into {collection_name}. Error: {e}")
             raise
 
+    def bulk_insert_data(self, collection_name, data, batch_size=1000, ordered=False):
+        # data: a pandas DataFrame (one document per row) or an iterable of dicts
+        # batch_size: the number of documents sent to the server per insert_many call
+        # ordered: unordered batches let the server keep going past a failed document
+        # returns a list of per-batch stats: batch number, documents written and elapsed seconds
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, got {batch_size}")
+
+        collection = self.db[collection_name]
+        batch_stats = []
+        total_inserted = 0
+        start = time.perf_counter()
+
+        try:
+            for batch_number, batch in enumerate(self._iter_batches(data, batch_size)):
+                batch_start = time.perf_counter()
+                try:
+                    result = collection.insert_many(batch, ordered=ordered)
+                finally:
+                    self._invalidate(collection_name, self._batch_symbols(batch))
+                elapsed = time.perf_counter() - batch_start
+
+                inserted = len(result.inserted_ids)
+                total_inserted += inserted
+                batch_stats.append({"batch": batch_number, "documents": inserted, "seconds": elapsed})
+                self.logger.debug(f"Inserted batch {batch_number} into {collection_name}: "
+                                  f"{inserted} document(s) in {elapsed:.4f}s")
+        except BulkWriteError as e:
+            inserted = e.details.get("nInserted", 0)
+            total_inserted += inserted
+            self.logger.error(f"Bulk insert into {collection_name} partially failed: "
+                              f"{total_inserted} document(s) inserted, "
+                              f"{len(e.details.get('writeErrors', []))} write error(s) in batch {len(batch_stats)}")
+            raise
+        except Exception as e:
+            self.logger.error(f"Failed to bulk insert data into {collection_name}. Error: {e}")
+            raise
+
+        elapsed = time.perf_counter() - start
+        self.logger.info(f"Bulk inserted {total_inserted} document(s) into {collection_name} "
+                         f"in {len(batch_stats)} batch(es) ({elapsed:.3f}s)")
+        return batch_stats
+
+    def _iter_batches(self, data, batch_size):
+        # DataFrames are converted one slice at a time so a large frame is never held twice as dicts
+        if isinstance(data, pd.DataFrame):
+            frame = frame_for_storage(data)
+            for offset in range(0, len(frame), batch_size):
+                yield frame.iloc[offset:offset + batch_size].to_dict("records")
+            return
+
+        records = iter(data)
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                return
+            yield batch
+
     def update_data(self, collection_name, query, new_data):
         try:
             collection = self.db[collection_name]
             result = collection.update_one(query, {"$set": new_data})
+            # the update may move the document to another symbol, whose results are stale too
+            symbols = query_symbols(query)
+            if symbols is not None and "symbol" in new_data:
+                symbols = [*symbols, new_data["symbol"]]
+            self._invalidate(collection_name, symbols)
             self.logger.info(f"Updated data in {collection_name}: {result.modified_count} document(s) modified")
         except Exception as e:
             self.logger.error(f"Failed to update data in {collection_name}. Error: {e}")
             raise
 
-    def query_data(self, collection_name, query, projection=None):
+    def upsert_bars(self, collection_name, bars, key_fields=("symbol", "date"), batch_size=1000):
+        # bars: a DataFrame (or iterable of dicts) of bars with a column for each key field
+        # each row becomes an upsert on key_fields, so refetching overlapping history never duplicates bars;
+        # rows whose content hash matches the stored bar are skipped entirely
+        # returns a dict with the number of bars inserted, updated and skipped as unchanged
+        frame = frame_for_storage(bars) if isinstance(bars, pd.DataFrame) else pd.DataFrame.from_records(bars)
+        frame = frame.drop(columns=["_id", CONTENT_HASH_FIELD], errors="ignore")
+        stats = {"inserted": 0, "updated": 0, "unchanged": 0}
+        if frame.empty:
+            return stats
+        key_fields = list(key_fields)
+        if "date" in key_fields:
+            frame["date"] = pd.to_datetime(frame["date"])
+
+        # hash the value columns in a fixed order and with numbers as float64,
+        # so the same bar hashes the same whether volume arrived as int or float
+        value_fields = sorted(column for column in frame.columns if column not in key_fields)
+        values = frame[value_fields].apply(
+            lambda column: column.astype("float64") if pd.api.types.is_numeric_dtype(column) else column)
+        # BSON has no unsigned 64-bit integers
+        frame[CONTENT_HASH_FIELD] = pd.util.hash_pandas_object(values, index=False).to_numpy().view("int64")
+
+        collection = self.db[collection_name]
+        changed = np.zeros(len(frame), dtype=bool)
+        try:
+            stored_hashes = self._stored_hashes(collection, frame, key_fields)
+            keys = list(zip(*(frame[field] for field in key_fields)))
+            changed = np.array([stored_hashes.get(key) != content_hash
+                                for key, content_hash in zip(keys, frame[CONTENT_HASH_FIELD])], dtype=bool)
+            stats["unchanged"] = int((~changed).sum())
+
+            operations = [UpdateOne({field: record[field] for field in key_fields}, {"$set": record}, upsert=True)
+                          for record in frame[changed].to_dict("records")]
+            start = time.perf_counter()
+            for offset in range(0, len(operations), batch_size):
+                result = collection.bulk_write(operations[offset:offset + batch_size], ordered=False)
+                stats["inserted"] += result.upserted_count
+                stats["updated"] += result.modified_count
+        except Exception as e:
+            self.logger.error(f"Failed to upsert bars into {collection_name}. Error: {e}")
+            raise
+        finally:
+            if changed.any():
+                self._invalidate(collection_name, frame["symbol"].unique() if "symbol" in frame else None)
+
+        self.logger.info(f"Upserted bars into {collection_name}: {stats['inserted']} inserted, "
+                         f"{stats['updated']} updated, {stats['unchanged']} unchanged "
+                         f"({time.perf_counter() - start:.3f}s)")
+        return stats
+
+    def _stored_hashes(self, collection, frame, key_fields):
+        # one range query fetches the stored hashes for every key in the frame
+        query = {}
+        for field in key_fields:
+            if field == "date":
+                query[field] = {"$gte": frame[field].min().to_pydatetime(), "$lte": frame[field].max().to_pydatetime()}
+            else:
+                query[field] = {"$in": frame[field].unique().tolist()}
+        projection = {"_id": 0, CONTENT_HASH_FIELD: 1, **{field: 1 for field in key_fields}}
+
+        stored_hashes = {}
+        for document in collection.find(query, projection):
+            key = tuple(pd.Timestamp(document.get(field)) if field == "date" else document.get(field)
+                        for field in key_fields)
+            stored_hashes[key] = document.get(CONTENT_HASH_FIELD)
+        return stored_hashes
+
+    def query_data(self, collection_name, query, projection=None, hint=None):
+        # hint: an index name or key list to force the planner's choice of index
+        cache_key = None
+        if self.cache is not None:
+            cache_key = (collection_name, "documents", json_util.dumps([query, projection, hint], sort_keys=True))
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return [dict(document) for document in cached]
+            # a write that lands while the query runs makes the cache refuse its result
+            generation = self.cache.generation(collection_name)
         try:
             collection = self.db[collection_name]
             result = collection.find(query, projection)
-            self.logger.info(f"Queried data from {collection_name}: {result.count()} document(s) returned")
-            return list(result)
+            if hint is not None:
+                result = result.hint(hint)
+            documents = list(result)
+            self.logger.info(f"Queried data from {collection_name}: {len(documents)} document(s) returned")
+            if cache_key is not None:
+                self.cache.put(cache_key, documents, collection_name, query_symbols(query), generation)
+                return [dict(document) for document in documents]
+            return documents
         except Exception as e:
             self.logger.error(f"Failed to query data from {collection_name}. Error: {e}")
             raise
-    def backup_database(self):
-        backup_folder = os.path.join(self.backup_path, self.database_name)
-        if not os.path.exists(backup_folder):
-            os.makedirs(backup_folder)
+
+    def query_frame(self, collection_name, symbols=None, start=None, end=None, fields=DEFAULT_BAR_FIELDS,
+                    date_field="date", batch_size=5000, dtypes=None):
+        # reads one-document-per-bar collections into a single DataFrame with columns symbol, date and fields
+        # documents are copied straight from the cursor into typed NumPy columns and never held as a list
+        symbol_list = None if symbols is None else ([symbols] if isinstance(symbols, str) else list(symbols))
+        cache_key = None
+        if self.cache is not None:
+            cache_key = (collection_name, "frame", json_util.dumps(
+                [symbol_list, str(start), str(end), list(fields), date_field, dtypes], sort_keys=True, default=str))
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached.copy()
+            generation = self.cache.generation(collection_name)
+
+        chunks = list(self.iter_query_frames(collection_name, symbol_list, start, end, fields,
+                                             date_field, batch_size, dtypes))
+        if not chunks:
+            frame = self._column_frame(self._empty_columns(fields, date_field, dtypes, 0), 0, date_field)
+        else:
+            frame = pd.concat(chunks, ignore_index=True)
+        if cache_key is not None:
+            self.cache.put(cache_key, frame, collection_name, symbol_list, generation)
+            return frame.copy()
+        return frame
+
+    def iter_query_frames(self, collection_name, symbols=None, start=None, end=None, fields=DEFAULT_BAR_FIELDS,
+                          date_field="date", batch_size=5000, dtypes=None):
+        # yields DataFrame chunks of at most batch_size rows, sorted by symbol and date,
+        # so arbitrarily large reads run in bounded memory
+        # symbols: a symbol or list of symbols, None for all
+        # start, end: inclusive date bounds on date_field
+        # dtypes: per-field NumPy dtypes, fields default to float64; a missing float is NaN, and a chunk in which
+        #   an integer or boolean field is missing comes back with the pandas nullable dtype (e.g. Int64) and <NA>
+        query = {}
+        if symbols is not None:
+            query["symbol"] = {"$in": [symbols] if isinstance(symbols, str) else list(symbols)}
+        date_range = {}
+        if start is not None:
+            date_range["$gte"] = pd.Timestamp(start).to_pydatetime()
+        if end is not None:
+            date_range["$lte"] = pd.Timestamp(end).to_pydatetime()
+        if date_range:
+            query[date_field] = date_range
+        projection = {"_id": 0, "symbol": 1, date_field: 1, **{field: 1 for field in fields}}
 
         try:
-            os.system(f"mongodump --db {self.database_name} --out {self.backup_path}")
-            self.logger.info(f"Successfully backed up {self.database_name} to {self.backup_path}")
+            cursor = (self.db[collection_name].find(query, projection)
+                      .sort([("symbol", ASCENDING), (date_field, ASCENDING)])
+                      .batch_size(batch_size))
+            total = 0
+            columns = self._empty_columns(fields, date_field, dtypes, batch_size)
+            # NaN marks a missing float; other dtypes cannot hold it, so their missing values are masked
+            float_fields = [field for field in fields if columns[field].dtype.kind == "f"]
+            other_fields = [field for field in fields if columns[field].dtype.kind != "f"]
+            missing = {field: np.zeros(batch_size, dtype=bool) for field in other_fields}
+            filled = 0
+            for document in cursor:
+                columns["symbol"][filled] = document.get("symbol")
+                columns[date_field][filled] = document.get(date_field)
+                for field in float_fields:
+                    columns[field][filled] = document.get(field, np.nan)
+                for field in other_fields:
+                    value = document.get(field)
+                    if value is None:
+                        missing[field][filled] = True
+                    else:
+                        columns[field][filled] = value
+                filled += 1
+                if filled == batch_size:
+                    yield self._column_frame(columns, filled, date_field, missing)
+                    total += filled
+                    columns = self._empty_columns(fields, date_field, dtypes, batch_size)
+                    missing = {field: np.zeros(batch_size, dtype=bool) for field in other_fields}
+                    filled = 0
+            if filled:
+                yield self._column_frame(columns, filled, date_field, missing)
+                total += filled
+            self.logger.info(f"Streamed {total} document(s) from {collection_name}")
+        except Exception as e:
+            self.logger.error(f"Failed to stream data from {collection_name}. Error: {e}")
+            raise
+
+    def query_panel(self, collection_name, symbols=None, start=None, end=None, fields=DEFAULT_BAR_FIELDS,
+                    date_field="date", symbols_per_partition=100, time_partitions=1, max_workers=8,
+                    batch_size=5000, dtypes=None):
+        # reads many symbols' bars at once into a dict of NumPy arrays: "symbols" (in request order),
+        # "dates" (the sorted union of bar dates, datetime64[ms]) and one (dates x symbols) array per field,
+        # NaN (or 0 for integer dtypes) where a symbol has no bar on a date
+        # the read is split into partitions of symbols_per_partition symbols and, when both start and end
+        # are given, time_partitions equal date ranges; partitions run concurrently on max_workers threads
+        # over the shared, pooled client
+        try:
+            if symbols is None:
+                symbols = sorted(self.db[collection_name].distinct("symbol"))
+            symbol_list = [symbols] if isinstance(symbols, str) else list(dict.fromkeys(symbols))
+        except Exception as e:
+            self.logger.error(f"Failed to list symbols in {collection_name}. Error: {e}")
+            raise
+
+        ranges = [(start, end)]
+        if time_partitions > 1 and start is not None and end is not None:
+            bounds = pd.date_range(pd.Timestamp(start), pd.Timestamp(end), periods=time_partitions + 1)
+            # bounds are inclusive, so each range stops just before the next one starts
+            ranges = [(bounds[i], bounds[i + 1] - pd.Timedelta(milliseconds=1)) for i in range(time_partitions)]
+            ranges[-1] = (bounds[-2], pd.Timestamp(end))
+        partitions = [(symbol_list[i:i + symbols_per_partition], range_start, range_end)
+                      for i in range(0, len(symbol_list), symbols_per_partition)
+                      for range_start, range_end in ranges]
+
+        def read_partition(partition):
+            partition_symbols, range_start, range_end = partition
+            chunks = list(self.iter_query_frames(collection_name, partition_symbols, range_start, range_end,
+                                                 fields, date_field, batch_size, dtypes))
+            return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else (chunks[0] if chunks else None)
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(partitions)))) as executor:
+            frames = [frame for frame in executor.map(read_partition, partitions) if frame is not None]
+
+        # size the panel from the partition results, then scatter each partition into place
+        if frames:
+            dates = np.unique(np.concatenate([frame[date_field].to_numpy(dtype="datetime64[ms]")
+                                              for frame in frames]))
+        else:
+            dates = np.empty(0, dtype="datetime64[ms]")
+        positions = {symbol: number for number, symbol in enumerate(symbol_list)}
+        dtypes = dtypes or {}
+        panel = {"symbols": np.array(symbol_list, dtype=object), "dates": dates}
+        for field in fields:
+            dtype = np.dtype(dtypes.get(field, "float64"))
+            panel[field] = np.full((len(dates), len(symbol_list)), np.nan if dtype.kind == "f" else 0, dtype=dtype)
+        for frame in frames:
+            rows = np.searchsorted(dates, frame[date_field].to_numpy(dtype="datetime64[ms]"))
+            columns = frame["symbol"].map(positions).to_numpy(dtype="int64")
+            for field in fields:
+                panel[field][rows, columns] = frame[field].to_numpy(
+                    dtype=panel[field].dtype, na_value=np.nan if panel[field].dtype.kind == "f" else 0)
+
+        self.logger.info(f"Queried a {len(dates)} x {len(symbol_list)} panel from {collection_name} in "
+                         f"{len(partitions)} partition(s) in {time.perf_counter() - start_time:.4f}s")
+        return panel
+
+    def cache_metrics(self):
+        return self.cache.metrics() if self.cache is not None else None
+
+    def _invalidate(self, collection_name, symbols=None):
+        cache = self._shared_cache()
+        if cache is not None:
+            cache.invalidate(collection_name, symbols)
+
+    def _shared_cache(self):
+        # instances without a cache of their own still invalidate the one other instances read through
+        if self.cache is not None:
+            return self.cache
+        return _caches.get((os.getpid(), id(self.client), self.database_name))
+
+    def _batch_symbols(self, batch):
+        # None (invalidate the whole collection) if any document has no symbol
+        symbols = set()
+        for document in batch:
+            if "symbol" not in document:
+                return None
+            symbols.add(document["symbol"])
+        return symbols
+
+    def _empty_columns(self, fields, date_field, dtypes, size):
+        dtypes = dtypes or {}
+        columns = {"symbol": np.empty(size, dtype=object), date_field: np.empty(size, dtype="datetime64[ms]")}
+        for field in fields:
+            columns[field] = np.empty(size, dtype=dtypes.get(field, "float64"))
+        return columns
+
+    def _column_frame(self, columns, size, date_field, missing=None):
+        frame_columns = {name: values[:size] for name, values in columns.items()}
+        for field, mask in (missing or {}).items():
+            mask = mask[:size]
+            if not mask.any():
+                continue
+            values = frame_columns[field]
+            if values.dtype.kind in "iu":
+                frame_columns[field] = pd.arrays.IntegerArray(values, mask)
+            elif values.dtype.kind == "b":
+                frame_columns[field] = pd.arrays.BooleanArray(values, mask)
+            elif values.dtype.kind in "mM":
+                values[mask] = np.datetime64("NaT")
+            else:
+                values[mask] = None
+        return pd.DataFrame(frame_columns)
+
+    def insert_bars_bucketed(self, collection_name, symbol, bars, period="M", fields=None, encoded=False,
+                             decimals=4):
+        # bars: a DataFrame of one ticker's bars indexed by date
+        # period: a pandas period alias for the bucket size ("M" = one document per month, "Y" = per year)
+        # fields: the columns to store; defaults to every numeric column
+        # encoded: store the arrays compressed with SeriesCodec, prices rounded to decimals
+        # bars are merged into their buckets on date, so rewriting overlapping or out-of-order bars is safe
+        if fields is None:
+            fields = list(bars.select_dtypes("number").columns)
+        bars = bars.sort_index()
+        index = pd.DatetimeIndex(bars.index)
+        return self._write_buckets(collection_name, symbol, bars, index, period, fields, encoded, decimals)
+
+    def _write_buckets(self, collection_name, symbol, bars, index, period, fields, encoded, decimals):
+        # each touched bucket is decoded, merged with the new bars on date and written back whole, so its
+        # dates stay sorted and unique and every field array has one value per date; the new bars win where
+        # both have a value, and stored fields the new bars do not have are kept
+        periods = index.to_period(period).astype(str)
+        bucket_keys = list(periods.unique())
+        collection = self.db[collection_name]
+        try:
+            stored = {}
+            for bucket in collection.find({"symbol": symbol, "bucket": {"$in": bucket_keys}}):
+                stored_fields = [key for key in bucket if key not in BUCKET_METADATA_FIELDS]
+                stored[bucket["bucket"]] = (stored_fields, self._decode_bucket(bucket, stored_fields))
+
+            operations = []
+            for bucket in bucket_keys:
+                rows = np.flatnonzero(periods == bucket)
+                merged = pd.DataFrame({field: bars[field].to_numpy(dtype="float64")[rows] for field in fields},
+                                      index=index[rows].as_unit("ms"))
+                merged = merged[~merged.index.duplicated(keep="last")]
+                if bucket in stored:
+                    stored_fields, previous = stored[bucket]
+                    previous = pd.DataFrame({field: previous[field] for field in stored_fields},
+                                            index=pd.DatetimeIndex(previous["date"]).as_unit("ms"))
+                    merged = merged.combine_first(previous[~previous.index.duplicated(keep="last")])
+                    merged = merged[fields + [field for field in stored_fields if field not in fields]]
+
+                document = {"symbol": symbol, "bucket": bucket,
+                            "start": merged.index[0].to_pydatetime(), "end": merged.index[-1].to_pydatetime(),
+                            "count": len(merged)}
+                if encoded:
+                    columns = {"date": merged.index.to_numpy(),
+                               **{field: merged[field].to_numpy(dtype="float64") for field in merged.columns}}
+                    document["encoding"] = BUCKET_ENCODING
+                    for name, blob in SeriesCodec.encode_columns(columns, decimals).items():
+                        document[BUCKET_DATES_FIELD if name == "date" else name] = Binary(blob)
+                else:
+                    document[BUCKET_DATES_FIELD] = merged.index.to_pydatetime().tolist()
+                    for field in merged.columns:
+                        document[field] = merged[field].to_numpy(dtype="float64").tolist()
+                operations.append(ReplaceOne({"symbol": symbol, "bucket": bucket}, document, upsert=True))
+
+            if not operations:
+                return 0
+            collection.bulk_write(operations, ordered=False)
+            self._invalidate(collection_name, [symbol])
+            self.logger.info(f"Wrote {len(bars)} {'encoded ' if encoded else ''}bar(s) for {symbol} into "
+                             f"{len(operations)} bucket(s) of {collection_name}")
+        except Exception as e:
+            self.logger.error(f"Failed to write bucketed bars for {symbol} into {collection_name}. Error: {e}")
+            raise
+        return len(operations)
+
+    def _decode_bucket(self, bucket, fields):
+        # returns a bucket's columns as arrays, whether it is stored encoded or as plain arrays
+        if bucket.get("encoding") == BUCKET_ENCODING:
+            columns = {"date": SeriesCodec.decode(bucket[BUCKET_DATES_FIELD])}
+            for field in fields:
+                columns[field] = SeriesCodec.decode(bucket[field]) if field in bucket else np.nan
+        else:
+            columns = {"date": np.asarray(bucket[BUCKET_DATES_FIELD], dtype="datetime64[ms]")}
+            for field in fields:
+                columns[field] = np.asarray(bucket[field], dtype="float64") if field in bucket else np.nan
+        # a field missing from the bucket is all NaN; a stored array of another length is corrupt
+        for name, values in columns.items():
+            if np.ndim(values) and len(values) != bucket["count"]:
+                raise ValueError(f"Bucket {bucket.get('bucket')} of {bucket.get('symbol')} has {len(values)} "
+                                 f"value(s) for {name} but a count of {bucket['count']}")
+        return columns
+
+    def query_bars_bucketed(self, collection_name, symbol, start=None, end=None, fields=None):
+        # returns a dict of NumPy columns: "date" (datetime64[ms]) plus one float64 array per field
+        # only the buckets overlapping [start, end] are fetched; bars outside the range are trimmed
+        query = {"symbol": symbol}
+        if start is not None:
+            query["end"] = {"$gte": pd.Timestamp(start).to_pydatetime()}
+        if end is not None:
+            query["start"] = {"$lte": pd.Timestamp(end).to_pydatetime()}
+        projection = None
+        if fields is not None:
+            projection = {"_id": 0, "bucket": 1, "count": 1, "encoding": 1, BUCKET_DATES_FIELD: 1,
+                          **{field: 1 for field in fields}}
+
+        try:
+            buckets = list(self.db[collection_name].find(query, projection).sort("bucket", pymongo.ASCENDING))
+        except Exception as e:
+            self.logger.error(f"Failed to query bucketed bars for {symbol} from {collection_name}. Error: {e}")
+            raise
+
+        if fields is None:
+            fields = [key for key in (buckets[0] if buckets else {})
+                      if key not in ("_id", "symbol", "bucket", "start", "end", "count", "encoding",
+                                     BUCKET_DATES_FIELD)]
+
+        # pre-size the output columns from the bucket counts and fill them bucket by bucket
+        total = sum(bucket["count"] for bucket in buckets)
+        columns = {"date": np.empty(total, dtype="datetime64[ms]")}
+        for field in fields:
+            columns[field] = np.empty(total, dtype="float64")
+        offset = 0
+        for bucket in buckets:
+            size = bucket["count"]
+            for name, values in self._decode_bucket(bucket, fields).items():
+                columns[name][offset:offset + size] = values
+            offset += size
+
+        mask = np.ones(total, dtype=bool)
+        if start is not None:
+            mask &= columns["date"] >= np.datetime64(pd.Timestamp(start), "ms")
+        if end is not None:
+            mask &= columns["date"] <= np.datetime64(pd.Timestamp(end), "ms")
+        if not mask.all():
+            columns = {name: values[mask] for name, values in columns.items()}
+
+        self.logger.info(f"Queried {len(columns['date'])} bar(s) for {symbol} from {len(buckets)} "
+                         f"bucket(s) of {collection_name}")
+        return columns
+
+    def backup_database(self, incremental=True, background=False):
+        # incremental: only export documents added since the last backup (the first backup is always full)
+        # background: return a Future instead of waiting, so ingest keeps running during the backup
+        try:
+            if background:
+                return self.backup_manager.backup_in_background(incremental)
+            manifest = self.backup_manager.backup(incremental)
+            self.logger.info(f"Successfully backed up {self.database_name} to {self.backup_path} "
+                             f"({manifest['backup_id']})")
+            return manifest
         except Exception as e:
             self.logger.error(f"Failed to backup database {self.database_name}. Error: {e}")
             raise
-    def delete_data(self, collection_name, query):
+
+    def delete_data(self, collection_name, query, many=False):
+        # many: delete every matching document instead of the first one
         try:
             collection = self.db[collection_name]
-            result = collection.delete_one(query)
+            result = collection.delete_many(query) if many else collection.delete_one(query)
+            self._invalidate(collection_name, query_symbols(query))
             self.logger.info(f"Deleted data from {collection_name}: {result.deleted_count} document(s) deleted")
         except Exception as e:
             self.logger.error(f"Failed to delete data from {collection_name}. Error: {e}")
             raise
 
-    def restore_database(self):
-        backup_folder = os.path.join(self.backup_path, self.database_name)
-        if os.path.exists(backup_folder):
-            try:
-                os.system(f"mongorestore --db {self.database_name} {backup_folder}")
-                self.logger.info(f"Successfully restored {self.database_name} from {self.backup_path}")
-            except Exception as e:
-                self.logger.error(f"Failed to restore database {self.database_name}. Error: {e}")
-                self.logger.error(f"Failed to restore database {self.database_name}. Error: {e}")
+    def restore_database(self, backup_id=None):
+        # backup_id: the backup to restore to, defaults to the latest one
+        try:
+            restored = self.backup_manager.restore(backup_id)
+            cache = self._shared_cache()
+            if cache is not None:
+                cache.clear()
+            self.logger.info(f"Successfully restored {self.database_name} from {self.backup_path}: "
+                             f"{restored} document(s)")
+            return restored
+        except Exception as e:
+            self.logger.error(f"Failed to restore database {self.database_name}. Error: {e}")
             raise
-        else:
-            self.logger.error(f"Backup folder for {self.database_name} not found in {self.backup_path}")
 
     def drop_collection(self, collection_name):
         try:
             collection = self.db[collection_name]
             collection.drop()
+            self._invalidate(collection_name)
             self.logger.info(f"Dropped collection {collection_name} from {self.database_name}")
         except Exception as e:
             self.logger.error(f"Failed to drop collection {collection_name} from {self.database_name}. Error: {e}")
@@ -0,0 +1,174 @@
+# HyperbandSearch.py
+
+"""
+HyperbandSearch.py
+
+Adaptive parameter search. Successive halving trains every candidate on a
+small budget (e.g. a few epochs), keeps the best 1/eta of them and trains the
+survivors on eta times the budget, until the full budget is reached, so most
+of the compute goes to configurations that are still winning. Hyperband runs
+several successive-halving brackets that trade the number of candidates
+against their starting budget. A promoted candidate resumes from the
+checkpoint its previous rung returned, so it is only trained on the budget it
+has not had yet, and every rung of every bracket runs on one SearchPool.
+"""
+
+import itertools
+import logging
+import math
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ParallelSearch import SearchPool
+
+logger = logging.getLogger(__name__)
+
+# the params a promoted candidate is resumed with: its previous rung's checkpoint and the budget it was trained on
+RESUME_KEY = "resume_from"
+RESUMED_BUDGET_KEY = "resumed_budget"
+
+
+def sample_candidates(search_space: Dict[str, Sequence], count: int, rng: np.random.Generator) -> List[dict]:
+    """
+    Draw distinct parameter sets from a grid.
+
+    Parameters:
+    search_space (dict): The values to try for each parameter, e.g. {"window_size": [5, 10], ...}.
+    count (int): The number of parameter sets wanted; the whole grid if it is smaller.
+    rng (numpy.random.Generator): The random source.
+
+    Returns:
+    list[dict]: The parameter sets.
+    """
+    names = list(search_space)
+    sizes = [len(search_space[name]) for name in names]
+    total = math.prod(sizes)
+    # draw grid positions rather than building the grid, which can be far larger than count
+    positions = rng.choice(total, size=min(count, total), replace=False)
+    candidates = []
+    for position in positions:
+        params = {}
+        for name, size in zip(reversed(names), reversed(sizes)):
+            position, index = divmod(int(position), size)
+            params[name] = search_space[name][index]
+        candidates.append({name: params[name] for name in names})
+    return candidates
+
+
+def full_grid(search_space: Dict[str, Sequence]) -> List[dict]:
+    """Every parameter set of a grid, for running successive_halving on all of them."""
+    names = list(search_space)
+    return [dict(zip(names, values)) for values in itertools.product(*(search_space[name] for name in names))]
+
+
+def budget_schedule(min_budget: int, max_budget: int, eta: int) -> List[int]:
+    """The budgets of successive rungs: min_budget, min_budget * eta, ... ending at max_budget."""
+    if not 0 < min_budget <= max_budget or eta < 2:
+        raise ValueError(f"Invalid budgets {min_budget}..{max_budget} with eta {eta}")
+    rungs = int(math.floor(math.log(max_budget / min_budget, eta) + 1e-9))
+    return [int(round(max_budget / eta ** (rungs - rung))) for rung in range(rungs + 1)]
+
+
+def successive_halving(function: Callable, candidates: Sequence[dict], arrays=None, min_budget: int = 1,
+                       max_budget: int = 27, eta: int = 3, score_key: str = "score", maximize: bool = True,
+                       budget_key: str = "epochs", bracket: int = 0, checkpoint_key: str = "checkpoint",
+                       pool: Optional[SearchPool] = None, **search_options) -> List[dict]:
+    """
+    Run one successive-halving bracket.
+
+    Parameters:
+    function (callable): A module-level function called as function(params, arrays) in a worker, where
+        params[budget_key] is the budget; it returns a dict holding the score under score_key. If it also
+        returns a checkpoint under checkpoint_key, e.g. the registry key of the trained model, a promoted
+        candidate is called with that checkpoint in params["resume_from"] and the budget it was trained on
+        in params["resumed_budget"], and continues training from it up to the new budget.
+    candidates (list[dict]): The parameter sets to start with.
+    arrays (dict or SharedArrays): Data shared with the workers, see parallel_search.
+    min_budget, max_budget (int): The budget of the first and the last rung.
+    eta (int): Keep the best 1/eta of the candidates at each rung and multiply the budget by eta.
+    score_key (str): The result entry to rank by, e.g. a Sharpe ratio or a loss.
+    maximize (bool): Whether a higher score is better.
+    budget_key (str): The parameter the budget is passed in.
+    bracket (int): A label recorded with every result.
+    checkpoint_key (str): The result entry holding a checkpoint to resume from.
+    pool (SearchPool): The workers to run every rung on. If None, one is started for this bracket.
+    search_options: Passed to SearchPool (max_workers, threads_per_worker, start_method) if pool is None.
+
+    Returns:
+    list[dict]: One record per evaluation: the parameters, "bracket", "rung", the result entries, and
+    "error" for evaluations that failed.
+    """
+    budgets = budget_schedule(min_budget, max_budget, eta)
+    owned = pool is None
+    if owned:
+        pool = SearchPool(arrays, **search_options)
+    records = []
+    # (candidate, resume params) pairs; the first rung trains every candidate from scratch
+    survivors = [(params, {}) for params in candidates]
+    try:
+        for rung, budget in enumerate(budgets):
+            grid = [{**params, **resume, budget_key: budget} for params, resume in survivors]
+            scored = []
+            for params, result in pool.search(function, grid):
+                candidate = {name: value for name, value in params.items()
+                             if name not in (budget_key, RESUME_KEY, RESUMED_BUDGET_KEY)}
+                record = {**candidate, budget_key: budget, "bracket": bracket, "rung": rung}
+                if isinstance(result, Exception):
+                    record["error"] = str(result)
+                else:
+                    record.update(result)
+                    score = result.get(score_key)
+                    if score is not None and not np.isnan(score):
+                        resume = ({RESUME_KEY: result[checkpoint_key], RESUMED_BUDGET_KEY: budget}
+                                  if result.get(checkpoint_key) is not None else {})
+                        scored.append((score, candidate, resume))
+                records.append(record)
+
+            if rung == len(budgets) - 1 or not scored:
+                break
+            # promote the best 1/eta, dropping failed and unscored candidates
+            scored.sort(key=lambda item: item[0], reverse=maximize)
+            keep = max(1, len(grid) // eta)
+            survivors = [(candidate, resume) for _, candidate, resume in scored[:keep]]
+            logger.info(f"Bracket {bracket} rung {rung}: promoted {len(survivors)} of {len(grid)} candidate(s) "
+                        f"from budget {budget} to {budgets[rung + 1]}")
+    finally:
+        if owned:
+            pool.close()
+    return records
+
+
+def hyperband(function: Callable, search_space: Dict[str, Sequence], arrays=None, min_budget: int = 1,
+              max_budget: int = 27, eta: int = 3, seed: Optional[int] = None, **options) -> List[dict]:
+    """
+    Run Hyperband: successive-halving brackets from many candidates on min_budget down to a few
+    candidates trained on max_budget from the start.
+
+    Parameters:
+    function (callable): See successive_halving.
+    search_space (dict): The values to try for each parameter.
+    arrays (dict or SharedArrays): Data shared with the workers; shared once for every bracket.
+    min_budget, max_budget (int): The smallest and the largest budget.
+    eta (int): The promotion rate.
+    seed (int): Seeds the candidate sampling.
+    options: Passed to successive_halving (score_key, maximize, budget_key, checkpoint_key) and SearchPool
+        (max_workers, threads_per_worker, start_method). One pool runs every rung of every bracket.
+
+    Returns:
+    list[dict]: The records of every bracket, see successive_halving.
+    """
+    rng = np.random.default_rng(seed)
+    largest = len(budget_schedule(min_budget, max_budget, eta)) - 1
+    pool_options = {name: options.pop(name) for name in ("max_workers", "threads_per_worker", "start_method")
+                    if name in options}
+    records = []
+    with SearchPool(arrays, **pool_options) as pool:
+        for bracket in range(largest, -1, -1):
+            count = int(math.ceil((largest + 1) / (bracket + 1) * eta ** bracket))
+            candidates = sample_candidates(search_space, count, rng)
+            bracket_min = int(round(max_budget / eta ** bracket))
+            records.extend(successive_halving(function, candidates, None, bracket_min, max_budget, eta,
+                                              bracket=bracket, pool=pool, **options))
+    return records
+
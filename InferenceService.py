@@ -0,0 +1,198 @@
+# InferenceService.py
+
+"""
+InferenceService.py
+
+In-process micro-batching for model predictions. Callers from any number of
+tickers and strategies submit single inputs and get a Future back; a
+background thread collects the pending requests until the batch is full or
+the oldest request has waited for the latency budget, runs one forward pass
+over the stacked batch and resolves each Future with its own row. Queue depth
+and latency and batch-size histograms are kept for monitoring.
+"""
+
+import bisect
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# upper bounds of the latency histogram buckets in milliseconds; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class InferenceService:
+    """Combines concurrent prediction requests into micro-batches for one model."""
+
+    def __init__(self, predict: Callable, max_batch_size: int = 256, max_latency: float = 0.005,
+                 max_queue: int = 10000, latency_buckets_ms: Sequence[float] = LATENCY_BUCKETS_MS) -> None:
+        """
+        Parameters:
+        predict (callable): Runs the model on a stacked (batch, ...) array and returns one row per input,
+            e.g. a Keras model's predict_on_batch.
+        max_batch_size (int): The most requests combined into one forward pass.
+        max_latency (float): Seconds the oldest request may wait for the batch to fill up.
+        max_queue (int): The number of pending requests at which submit() blocks.
+        latency_buckets_ms (list[float]): Upper bounds of the latency histogram buckets.
+        """
+        self.predict_batch = predict
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.requests = queue.Queue(maxsize=max_queue)
+        self.latency_buckets_ms = tuple(latency_buckets_ms)
+
+        self.lock = threading.Lock()
+        self.latency_counts = [0] * (len(self.latency_buckets_ms) + 1)
+        self.batch_size_counts = {}
+        self.stats = {"requests": 0, "batches": 0, "errors": 0, "max_queue_depth": 0}
+
+        # submit() checks closed and queues under this lock, so every accepted request is queued before
+        # the stop marker close() puts behind it
+        self.submit_lock = threading.Lock()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="inference-service", daemon=True)
+        self.thread.start()
+
+    def submit(self, x, timeout: Optional[float] = None) -> Future:
+        """
+        Queue one input (without a batch axis) for prediction.
+
+        Parameters:
+        x (array-like): The model input for a single sample.
+        timeout (float): How long to wait for room in the queue. If None, wait indefinitely.
+
+        Returns:
+        concurrent.futures.Future: Resolves to the model's output row for x.
+
+        Raises:
+        queue.Full: If the queue is still full after timeout seconds.
+        RuntimeError: If the service has been closed.
+        """
+        future = Future()
+        with self.submit_lock:
+            if self.closed:
+                raise RuntimeError("Inference service is closed")
+            self.requests.put((np.asarray(x), future, time.perf_counter()), timeout=timeout)
+        depth = self.requests.qsize()
+        with self.lock:
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], depth)
+        return future
+
+    def predict(self, x, timeout: Optional[float] = None) -> np.ndarray:
+        """Predict one input and wait for the result."""
+        return self.submit(x, timeout).result(timeout)
+
+    def queue_depth(self) -> int:
+        return self.requests.qsize()
+
+    def metrics(self) -> dict:
+        """
+        Returns:
+        dict: Request, batch and error counts, the current and largest queue depth, the mean batch size,
+        a latency histogram (bucket upper bound in ms -> requests, "inf" for the last bucket) and a
+        batch size histogram (size -> batches).
+        """
+        with self.lock:
+            labels = [str(bound) for bound in self.latency_buckets_ms] + ["inf"]
+            return {
+                **self.stats,
+                "queue_depth": self.requests.qsize(),
+                "mean_batch_size": self.stats["requests"] / self.stats["batches"] if self.stats["batches"] else 0.0,
+                "latency_ms": dict(zip(labels, self.latency_counts)),
+                "batch_sizes": dict(sorted(self.batch_size_counts.items())),
+            }
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Answer every queued request, then stop the batching thread."""
+        with self.submit_lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.requests.put(None)
+        self.thread.join(timeout)
+        logger.info(f"Inference service closed: {self.stats}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            request = self.requests.get()
+            if request is None:
+                break
+            batch = [request]
+            deadline = request[2] + self.max_latency
+            # fill the batch until it is full or the oldest request has used up its latency budget
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    request = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+            self._run_batch(batch)
+
+        # answer whatever is still queued behind the stop marker, in full batches
+        while True:
+            batch = []
+            while len(batch) < self.max_batch_size:
+                try:
+                    request = self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is not None:
+                    batch.append(request)
+            if not batch:
+                return
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        # drop the requests their callers cancelled; the others can no longer be cancelled
+        batch = [request for request in batch if request[1].set_running_or_notify_cancel()]
+        # inputs of different shapes cannot be stacked, so each shape gets its own forward pass
+        groups = {}
+        for request in batch:
+            groups.setdefault((request[0].shape, request[0].dtype.str), []).append(request)
+        for requests in groups.values():
+            try:
+                outputs = np.asarray(self.predict_batch(np.stack([x for x, _, _ in requests])))
+                if len(outputs) != len(requests):
+                    raise ValueError(f"Model returned {len(outputs)} row(s) for {len(requests)} input(s)")
+            except Exception as e:
+                logger.error(f"Failed to run a batch of {len(requests)} prediction(s). Error: {e}")
+                with self.lock:
+                    self.stats["errors"] += len(requests)
+                for _, future, _ in requests:
+                    self._resolve(future, future.set_exception, e)
+                continue
+
+            finished = time.perf_counter()
+            for (_, future, _), output in zip(requests, outputs):
+                self._resolve(future, future.set_result, output)
+            with self.lock:
+                self.stats["requests"] += len(requests)
+                self.stats["batches"] += 1
+                self.batch_size_counts[len(requests)] = self.batch_size_counts.get(len(requests), 0) + 1
+                for _, _, submitted in requests:
+                    latency_ms = (finished - submitted) * 1000.0
+                    self.latency_counts[bisect.bisect_left(self.latency_buckets_ms, latency_ms)] += 1
+
+    def _resolve(self, future, setter, value):
+        # one Future in a bad state must not stop the batching thread and hang every later request
+        try:
+            setter(value)
+        except InvalidStateError as e:
+            logger.warning(f"Could not resolve a prediction request. Error: {e}")
@@ -0,0 +1,188 @@
+# IngestBuffer.py
+
+"""
+IngestBuffer.py
+
+A write-behind buffer between data collection and storage. Producers hand
+bars to put() and return immediately; a background thread groups everything
+pending for a collection into one bulk write when the collection reaches a
+size threshold or its oldest record has waited long enough. When storage
+falls behind and the buffer is full, put() blocks (or times out) instead of
+letting memory grow without bound.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Optional, Union
+
+import pandas as pd
+
+from DataStorageManager import frame_for_storage
+
+logger = logging.getLogger(__name__)
+
+
+class IngestBuffer:
+    """Batches records per collection and writes them from a background thread."""
+
+    def __init__(self, writer: Callable, max_batch_size: int = 5000, flush_interval: float = 1.0,
+                 max_pending: int = 100000, max_retries: int = 2) -> None:
+        """
+        Parameters:
+        writer (callable): Called as writer(collection_name, records) with a list of dicts, e.g.
+            DataStorageManager.upsert_bars. A failed group commit is retried as a whole, so the writer
+            must be idempotent: records that landed before the failure are written again.
+        max_batch_size (int): Flush a collection once this many records are pending for it.
+        flush_interval (float): Flush a collection once its oldest pending record is this many seconds old.
+        max_pending (int): The total number of pending records at which put() starts blocking.
+        max_retries (int): How many times a failed group commit is retried before it is dropped.
+        """
+        self.writer = writer
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+
+        self.pending = {}  # collection name -> list of DataFrames / lists of dicts
+        self.pending_rows = {}  # collection name -> pending record count
+        self.oldest = {}  # collection name -> monotonic time of the oldest pending record
+        self.total_pending = 0
+        self.in_flight = 0
+        self.closed = False
+        self.stats = {"records_written": 0, "batches_written": 0, "records_dropped": 0, "write_errors": 0}
+
+        self.condition = threading.Condition()
+        self.flush_requested = False
+        self.thread = threading.Thread(target=self._run, name="ingest-buffer", daemon=True)
+        self.thread.start()
+
+    def put(self, collection_name: str, records: Union[pd.DataFrame, Iterable[dict]],
+            timeout: Optional[float] = None) -> None:
+        """
+        Queue records for a collection.
+
+        Parameters:
+        collection_name (str): The collection to write to.
+        records (pandas.DataFrame or iterable of dict): The records to write.
+        timeout (float): How long to wait for room in the buffer. If None, wait indefinitely.
+
+        Raises:
+        queue.Full: If the buffer is still full after timeout seconds.
+        RuntimeError: If the buffer has been closed.
+        """
+        if not isinstance(records, pd.DataFrame):
+            records = list(records)
+        rows = len(records)
+        if rows == 0:
+            return
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            # backpressure: wait for the writer to drain, but always admit a batch into an empty buffer
+            while not self.closed and self.total_pending > 0 and self.total_pending + rows > self.max_pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Full(f"Ingest buffer is full ({self.total_pending} records pending)")
+                self.condition.wait(remaining)
+            if self.closed:
+                raise RuntimeError("Ingest buffer is closed")
+
+            self.pending.setdefault(collection_name, []).append(records)
+            self.pending_rows[collection_name] = self.pending_rows.get(collection_name, 0) + rows
+            self.oldest.setdefault(collection_name, time.monotonic())
+            self.total_pending += rows
+            if self.pending_rows[collection_name] >= self.max_batch_size:
+                self.condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything pending now and wait until it is written. Returns False on timeout."""
+        with self.condition:
+            self.flush_requested = True
+            self.condition.notify_all()
+            flushed = self.condition.wait_for(lambda: self.total_pending == 0 and self.in_flight == 0, timeout)
+            self.flush_requested = False
+            return flushed
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Flush everything pending, then stop the writer thread."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+        logger.info(f"Ingest buffer closed: {self.stats}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while True:
+                    due = self._due_collections()
+                    if due or (self.closed and not self.pending):
+                        break
+                    self.condition.wait(self._next_deadline())
+                if not due:
+                    return
+
+                # take every due collection's records at once: one group commit per collection
+                batches = []
+                for collection_name in due:
+                    batches.append((collection_name, self.pending.pop(collection_name),
+                                    self.pending_rows.pop(collection_name)))
+                    self.oldest.pop(collection_name)
+                self.in_flight = sum(rows for _, _, rows in batches)
+                self.total_pending -= self.in_flight
+                self.condition.notify_all()
+
+            for collection_name, items, rows in batches:
+                self._write(collection_name, items, rows)
+
+            with self.condition:
+                self.in_flight = 0
+                self.condition.notify_all()
+
+    def _due_collections(self):
+        if self.closed or self.flush_requested:
+            return list(self.pending)
+        now = time.monotonic()
+        return [collection_name for collection_name in self.pending
+                if self.pending_rows[collection_name] >= self.max_batch_size
+                or now - self.oldest[collection_name] >= self.flush_interval]
+
+    def _next_deadline(self):
+        if not self.oldest:
+            return None
+        return max(0.0, min(self.oldest.values()) + self.flush_interval - time.monotonic())
+
+    def _write(self, collection_name, items, rows):
+        # convert once, so every attempt sends the same records
+        records = list(self._iter_records(items))
+        for attempt in range(self.max_retries + 1):
+            try:
+                start = time.perf_counter()
+                self.writer(collection_name, records)
+                self.stats["records_written"] += rows
+                self.stats["batches_written"] += 1
+                logger.debug(f"Flushed {rows} record(s) to {collection_name} in {time.perf_counter() - start:.4f}s")
+                return
+            except Exception as e:
+                self.stats["write_errors"] += 1
+                logger.error(f"Failed to flush {rows} record(s) to {collection_name} "
+                             f"(attempt {attempt + 1} of {self.max_retries + 1}). Error: {e}")
+                time.sleep(min(0.1 * 2 ** attempt, 2.0))
+        self.stats["records_dropped"] += rows
+        logger.error(f"Dropped {rows} record(s) for {collection_name} after {self.max_retries + 1} failed attempts")
+
+    def _iter_records(self, items):
+        # DataFrames are converted on the writer thread, keeping that cost off the collection path
+        for item in items:
+            if isinstance(item, pd.DataFrame):
+                yield from frame_for_storage(item).to_dict("records")
+            else:
+                yield from item
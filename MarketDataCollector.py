@@ -182,6 +182,9 @@ def get_data(tickers: List[str], sources: Optional[List[str]] = None) -> pd.Data
 
     # Loop through the tickers
     for ticker in tickers:
+        # The data of this ticker from every source, stored under its symbol
+        ticker_data = pd.DataFrame()
+
         # Fetch data for each ticker using ThreadPoolExecutor for parallel processing
         with ThreadPoolExecutor() as executor:
             futures = {executor.submit(get_data_from_source, ticker, source): source for source in sources}
@@ -200,12 +203,20 @@ def get_data(tickers: List[str], sources: Optional[List[str]] = None) -> pd.Data
                     # Add a print statement to check the data after normalization
                     print(f"Data after normalization ({ticker}, {source}):", data)
 
+                    # keep the ticker's bars on their own first, so a failed merge below never loses them;
+                    # where sources overlap, the first source to answer wins
+                    ticker_data = data if ticker_data.empty else ticker_data.combine_first(data)
+
                     merged_data = merged_data.join(data, how="outer")
                 except DataCollectionError as e:
                     logger.warning(f"Failed to get data from {e.source} for {e.ticker}: {e}")
                 except Exception as e:
                     logger.error(f"Unexpected error: {e}")
 
+        # Store the ticker's data in the DataStorageManager
+        if not ticker_data.empty:
+            store_data(ticker_data.sort_index(), ticker)
+
     # Sort the merged data by date
     merged_data.sort_index(inplace=True)
 
@@ -213,23 +224,52 @@ def get_data(tickers: List[str], sources: Optional[List[str]] = None) -> pd.Data
     if config.get("additional_data_processing"):
         merged_data = apply_additional_data_processing(merged_data)
 
-    # Store the merged data in the DataStorageManager
-    store_data(merged_data)
     logger.info(f"Successfully collected data for {tickers}")
 
     return merged_data
-def store_data(data: pd.DataFrame) -> None:
-                        """
-    Store the collected data in the DataStorageManager.
+
+
+# Write-behind buffer that store_data hands collected data to, see set_ingest_buffer
+ingest_buffer = None
+
+
+def set_ingest_buffer(buffer) -> None:
+    """
+    Set the write-behind buffer used to store collected data.
 
     Parameters:
-    data (pandas.DataFrame): A dataframe containing the collected data.
+    buffer (IngestBuffer): A buffer writing to storage, e.g.
+        IngestBuffer(DataStorageManager("market_data").upsert_bars), whose upserts on (symbol, date)
+        make retried writes harmless. store_data hands it records with "symbol" and "date" fields.
+        None disables storage.
+
+    Returns:
+    None
+    """
+    global ingest_buffer
+    ingest_buffer = buffer
+
+
+def store_data(data: pd.DataFrame, symbol: str, collection_name: str = "bars") -> None:
+    """
+    Store the collected data for one symbol in the DataStorageManager.
+
+    The data is queued on the write-behind ingest buffer and written by its
+    background thread, so slow storage never stalls data collection.
+
+    Parameters:
+    data (pandas.DataFrame): A dataframe containing the collected bars of one symbol, indexed by date.
+        The index is stored as the "date" field whatever its name, e.g. "Date" in Yahoo data.
+    symbol (str): The symbol of the bars, stored with each of them.
+    collection_name (str): The collection to store the data in.
 
     Returns:
     None
     """
-    # Implement the logic to store the data using your preferred DataStorageManager.
-pass
+    if ingest_buffer is None:
+        logger.warning("No ingest buffer configured, collected data was not stored")
+        return
+    ingest_buffer.put(collection_name, data.rename_axis("date").assign(symbol=symbol))
 
 
 def apply_additional_data_processing(data: pd.DataFrame) -> pd.DataFrame:
@@ -0,0 +1,162 @@
+# MmapBarStore.py
+
+"""
+MmapBarStore.py
+
+An append-only, memory-mapped bar store for backtests. Each ticker gets a
+directory with one raw fixed-dtype column file per field and a date index:
+
+    <root_path>/<symbol>/meta.json
+    <root_path>/<symbol>/date.i64      (int64 milliseconds since the epoch)
+    <root_path>/<symbol>/<field>.bin   (one value per bar, dtype from meta.json)
+
+Readers map the files read-only, so any number of backtest processes share the
+same pages in the OS page cache and get NumPy views without parsing or copying.
+"""
+
+import json
+import logging
+import os
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from DataStorageManager import DEFAULT_BAR_FIELDS
+
+logger = logging.getLogger(__name__)
+
+DATE_FILE = "date.i64"
+META_FILE = "meta.json"
+DATE_DTYPE = np.dtype("<i8")
+
+
+class MmapBarStore:
+    """Append-only column files per ticker, read back as memory-mapped NumPy arrays."""
+
+    def __init__(self, root_path: str = "mmap_store", fields: Sequence[str] = DEFAULT_BAR_FIELDS,
+                 dtypes: Optional[Dict[str, str]] = None) -> None:
+        """
+        Parameters:
+        root_path (str): The directory holding one sub-directory per ticker.
+        fields (list[str]): The bar fields stored for new tickers.
+        dtypes (dict): Per-field dtypes for new tickers. Fields default to float64.
+        """
+        self.root_path = root_path
+        self.fields = list(fields)
+        self.dtypes = {field: np.dtype((dtypes or {}).get(field, "<f8")).str for field in self.fields}
+        os.makedirs(self.root_path, exist_ok=True)
+
+    def symbols(self):
+        return sorted(name for name in os.listdir(self.root_path)
+                      if os.path.exists(os.path.join(self.root_path, name, META_FILE)))
+
+    def append(self, symbol: str, bars: pd.DataFrame) -> int:
+        """
+        Append bars for a ticker. Bars must be newer than everything already stored.
+
+        Parameters:
+        symbol (str): The ticker symbol.
+        bars (pandas.DataFrame): Bars indexed by date with a column for every stored field.
+
+        Returns:
+        int: The number of bars appended.
+
+        Raises:
+        ValueError: If the bars overlap or precede the stored history.
+        """
+        if bars.empty:
+            return 0
+        symbol_path = os.path.join(self.root_path, symbol)
+        meta = self._read_meta(symbol)
+        if meta is None:
+            os.makedirs(symbol_path, exist_ok=True)
+            meta = {"fields": self.fields, "dtypes": self.dtypes}
+            with open(os.path.join(symbol_path, META_FILE), "w") as f:
+                json.dump(meta, f)
+
+        bars = bars.sort_index()
+        dates = pd.DatetimeIndex(bars.index).as_unit("ms").asi8.astype(DATE_DTYPE)
+        if np.any(np.diff(dates) <= 0):
+            raise ValueError(f"Bars for {symbol} contain duplicate dates")
+        stored_dates = self._map(symbol, DATE_FILE, DATE_DTYPE)
+        if len(stored_dates) and dates[0] <= stored_dates[-1]:
+            raise ValueError(f"Bars for {symbol} must start after the last stored date "
+                             f"{pd.Timestamp(int(stored_dates[-1]), unit='ms')}")
+
+        # the date index is written last: its length is the committed row count,
+        # so a reader never sees a row whose fields are only partly written
+        rows = len(stored_dates)
+        for field in meta["fields"]:
+            self._truncate(symbol, self._field_file(field), rows, np.dtype(meta["dtypes"][field]))
+            values = bars[field].to_numpy(dtype=meta["dtypes"][field])
+            with open(os.path.join(symbol_path, self._field_file(field)), "ab") as f:
+                f.write(values.tobytes())
+        with open(os.path.join(symbol_path, DATE_FILE), "ab") as f:
+            f.write(dates.tobytes())
+
+        logger.info(f"Appended {len(bars)} bar(s) for {symbol} ({rows + len(bars)} total)")
+        return len(bars)
+
+    def read(self, symbol: str, start=None, end=None, fields: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Map a ticker's history without copying it.
+
+        Parameters:
+        symbol (str): The ticker symbol.
+        start, end: Inclusive date bounds. If None, the range is open on that side.
+        fields (list[str]): The fields to map. If None, map every stored field.
+
+        Returns:
+        dict: "date" (int64 milliseconds since the epoch) and one read-only array per field,
+        all views over the memory-mapped files.
+        """
+        meta = self._read_meta(symbol)
+        if meta is None:
+            raise KeyError(f"No bars stored for {symbol}")
+        fields = meta["fields"] if fields is None else fields
+
+        dates = self._map(symbol, DATE_FILE, DATE_DTYPE)
+        lower = 0 if start is None else np.searchsorted(dates, self._to_ms(start), side="left")
+        upper = len(dates) if end is None else np.searchsorted(dates, self._to_ms(end), side="right")
+
+        columns = {"date": dates[lower:upper]}
+        for field in fields:
+            values = self._map(symbol, self._field_file(field), np.dtype(meta["dtypes"][field]), len(dates))
+            columns[field] = values[lower:upper]
+        return columns
+
+    def read_frame(self, symbol: str, start=None, end=None, fields: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        # convenience for code that expects a DataFrame indexed by date; this copies the data
+        columns = self.read(symbol, start, end, fields)
+        index = pd.DatetimeIndex(columns.pop("date").astype("datetime64[ms]"), name="date")
+        return pd.DataFrame({field: np.array(values) for field, values in columns.items()}, index=index)
+
+    def _map(self, symbol, file_name, dtype, rows=None):
+        path = os.path.join(self.root_path, symbol, file_name)
+        size = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+        rows = size if rows is None else min(rows, size)
+        if rows == 0:
+            # numpy cannot map an empty file
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+
+    def _truncate(self, symbol, file_name, rows, dtype):
+        # drop bytes left behind by an append that failed before its dates were committed
+        path = os.path.join(self.root_path, symbol, file_name)
+        if os.path.exists(path) and os.path.getsize(path) > rows * dtype.itemsize:
+            with open(path, "r+b") as f:
+                f.truncate(rows * dtype.itemsize)
+
+    def _read_meta(self, symbol):
+        path = os.path.join(self.root_path, symbol, META_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _field_file(self, field):
+        return f"{field}.bin"
+
+    def _to_ms(self, value):
+        return np.datetime64(pd.Timestamp(value), "ms").astype(DATE_DTYPE)
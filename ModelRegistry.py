@@ -0,0 +1,216 @@
+# ModelRegistry.py
+
+"""
+ModelRegistry.py
+
+Content-addressed storage for trained models. A model is filed under a hash
+of its configuration and its training data, so different models never
+overwrite each other and retraining an identical model can be skipped. Loaded
+models are kept in a small LRU cache, so backtests and evaluations reuse the
+model in memory instead of reading and rebuilding it from disk on every call.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import keras
+except ImportError:
+    keras = None
+
+logger = logging.getLogger(__name__)
+
+MODEL_SUFFIX = ".h5"
+
+
+def data_fingerprint(data) -> str:
+    """Hash a DataFrame, Series or array by its values (and index), without serializing it."""
+    digest = hashlib.sha256()
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        columns = data.columns if isinstance(data, pd.DataFrame) else [data.name]
+        digest.update(json.dumps([str(column) for column in columns]).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    else:
+        values = np.ascontiguousarray(data)
+        digest.update(f"{values.dtype.str}{values.shape}".encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def model_key(config: dict, data) -> str:
+    """
+    The registry key of a model.
+
+    Parameters:
+    config (dict): Everything that shapes the model: architecture, training parameters, periods.
+    data: The training data, a DataFrame, Series or array.
+
+    Returns:
+    str: A SHA-256 hex digest of the config and the data.
+    """
+    canonical = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(f"{canonical}:{data_fingerprint(data)}".encode()).hexdigest()
+
+
+class ModelRegistry:
+    """Models on disk keyed by content, with a bounded cache of loaded models."""
+
+    def __init__(self, root_path: str = "models", max_models: int = 4, loader: Optional[Callable] = None) -> None:
+        """
+        Parameters:
+        root_path (str): The directory holding the model files and their metadata.
+        max_models (int): The number of loaded models kept in memory.
+        loader (callable): Loads a model file, defaults to keras.models.load_model.
+        """
+        self.root_path = root_path
+        self.max_models = max_models
+        self.loader = loader
+        self.models = OrderedDict()  # key -> loaded model, least recently used first
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "loads": 0, "saves": 0, "evictions": 0}
+        os.makedirs(root_path, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root_path, key + MODEL_SUFFIX)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.models or os.path.exists(self.path(key))
+
+    def save(self, key: str, model, metadata: Optional[dict] = None) -> str:
+        """
+        File a trained model under its key and keep it in the cache.
+
+        Parameters:
+        key (str): The model's key, see model_key.
+        model: The model; it must have a save(path) method, as Keras models do.
+        metadata (dict): JSON-serializable details stored next to the model, e.g. its config and loss.
+
+        Returns:
+        str: The model file path.
+        """
+        path = self.path(key)
+        # write under a temporary name and rename, so concurrent writers of the same key never
+        # leave a partial file behind; identical keys hold identical models, so the last rename wins harmlessly
+        handle, temporary = tempfile.mkstemp(suffix=MODEL_SUFFIX, dir=self.root_path)
+        os.close(handle)
+        try:
+            model.save(temporary)
+            # the metadata goes first, so a registered model always has its metadata
+            if metadata is not None:
+                with open(os.path.join(self.root_path, key + ".json"), "w") as f:
+                    json.dump(metadata, f, indent=2, default=str)
+            os.replace(temporary, path)
+        except Exception as e:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            logger.error(f"Failed to save model {key}. Error: {e}")
+            raise
+        self.stats["saves"] += 1
+        self._cache(key, model)
+        logger.info(f"Saved model {key} to {path}")
+        return path
+
+    def load(self, key: str, cached: bool = True):
+        """
+        Get a model, from memory if it is cached and from disk otherwise.
+
+        Parameters:
+        key (str): The model's key.
+        cached (bool): If False, read a private copy from disk that is neither served from nor added to the
+            cache, for callers that modify the model, e.g. to train it further; the cached model is shared.
+
+        Raises:
+        KeyError: If no model is filed under key.
+        """
+        if cached:
+            with self.lock:
+                model = self.models.get(key)
+                if model is not None:
+                    self.models.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return model
+
+        path = self.path(key)
+        if not os.path.exists(path):
+            raise KeyError(f"No model registered under {key}")
+        loader = self.loader
+        if loader is None:
+            if keras is None:
+                raise ImportError("keras module not found. Please install it using 'pip install keras'")
+            loader = keras.models.load_model
+        try:
+            model = loader(path)
+        except Exception as e:
+            logger.error(f"Failed to load model {key} from {path}. Error: {e}")
+            raise
+        self.stats["loads"] += 1
+        if cached:
+            self._cache(key, model)
+        return model
+
+    def save_artifact(self, key: str, name: str, artifact) -> str:
+        """
+        File a picklable object fitted alongside a model, e.g. its feature scaler, under the model's key.
+
+        Returns:
+        str: The artifact file path.
+        """
+        path = os.path.join(self.root_path, f"{key}.{name}.pkl")
+        handle, temporary = tempfile.mkstemp(suffix=".pkl", dir=self.root_path)
+        try:
+            with os.fdopen(handle, "wb") as f:
+                pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, path)
+        except Exception as e:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            logger.error(f"Failed to save artifact {name} of model {key}. Error: {e}")
+            raise
+        return path
+
+    def load_artifact(self, key: str, name: str):
+        """
+        Get an object saved with save_artifact.
+
+        Raises:
+        KeyError: If the model has no artifact of that name.
+        """
+        path = os.path.join(self.root_path, f"{key}.{name}.pkl")
+        if not os.path.exists(path):
+            raise KeyError(f"No artifact {name} registered under {key}")
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def metadata(self, key: str) -> Optional[dict]:
+        """The metadata saved with a model, or None."""
+        path = os.path.join(self.root_path, key + ".json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def evict(self, key: Optional[str] = None) -> None:
+        """Drop a model (or every model, if key is None) from memory; the files stay."""
+        with self.lock:
+            if key is None:
+                self.models.clear()
+            else:
+                self.models.pop(key, None)
+
+    def _cache(self, key, model):
+        with self.lock:
+            self.models[key] = model
+            self.models.move_to_end(key)
+            while len(self.models) > self.max_models:
+                self.models.popitem(last=False)
+                self.stats["evictions"] += 1
@@ -0,0 +1,140 @@
+# NumpyModel.py
+
+"""
+NumpyModel.py
+
+Inference without the deep-learning stack for the Dense models built by
+StrategyCreator.create_model. export_dense_model writes the trained weights
+and activations of every Dense layer to one compressed .npz file; Dropout
+layers are skipped, as they pass their input through unchanged at inference.
+NumpyDenseModel reads that file and runs the forward pass as a few matrix
+products, so a live worker only needs NumPy to score signals.
+"""
+
+import logging
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# layers that are the identity at inference
+PASSTHROUGH_LAYERS = ("Dropout", "InputLayer")
+
+
+def relu(x):
+    return np.maximum(x, 0.0, out=x)
+
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def softmax(x):
+    x = x - x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    return x / x.sum(axis=-1, keepdims=True)
+
+
+def elu(x):
+    return np.where(x > 0, x, np.expm1(np.minimum(x, 0.0)))
+
+
+ACTIVATIONS = {"linear": lambda x: x, "relu": relu, "sigmoid": sigmoid, "tanh": np.tanh, "softmax": softmax,
+               "elu": elu}
+
+
+def export_dense_model(model, path: str, dtype: str = "float32") -> str:
+    """
+    Write a trained Dense/Dropout model's weights to a compressed .npz file.
+
+    Parameters:
+    model: A Keras Sequential model of Dense and Dropout layers, as built by StrategyCreator.create_model.
+    path (str): The file to write.
+    dtype (str): The stored weight type; float32 halves the file and the matrix products of float64.
+
+    Returns:
+    str: The path written.
+
+    Raises:
+    ValueError: If the model has a layer other than Dense and Dropout, or an unsupported activation.
+    """
+    arrays = {}
+    activations = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in PASSTHROUGH_LAYERS:
+            continue
+        if kind != "Dense":
+            raise ValueError(f"Cannot export layer {layer.name} of type {kind}, only Dense and Dropout")
+        activation = layer.get_config()["activation"]
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Cannot export layer {layer.name}: unsupported activation {activation}")
+        kernel, bias = layer.get_weights()
+        arrays[f"kernel_{len(activations)}"] = np.asarray(kernel, dtype=dtype)
+        arrays[f"bias_{len(activations)}"] = np.asarray(bias, dtype=dtype)
+        activations.append(activation)
+
+    try:
+        with open(path, "wb") as f:
+            np.savez_compressed(f, activations=np.array(activations), **arrays)
+    except Exception as e:
+        logger.error(f"Failed to export model to {path}. Error: {e}")
+        raise
+    logger.info(f"Exported {len(activations)} Dense layer(s) to {path}")
+    return path
+
+
+class NumpyDenseModel:
+    """The forward pass of an exported Dense model in plain NumPy."""
+
+    def __init__(self, layers: Sequence[Tuple[np.ndarray, np.ndarray, str]]) -> None:
+        """
+        Parameters:
+        layers (list[tuple]): (kernel, bias, activation name) of every Dense layer, input first.
+
+        Raises:
+        ValueError: If an activation is unsupported or the layer shapes do not chain.
+        """
+        self.layers: List[Tuple[np.ndarray, np.ndarray, str]] = []
+        for number, (kernel, bias, activation) in enumerate(layers):
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation {activation} in layer {number}")
+            if self.layers and self.layers[-1][0].shape[1] != kernel.shape[0]:
+                raise ValueError(f"Layer {number} takes {kernel.shape[0]} input(s), "
+                                 f"the layer before it gives {self.layers[-1][0].shape[1]}")
+            self.layers.append((kernel, bias, activation))
+        self.dtype = self.layers[0][0].dtype if self.layers else np.dtype("float32")
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyDenseModel":
+        """Read a model written by export_dense_model."""
+        with np.load(path) as archive:
+            activations = [str(activation) for activation in archive["activations"]]
+            return cls([(archive[f"kernel_{number}"], archive[f"bias_{number}"], activation)
+                        for number, activation in enumerate(activations)])
+
+    @property
+    def input_shape(self):
+        # matches a Keras Dense model's input_shape, (None, features)
+        return (None, self.layers[0][0].shape[0])
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Run the forward pass.
+
+        Parameters:
+        X (array-like): One input row per sample, (samples, features), or a single row.
+
+        Returns:
+        numpy.ndarray: The last layer's output per sample, e.g. the class probabilities.
+        """
+        x = np.asarray(X, dtype=self.dtype)
+        single = x.ndim == 1
+        x = np.atleast_2d(x)
+        for kernel, bias, activation in self.layers:
+            x = ACTIVATIONS[activation](x @ kernel + bias)
+        return x[0] if single else x
+
+    # the Keras name, so a NumpyDenseModel can stand in for the Keras model, e.g. in InferenceService
+    predict_on_batch = predict
@@ -0,0 +1,233 @@
+# ParallelSearch.py
+
+"""
+ParallelSearch.py
+
+Runs a parameter search on a pool of worker processes. The feature data is
+placed in shared memory once and every worker maps it read-only instead of
+receiving a pickled copy per task; each worker caps the thread pools of the
+numeric and deep-learning backends so that one process per core does not
+oversubscribe the machine; results are yielded as they finish. A SearchPool
+keeps the workers alive across several searches.
+"""
+
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context, shared_memory
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# environment variables read by the BLAS/OpenMP runtimes and TensorFlow when they start
+THREAD_LIMIT_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS",
+                          "VECLIB_MAXIMUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS")
+
+# the column name of a shared frame's index
+INDEX_KEY = "__index__"
+
+# set in each worker by _initialize_worker
+_worker_arrays = None
+_worker_blocks = []
+
+
+class SharedArrays:
+    """NumPy arrays copied once into shared memory blocks that worker processes can map."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]) -> None:
+        """
+        Parameters:
+        arrays (dict): Named arrays of a fixed-size dtype.
+        """
+        self.blocks = []
+        self.spec = {}  # name -> (block name, shape, dtype), small enough to send to every worker
+        try:
+            for name, values in arrays.items():
+                values = np.ascontiguousarray(values)
+                if values.dtype.hasobject:
+                    raise ValueError(f"Array {name} has dtype object and cannot be shared")
+                block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                self.blocks.append(block)
+                np.ndarray(values.shape, values.dtype, buffer=block.buf)[...] = values
+                self.spec[name] = (block.name, values.shape, values.dtype.str)
+        except Exception:
+            self.close()
+            raise
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "SharedArrays":
+        """Share a frame's index and numeric columns; rebuild it in a worker with shared_frame()."""
+        arrays = {INDEX_KEY: frame.index.to_numpy()}
+        for column in frame.columns:
+            if not pd.api.types.is_numeric_dtype(frame[column]):
+                raise ValueError(f"Column {column} is not numeric and cannot be shared")
+            arrays[column] = frame[column].to_numpy()
+        return cls(arrays)
+
+    def close(self) -> None:
+        """Release and remove the shared memory blocks."""
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def attach_arrays(spec: Dict[str, Tuple[str, tuple, str]]) -> Dict[str, np.ndarray]:
+    """Map the arrays described by SharedArrays.spec as read-only views."""
+    arrays = {}
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        # keep the block open for as long as the views are used
+        _worker_blocks.append(block)
+        values = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        values.flags.writeable = False
+        arrays[name] = values
+    return arrays
+
+
+def shared_frame(arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """
+    Rebuild a frame shared with SharedArrays.from_frame. Its columns are the read-only shared views, not
+    copies; pandas copies a column on write, so a worker can modify its frame without touching the others.
+    """
+    columns = {name: values for name, values in arrays.items() if name != INDEX_KEY}
+    return pd.DataFrame(columns, index=arrays[INDEX_KEY], copy=False)
+
+
+def limit_threads(threads: int) -> None:
+    """
+    Cap the thread pools of the numeric and deep-learning backends in this process.
+
+    The environment variables only take effect for libraries loaded afterwards, so call this before
+    importing them; an already imported TensorFlow is configured directly.
+    """
+    for variable in THREAD_LIMIT_VARIABLES:
+        os.environ[variable] = str(threads)
+    try:
+        if "tensorflow" in sys.modules:
+            tensorflow = sys.modules["tensorflow"]
+            tensorflow.config.threading.set_intra_op_parallelism_threads(threads)
+            tensorflow.config.threading.set_inter_op_parallelism_threads(threads)
+    except Exception as e:
+        # TensorFlow refuses once its runtime has started; the process keeps its current limits
+        logger.warning(f"Could not limit TensorFlow threads. Error: {e}")
+
+
+def _initialize_worker(spec, threads):
+    global _worker_arrays
+    limit_threads(threads)
+    _worker_arrays = attach_arrays(spec)
+
+
+def _run_task(function, params):
+    return function(params, _worker_arrays)
+
+
+class SearchPool:
+    """
+    A process pool whose workers map the shared arrays once, for running several searches on the same
+    workers, e.g. the rungs of a successive-halving search, without starting a new pool for each.
+    """
+
+    def __init__(self, arrays: Optional[Dict[str, np.ndarray]] = None, max_workers: Optional[int] = None,
+                 threads_per_worker: int = 1, start_method: str = "spawn") -> None:
+        """
+        Parameters:
+        arrays (dict or SharedArrays): Data every evaluation reads, shared instead of pickled per task.
+            Arrays passed as a dict are copied into shared memory the pool releases on close().
+        max_workers (int): The number of worker processes, defaults to one per core.
+        threads_per_worker (int): The thread limit for each worker's numeric and deep-learning backends.
+        start_method (str): The multiprocessing start method. "spawn" is safe with TensorFlow, which
+            must not be used across fork.
+        """
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.arrays = arrays
+        self.shared = arrays if isinstance(arrays, SharedArrays) else SharedArrays(arrays or {})
+        try:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=get_context(start_method),
+                                                initializer=_initialize_worker,
+                                                initargs=(self.shared.spec, threads_per_worker))
+        except Exception:
+            self._release()
+            raise
+
+    def search(self, function: Callable, grid: Iterable[dict]) -> Iterator[Tuple[dict, object]]:
+        """
+        Evaluate every point of a parameter grid on the pool's workers.
+
+        Parameters:
+        function (callable): A module-level function called in a worker as function(params, arrays),
+            where arrays are read-only views of the shared arrays. Its return value must be picklable.
+        grid (iterable of dict): The parameter sets to evaluate.
+
+        Yields:
+        tuple: (params, result) in completion order. If an evaluation raised, result is the exception.
+        """
+        grid = list(grid)
+        futures = {self.executor.submit(_run_task, function, params): params for params in grid}
+        logger.info(f"Searching {len(grid)} parameter set(s) on {self.max_workers} worker(s)")
+        try:
+            for future in as_completed(futures):
+                params = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to evaluate {params}. Error: {e}")
+                    result = e
+                yield params, result
+        finally:
+            # a search abandoned early leaves no queued work behind for the next search
+            for future in futures:
+                future.cancel()
+
+    def close(self) -> None:
+        """Stop the workers and release the shared memory the pool created."""
+        try:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        finally:
+            self._release()
+
+    def _release(self):
+        if self.shared is not self.arrays:
+            self.shared.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def parallel_search(function: Callable, grid: Iterable[dict], arrays: Optional[Dict[str, np.ndarray]] = None,
+                    max_workers: Optional[int] = None, threads_per_worker: int = 1,
+                    start_method: str = "spawn") -> Iterator[Tuple[dict, object]]:
+    """
+    Evaluate every point of a parameter grid on a process pool.
+
+    Parameters:
+    function (callable): A module-level function called in a worker as function(params, arrays),
+        where arrays are read-only views of the shared arrays. Its return value must be picklable.
+    grid (iterable of dict): The parameter sets to evaluate.
+    arrays (dict or SharedArrays): Data every evaluation reads, shared instead of pickled per task.
+    max_workers (int): The number of worker processes, defaults to one per core.
+    threads_per_worker (int): The thread limit for each worker's numeric and deep-learning backends.
+    start_method (str): The multiprocessing start method. "spawn" is safe with TensorFlow, which
+        must not be used across fork.
+
+    Yields:
+    tuple: (params, result) in completion order. If an evaluation raised, result is the exception.
+    """
+    grid = list(grid)
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(grid) or 1))
+    with SearchPool(arrays, max_workers, threads_per_worker, start_method) as pool:
+        yield from pool.search(function, grid)
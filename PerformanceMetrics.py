@@ -0,0 +1,170 @@
+# PerformanceMetrics.py
+
+"""
+PerformanceMetrics.py
+
+Strategy performance metrics from a per-bar return array: Sharpe and Sortino
+ratios, maximum drawdown, profit factor, win rate and exposure. compute_metrics
+scores a whole backtest with a handful of NumPy reductions over the same
+array, without building filtered copies of it; MetricsAccumulator keeps the
+same metrics up to date in O(1) per new return, over the whole stream or a
+rolling window, for live monitoring. Variances come from the mean and the sum
+of squared deviations (Welford's method), not from the sum of squares, which
+loses precision on long streams.
+"""
+
+import math
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+METRIC_NAMES = ("Total Return", "Sharpe Ratio", "Sortino Ratio", "Max Drawdown", "Profit Factor", "Win Rate",
+                "Exposure")
+
+
+def _ratios(count, mean, squared_deviations, downside_squares, gross_profit, gross_loss, wins, active, exposed,
+            periods_per_year):
+    # the metrics that follow from running sums; shared by compute_metrics and MetricsAccumulator
+    nan = float("nan")
+    if count == 0:
+        return {"Sharpe Ratio": nan, "Sortino Ratio": nan, "Profit Factor": nan, "Win Rate": nan, "Exposure": nan}
+    variance = squared_deviations / (count - 1) if count > 1 else 0.0
+    deviation = math.sqrt(max(variance, 0.0))
+    downside = math.sqrt(max(downside_squares, 0.0) / count)
+    annualize = math.sqrt(periods_per_year)
+    return {
+        "Sharpe Ratio": mean / deviation * annualize if deviation > 0 else nan,
+        "Sortino Ratio": mean / downside * annualize if downside > 0 else nan,
+        "Profit Factor": gross_profit / gross_loss if gross_loss > 0 else (math.inf if gross_profit > 0 else nan),
+        "Win Rate": wins / active if active else nan,
+        "Exposure": exposed / count,
+    }
+
+
+def compute_metrics(returns, positions=None, periods_per_year: int = TRADING_DAYS) -> dict:
+    """
+    Score a backtest's per-bar returns.
+
+    Parameters:
+    returns (array-like): The strategy's return over each bar, after costs.
+    positions (array-like): The position held over each bar; exposure is the share of bars with a non-zero
+        position. If None, the share of bars with a non-zero return.
+    periods_per_year (int): Bars per year, for annualizing the Sharpe and Sortino ratios.
+
+    Returns:
+    dict: "Total Return", "Sharpe Ratio", "Sortino Ratio" (mean over downside deviation), "Max Drawdown"
+    (the largest fall of the compounded equity from its peak, as a fraction), "Profit Factor" (gross profit
+    over gross loss), "Win Rate" (the share of bars with a non-zero return that gained) and "Exposure".
+    Undefined ratios are NaN.
+    """
+    returns = np.asarray(returns, dtype="float64")
+    gains = np.maximum(returns, 0.0)
+    losses = np.minimum(returns, 0.0)
+    active = np.count_nonzero(returns)
+    exposed = active if positions is None else np.count_nonzero(np.asarray(positions))
+
+    mean = returns.mean() if len(returns) else 0.0
+    deviations = returns - mean
+    metrics = _ratios(len(returns), mean, np.dot(deviations, deviations), np.dot(losses, losses), gains.sum(),
+                      -losses.sum(), np.count_nonzero(gains), active, exposed, periods_per_year)
+    equity = np.cumprod(1.0 + returns)
+    peak = np.maximum.accumulate(equity)
+    metrics["Total Return"] = float(equity[-1] - 1.0) if len(equity) else 0.0
+    metrics["Max Drawdown"] = float(np.max(1.0 - equity / peak, initial=0.0))
+    return {name: metrics[name] for name in METRIC_NAMES}
+
+
+class MetricsAccumulator:
+    """
+    The metrics of compute_metrics, updated in O(1) per return.
+
+    With a window, the Sharpe and Sortino ratios, profit factor, win rate and exposure cover the last window
+    returns, while "Total Return" and "Max Drawdown" still cover every return since the accumulator was created.
+    """
+
+    def __init__(self, window: Optional[int] = None, periods_per_year: int = TRADING_DAYS) -> None:
+        """
+        Parameters:
+        window (int): Keep the ratios over the last window returns only. If None, over every return.
+            "Total Return" and "Max Drawdown" are not windowed: they always cover the whole stream.
+        periods_per_year (int): Bars per year, for annualizing the Sharpe and Sortino ratios.
+        """
+        self.window = window
+        self.periods_per_year = periods_per_year
+        self.recent = deque()  # (return, exposed) pairs inside the window
+        self.count = 0
+        self.mean = 0.0
+        self.squared_deviations = 0.0
+        self.downside_squares = 0.0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.wins = 0
+        self.active = 0
+        self.exposed = 0
+        self.equity = 1.0
+        self.peak = 1.0
+        self.max_drawdown = 0.0
+
+    def update(self, value: float, position=None) -> dict:
+        """
+        Add the next bar's return.
+
+        Parameters:
+        value (float): The strategy's return over the bar.
+        position: The position held over the bar; see compute_metrics for how exposure is counted.
+
+        Returns:
+        dict: The current metrics, as from metrics().
+        """
+        value = float(value)
+        exposed = value != 0.0 if position is None else position != 0
+        if self.window is not None and len(self.recent) == self.window:
+            self._replace(*self.recent.popleft(), value, exposed)
+        else:
+            self._add(value, exposed)
+        if self.window is not None:
+            self.recent.append((value, exposed))
+
+        self.equity *= 1.0 + value
+        self.peak = max(self.peak, self.equity)
+        self.max_drawdown = max(self.max_drawdown, 1.0 - self.equity / self.peak)
+        return self.metrics()
+
+    def metrics(self) -> dict:
+        """The current metrics, keyed as in compute_metrics; "Total Return" and "Max Drawdown" cover every return."""
+        metrics = _ratios(self.count, self.mean, self.squared_deviations, self.downside_squares, self.gross_profit,
+                          self.gross_loss, self.wins, self.active, self.exposed, self.periods_per_year)
+        metrics["Total Return"] = self.equity - 1.0
+        metrics["Max Drawdown"] = self.max_drawdown
+        return {name: metrics[name] for name in METRIC_NAMES}
+
+    def _add(self, value, exposed):
+        # Welford's update of the mean and the squared deviations from it
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.squared_deviations += delta * (value - self.mean)
+        self._count(value, exposed, 1)
+
+    def _replace(self, old, old_exposed, value, exposed):
+        # slide a full window: drop its oldest return and add the new one, with the count unchanged
+        previous_mean = self.mean
+        self.mean += (value - old) / self.count
+        self.squared_deviations = max(
+            self.squared_deviations + (value - old) * (value - self.mean + old - previous_mean), 0.0)
+        self._count(old, old_exposed, -1)
+        self._count(value, exposed, 1)
+
+    def _count(self, value, exposed, sign):
+        # add (sign 1) or remove (sign -1) one return from the downside, profit and exposure tallies
+        if value < 0:
+            self.downside_squares += sign * value * value
+            self.gross_loss -= sign * value
+        elif value > 0:
+            self.gross_profit += sign * value
+            self.wins += sign
+        self.active += sign * (value != 0.0)
+        self.exposed += sign * bool(exposed)
@@ -0,0 +1,169 @@
+# QueryCache.py
+
+"""
+QueryCache.py
+
+A byte-bounded LRU cache for query results. DataStorageManager reads through
+it, and its writes invalidate the entries for the symbols they touch, so hot
+symbols are served from memory until they change. Every invalidation bumps the
+collection's generation; a reader takes the generation before it queries, and
+put() refuses its result if a write invalidated the collection in between.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Iterable, Optional
+
+import pandas as pd
+
+
+def query_symbols(query) -> Optional[frozenset]:
+    """
+    Get the symbols a MongoDB filter is restricted to.
+
+    Parameters:
+    query (dict): A filter such as {"symbol": "AAPL"} or {"symbol": {"$in": [...]}}.
+
+    Returns:
+    frozenset: The symbols, or None if the filter can match any symbol.
+    """
+    if not isinstance(query, dict) or "symbol" not in query:
+        return None
+    condition = query["symbol"]
+    if isinstance(condition, str):
+        return frozenset([condition])
+    if isinstance(condition, dict) and set(condition) == {"$in"}:
+        return frozenset(condition["$in"])
+    if isinstance(condition, dict) and set(condition) == {"$eq"}:
+        return frozenset([condition["$eq"]])
+    return None
+
+
+def estimate_size(value) -> int:
+    """Estimate the memory held by a cached result in bytes."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) \
+            else int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(key) + estimate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class QueryCache:
+    """An LRU cache bounded by the estimated size of its entries."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: Optional[float] = None) -> None:
+        """
+        Parameters:
+        max_bytes (int): The total size of cached results before the least recently used are evicted.
+        ttl (float): Seconds before an entry expires, bounding staleness from writes made by other
+            processes. If None, entries live until evicted or invalidated.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (value, size, collection name, symbols, expiry)
+        self.current_bytes = 0
+        self.generations = {}  # collection name -> the number of invalidations of the collection
+        self.clears = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "stale_puts": 0}
+
+    def get(self, key: Hashable):
+        """Return the cached value for key, or None on a miss."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[4] is not None and entry[4] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def generation(self, collection_name: str) -> tuple:
+        """The collection's generation, taken before reading a result to put()."""
+        with self.lock:
+            return self.clears, self.generations.get(collection_name, 0)
+
+    def put(self, key: Hashable, value, collection_name: str, symbols: Optional[Iterable[str]] = None,
+            generation: Optional[tuple] = None) -> bool:
+        """
+        Cache a result.
+
+        Parameters:
+        key (hashable): The cache key.
+        value: The result to cache.
+        collection_name (str): The collection the result was read from.
+        symbols (iterable of str): The symbols the result covers. If None, any write to the
+            collection invalidates it.
+        generation (tuple): The collection's generation() from before the result was read. If the
+            collection has been invalidated since, the result may be stale and is not cached.
+
+        Returns:
+        bool: Whether the result was cached.
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return False
+        expiry = None if self.ttl is None else time.monotonic() + self.ttl
+        symbols = None if symbols is None else frozenset(symbols)
+        with self.lock:
+            if generation is not None and generation != (self.clears, self.generations.get(collection_name, 0)):
+                self.stats["stale_puts"] += 1
+                return False
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, size, collection_name, symbols, expiry)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.stats["evictions"] += 1
+        return True
+
+    def invalidate(self, collection_name: str, symbols: Optional[Iterable[str]] = None) -> int:
+        """
+        Drop the entries a write may have changed.
+
+        Parameters:
+        collection_name (str): The collection written to.
+        symbols (iterable of str): The symbols written. If None, drop every entry for the collection.
+
+        Returns:
+        int: The number of entries dropped.
+        """
+        symbols = None if symbols is None else frozenset(symbols)
+        with self.lock:
+            self.generations[collection_name] = self.generations.get(collection_name, 0) + 1
+            stale = [key for key, (_, _, entry_collection, entry_symbols, _) in self.entries.items()
+                     if entry_collection == collection_name
+                     and (symbols is None or entry_symbols is None or entry_symbols & symbols)]
+            for key in stale:
+                self._remove(key)
+            self.stats["invalidations"] += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+            self.clears += 1
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {**self.stats, "hit_rate": self.hit_rate(), "entries": len(self.entries),
+                    "bytes": self.current_bytes, "max_bytes": self.max_bytes}
+
+    def _remove(self, key):
+        self.current_bytes -= self.entries.pop(key)[1]
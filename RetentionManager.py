@@ -0,0 +1,294 @@
+# RetentionManager.py
+
+"""
+RetentionManager.py
+
+Tiered retention for stored bars. Bars flow from the finest tier to coarser
+ones (for example minute -> hourly -> daily): complete periods are rolled up
+with OHLCV aggregation and upserted into the next tier, and bars older than a
+tier's retention are then deleted or moved to an archive collection. Roll-ups
+are incremental, tracked by a per-tier watermark, and can run on a background
+thread. Every run re-reads a lateness allowance behind the watermark, so bars
+that arrive late are still rolled up, and archived bars are upserted on their
+(symbol, date) key, so a run interrupted between archiving and deleting can be
+repeated. Reads are routed to the coarsest tier that still meets the requested
+resolution.
+"""
+
+import itertools
+import logging
+import threading
+from typing import Optional, Sequence
+
+import pandas as pd
+from pymongo import ASCENDING, IndexModel
+
+from DataStorageManager import DEFAULT_BAR_FIELDS
+
+logger = logging.getLogger(__name__)
+
+STATE_COLLECTION = "retention_state"
+
+# expired bars are archived this many at a time
+ARCHIVE_BATCH_SIZE = 10000
+
+# how each bar field combines when bars are rolled into a coarser period
+OHLCV_AGGREGATION = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+
+
+def downsample_bars(bars: pd.DataFrame, rule: str, date_field: str = "date") -> pd.DataFrame:
+    """
+    Roll bars up into coarser bars.
+
+    Parameters:
+    bars (pandas.DataFrame): Bars with symbol, date and OHLCV columns, sorted by date within each symbol.
+    rule (str): A fixed pandas frequency such as "1h" or "1D".
+    date_field (str): The date column.
+
+    Returns:
+    pandas.DataFrame: One bar per symbol and period, dated at the start of the period.
+    """
+    aggregation = {field: how for field, how in OHLCV_AGGREGATION.items() if field in bars}
+    periods = bars[date_field].dt.floor(rule).rename(date_field)
+    rolled = bars.groupby([bars["symbol"], periods], sort=True).agg(aggregation)
+    return rolled.reset_index()
+
+
+class RetentionTier:
+    """One storage tier: a collection of bars at a fixed bar size, kept for a limited time."""
+
+    def __init__(self, collection_name: str, rule: str, retain: Optional[str] = None, archive: bool = False) -> None:
+        """
+        Parameters:
+        collection_name (str): The collection holding this tier's bars.
+        rule (str): The tier's bar size as a fixed pandas frequency, e.g. "1min", "1h" or "1D".
+        retain (str): How long bars are kept, e.g. "7D". If None, they are kept forever.
+        archive (bool): Move expired bars to "<collection_name>_archive" instead of deleting them.
+        """
+        self.collection_name = collection_name
+        self.rule = rule
+        self.bar_size = pd.Timedelta(rule)
+        self.retain = None if retain is None else pd.Timedelta(retain)
+        self.archive = archive
+
+
+class RetentionManager:
+    """Rolls bars up through tiers, expires old bars and routes reads to the right tier."""
+
+    def __init__(self, storage_manager, tiers: Sequence[RetentionTier], date_field: str = "date",
+                 lateness: str = "1h") -> None:
+        """
+        Parameters:
+        storage_manager (DataStorageManager): The storage holding every tier.
+        tiers (list[RetentionTier]): The tiers, ordered from the finest bars to the coarsest.
+        date_field (str): The date field of the stored bars.
+        lateness (str): How late a bar may arrive and still be rolled up, e.g. "1h". Every run rolls up
+            again the coarse periods within this allowance behind the watermark, and bars in them are
+            not expired until the watermark has moved past them by the allowance.
+        """
+        self.storage = storage_manager
+        self.tiers = sorted(tiers, key=lambda tier: tier.bar_size)
+        self.date_field = date_field
+        self.lateness = pd.Timedelta(lateness)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        # upserts into a tier or its archive and range reads need the (symbol, date) index
+        for tier in self.tiers:
+            names = [tier.collection_name] + ([self._archive_name(tier)] if tier.archive else [])
+            for name in names:
+                self.storage.db[name].create_indexes([
+                    IndexModel([("symbol", ASCENDING), (date_field, ASCENDING)], unique=True, name="symbol_date")])
+
+    def run_once(self, now=None) -> dict:
+        """
+        Roll up every complete period not yet rolled up, then expire bars past their retention.
+
+        Parameters:
+        now (datetime): The current time. If None, use the current UTC time.
+
+        Returns:
+        dict: Per tier collection, the number of bars rolled into it that were new or changed, and the
+        number expired from it.
+        """
+        now = pd.Timestamp.now(tz="UTC").tz_localize(None) if now is None else pd.Timestamp(now)
+        summary = {tier.collection_name: {"rolled_up": 0, "expired": 0} for tier in self.tiers}
+
+        for finer, coarser in zip(self.tiers, self.tiers[1:]):
+            summary[coarser.collection_name]["rolled_up"] = self._roll_up(finer, coarser, now)
+        for position, tier in enumerate(self.tiers):
+            if tier.retain is None:
+                continue
+            expire_before = now - tier.retain
+            # never drop bars the next tier has not absorbed yet, or may still roll up again with late bars
+            if position + 1 < len(self.tiers):
+                coarser = self.tiers[position + 1]
+                rolled_until = self._rolled_until(coarser)
+                expire_before = (min(expire_before, self._reroll_from(coarser, rolled_until))
+                                 if rolled_until is not None else None)
+            if expire_before is not None:
+                summary[tier.collection_name]["expired"] = self._expire(tier, expire_before)
+
+        logger.info(f"Retention run complete: {summary}")
+        return summary
+
+    def start(self, interval: float = 3600.0) -> None:
+        """Run the retention job every `interval` seconds on a background thread."""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, args=(interval,), name="retention", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def query(self, symbols=None, start=None, end=None, resolution: str = "1D",
+              fields: Sequence[str] = DEFAULT_BAR_FIELDS) -> pd.DataFrame:
+        """
+        Read bars at a resolution from the coarsest tier that meets it.
+
+        Recent bars the coarse tier has not rolled up yet are read from finer tiers, and
+        results from tiers finer than the requested resolution are downsampled to it.
+
+        Parameters:
+        symbols (str or list[str]): The symbols to read. If None, read all symbols.
+        start, end: Inclusive date bounds. If None, the range is open on that side.
+        resolution (str): The requested bar size, e.g. "1h" or "1D".
+        fields (list[str]): The bar fields to return.
+
+        Returns:
+        pandas.DataFrame: Columns symbol, date and fields, sorted by symbol and date.
+
+        Raises:
+        ValueError: If every tier is coarser than the requested resolution.
+        """
+        requested = pd.Timedelta(resolution)
+        eligible = [tier for tier in self.tiers if tier.bar_size <= requested]
+        if not eligible:
+            raise ValueError(f"No tier stores bars at {resolution} or finer")
+
+        frames = []
+        used_sizes = []
+        lower = None if start is None else pd.Timestamp(start)
+        upper_bound = None if end is None else pd.Timestamp(end)
+        # walk from the coarsest eligible tier to finer ones; each coarse tier covers up to its
+        # roll-up watermark and the finer tiers fill in the bars after it
+        for position in range(len(eligible) - 1, -1, -1):
+            tier = eligible[position]
+            if position == 0:
+                frames.append(self._read(tier, symbols, lower, upper_bound, fields))
+                used_sizes.append(tier.bar_size)
+                break
+            covered_until = self._rolled_until(tier)
+            if covered_until is None:
+                continue
+            last_covered = covered_until - pd.Timedelta(milliseconds=1)
+            upper = last_covered if upper_bound is None else min(upper_bound, last_covered)
+            if lower is None or lower <= upper:
+                frames.append(self._read(tier, symbols, lower, upper, fields))
+                used_sizes.append(tier.bar_size)
+            if upper_bound is not None and covered_until > upper_bound:
+                break
+            lower = covered_until if lower is None else max(lower, covered_until)
+
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return self._empty_frame(fields)
+        bars = pd.concat(frames, ignore_index=True).sort_values(["symbol", self.date_field], kind="stable")
+        if min(used_sizes) < requested:
+            bars = downsample_bars(bars, resolution, self.date_field)
+        return bars[["symbol", self.date_field, *fields]].reset_index(drop=True)
+
+    def _run(self, interval):
+        while not self.stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Retention run failed. Error: {e}")
+            self.stop_event.wait(interval)
+
+    def _roll_up(self, finer, coarser, now):
+        # only complete coarse periods are rolled up; the periods within the lateness allowance behind the
+        # watermark are rolled up again, and the upserts overwrite them with any bars that arrived late
+        cutoff = now.floor(coarser.rule)
+        rolled_until = self._rolled_until(coarser)
+        if rolled_until is None:
+            first = self.storage.db[finer.collection_name].find_one(
+                {}, {self.date_field: 1}, sort=[(self.date_field, ASCENDING)])
+            if first is None:
+                return 0
+            rolled_until = pd.Timestamp(first[self.date_field]).floor(coarser.rule)
+        else:
+            rolled_until = self._reroll_from(coarser, rolled_until)
+        if rolled_until >= cutoff:
+            return 0
+
+        date_range = {"$gte": rolled_until.to_pydatetime(), "$lt": cutoff.to_pydatetime()}
+        symbols = self.storage.db[finer.collection_name].distinct("symbol", {self.date_field: date_range})
+        rolled = 0
+        last_included = cutoff - pd.Timedelta(milliseconds=1)
+        # one symbol at a time keeps memory bounded by a single symbol's window
+        for symbol in symbols:
+            bars = self._read(finer, symbol, rolled_until, last_included, list(OHLCV_AGGREGATION))
+            if bars.empty:
+                continue
+            coarse_bars = downsample_bars(bars, coarser.rule, self.date_field)
+            stats = self.storage.upsert_bars(coarser.collection_name, coarse_bars,
+                                             key_fields=("symbol", self.date_field))
+            # periods rolled up again without late bars are unchanged and not counted
+            rolled += stats["inserted"] + stats["updated"]
+
+        self.storage.db[STATE_COLLECTION].update_one(
+            {"_id": coarser.collection_name}, {"$set": {"rolled_until": cutoff.to_pydatetime()}}, upsert=True)
+        logger.info(f"Rolled {finer.collection_name} into {rolled} {coarser.collection_name} bar(s) "
+                    f"from {rolled_until} to {cutoff}")
+        return rolled
+
+    def _expire(self, tier, expire_before):
+        query = {self.date_field: {"$lt": pd.Timestamp(expire_before).to_pydatetime()}}
+        collection = self.storage.db[tier.collection_name]
+        expired = collection.count_documents(query)
+        if not expired:
+            return 0
+        if tier.archive:
+            # upserts on (symbol, date), so archiving again after a run failed before the delete adds no
+            # duplicates; only the bars archived are deleted, so bars inserted meanwhile are never lost
+            expired = 0
+            documents = collection.find(query)
+            for batch in iter(lambda: list(itertools.islice(documents, ARCHIVE_BATCH_SIZE)), []):
+                ids = [document.pop("_id") for document in batch]
+                self.storage.upsert_bars(self._archive_name(tier), batch, key_fields=("symbol", self.date_field))
+                self.storage.delete_data(tier.collection_name, {"_id": {"$in": ids}}, many=True)
+                expired += len(ids)
+        else:
+            self.storage.delete_data(tier.collection_name, query, many=True)
+        logger.info(f"{'Archived' if tier.archive else 'Deleted'} {expired} bar(s) from {tier.collection_name} "
+                    f"older than {expire_before}")
+        return expired
+
+    def _reroll_from(self, coarser, rolled_until):
+        # the start of the oldest coarse period that may still receive late bars
+        return min(rolled_until, (rolled_until - self.lateness).floor(coarser.rule))
+
+    def _archive_name(self, tier):
+        return f"{tier.collection_name}_archive"
+
+    def _rolled_until(self, tier) -> Optional[pd.Timestamp]:
+        state = self.storage.db[STATE_COLLECTION].find_one({"_id": tier.collection_name})
+        return pd.Timestamp(state["rolled_until"]) if state else None
+
+    def _read(self, tier, symbols, start, end, fields) -> pd.DataFrame:
+        # reads straight from the cursor rather than through the query cache
+        chunks = list(self.storage.iter_query_frames(tier.collection_name, symbols, start, end, list(fields),
+                                                     self.date_field))
+        if not chunks:
+            return self._empty_frame(fields)
+        return pd.concat(chunks, ignore_index=True)
+
+    def _empty_frame(self, fields):
+        return pd.DataFrame({"symbol": pd.Series(dtype=object),
+                             self.date_field: pd.Series(dtype="datetime64[ms]"),
+                             **{field: pd.Series(dtype="float64") for field in fields}})
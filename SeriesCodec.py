@@ -0,0 +1,234 @@
+# SeriesCodec.py
+
+"""
+SeriesCodec.py
+
+Compact, vectorized encoding for stored price series. Prices are scaled to
+integers at a fixed number of decimals, volumes and dates are kept as
+integers; the integers are delta encoded (dates twice, so a regular calendar
+becomes runs of zeros), zigzag and varint encoded, and the result is block
+compressed with zlib. Every step is a NumPy array operation, so encoding and
+decoding never loop over values in Python.
+"""
+
+import struct
+import sys
+import time
+import zlib
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"MMC1"
+HEADER = struct.Struct("<4sBBbBq")  # magic, kind, delta order, decimals, has missing values, count
+
+KIND_PRICE = 0  # float64 scaled to integers at `decimals`
+KIND_INTEGER = 1  # int64
+KIND_DATE = 2  # datetime64[ms]
+
+# the delta order per kind: dates use delta-of-delta since bars are evenly spaced
+DELTA_ORDER = {KIND_PRICE: 1, KIND_INTEGER: 1, KIND_DATE: 2}
+
+# floats must stay below this magnitude to be cast to int64; the delta and zigzag steps wrap around modulo
+# 2 ** 64 and decode exactly, so any int64 round-trips
+INT64_LIMIT = 2.0 ** 63
+
+
+def encode_prices(values, decimals: int = 4, level: int = 6) -> bytes:
+    """
+    Encode a float series as scaled integers.
+
+    Parameters:
+    values (array-like): The prices. NaN values are kept.
+    decimals (int): The decimals kept; values are rounded to this precision.
+    level (int): The zlib compression level.
+
+    Returns:
+    bytes: The encoded series.
+
+    Raises:
+    ValueError: If a scaled value is infinite or outside int64 (above about 9.2e14 at 4 decimals).
+    """
+    values = np.asarray(values, dtype="float64")
+    missing = np.isnan(values)
+    scaled = np.round(np.where(missing, 0.0, values) * 10.0 ** decimals)
+    # check before the cast, which would wrap out-of-range values silently
+    if len(scaled) and not np.abs(scaled).max() < INT64_LIMIT:
+        raise ValueError(f"Prices below {INT64_LIMIT / 10.0 ** decimals:.6g} can be encoded at "
+                         f"{decimals} decimals, got {np.abs(values[~missing]).max():.6g}")
+    scaled = scaled.astype("int64")
+    return _encode(scaled, KIND_PRICE, decimals, missing, level)
+
+
+def encode_integers(values, level: int = 6) -> bytes:
+    """
+    Encode an integer series such as volumes. NaN values in float input are kept.
+
+    Raises:
+    ValueError: If a float value is infinite or outside int64.
+    """
+    values = np.asarray(values)
+    missing = np.isnan(values) if values.dtype.kind == "f" else np.zeros(len(values), dtype=bool)
+    present = np.where(missing, 0, values)
+    # float input is checked before the cast, which would wrap out-of-range values silently
+    if present.dtype.kind == "f" and len(present) and not np.abs(present).max() < INT64_LIMIT:
+        raise ValueError(f"Integers below {INT64_LIMIT:.6g} can be encoded, got {np.abs(present).max():.6g}")
+    integers = present.astype("int64")
+    return _encode(integers, KIND_INTEGER, 0, missing, level)
+
+
+def encode_dates(values, level: int = 6) -> bytes:
+    """Encode a date series at millisecond resolution."""
+    dates = np.asarray(pd.DatetimeIndex(values).as_unit("ms").asi8, dtype="int64")
+    return _encode(dates, KIND_DATE, 0, np.zeros(len(dates), dtype=bool), level)
+
+
+def decode(blob: bytes) -> np.ndarray:
+    """
+    Decode a series written by one of the encode functions.
+
+    Returns:
+    numpy.ndarray: float64 for prices, int64 (float64 if values were missing) for
+    integers and datetime64[ms] for dates.
+    """
+    magic, kind, order, decimals, has_missing, count = HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("Not an encoded series")
+    payload = zlib.decompress(blob[HEADER.size:])
+
+    missing = None
+    if has_missing:
+        mask_size = (count + 7) // 8
+        missing = np.unpackbits(np.frombuffer(payload[:mask_size], dtype="uint8"), count=count).astype(bool)
+        payload = payload[mask_size:]
+
+    values = _unzigzag(_varint_decode(np.frombuffer(payload, dtype="uint8"), count))
+    for _ in range(order):
+        values = np.cumsum(values)
+
+    if kind == KIND_DATE:
+        return values.astype("datetime64[ms]")
+    if kind == KIND_PRICE:
+        values = values / 10.0 ** decimals
+    if missing is not None:
+        values = values.astype("float64")
+        values[missing] = np.nan
+    return values
+
+
+def encode_columns(columns: Dict[str, np.ndarray], decimals: int = 4) -> Dict[str, bytes]:
+    # encodes a dict of bar columns: "date" as dates, whole-number volumes as integers
+    # and everything else (including fractional volumes) as prices
+    encoded = {}
+    for name, values in columns.items():
+        if name == "date":
+            encoded[name] = encode_dates(values)
+        elif name == "volume" and np.all(np.mod(np.nan_to_num(np.asarray(values, dtype="float64")), 1) == 0):
+            encoded[name] = encode_integers(values)
+        else:
+            encoded[name] = encode_prices(values, decimals)
+    return encoded
+
+
+def codec_report(columns: Dict[str, np.ndarray], decimals: int = 4, repeat: int = 5) -> Dict[str, dict]:
+    """
+    Measure compression and decode speed on real data.
+
+    Parameters:
+    columns (dict): Bar columns, e.g. from DataStorageManager.query_bars_bucketed.
+    decimals (int): The decimals kept for prices.
+    repeat (int): The number of decodes timed per column.
+
+    Returns:
+    dict: Per column: raw bytes (8 per value), encoded bytes, compression ratio,
+    decode throughput in values per second and the largest absolute round-trip error.
+    """
+    report = {}
+    for name, encoded in encode_columns(columns, decimals).items():
+        values = np.asarray(columns[name])
+        start = time.perf_counter()
+        for _ in range(repeat):
+            decoded = decode(encoded)
+        elapsed = (time.perf_counter() - start) / repeat
+        if name == "date":
+            error = float(np.max(np.abs(decoded.astype("int64") - pd.DatetimeIndex(values).as_unit("ms").asi8),
+                                 initial=0))
+        else:
+            error = float(np.nanmax(np.abs(decoded - values), initial=0.0))
+        raw_bytes = len(values) * 8
+        report[name] = {
+            "values": len(values),
+            "raw_bytes": raw_bytes,
+            "encoded_bytes": len(encoded),
+            "compression_ratio": raw_bytes / len(encoded) if encoded else 0.0,
+            "decode_values_per_second": len(values) / elapsed if elapsed > 0 else float("inf"),
+            "max_abs_error": error,
+        }
+    return report
+
+
+def _encode(integers, kind, decimals, missing, level):
+    deltas = integers
+    for _ in range(DELTA_ORDER[kind]):
+        deltas = np.diff(deltas, prepend=np.int64(0))
+    payload = _varint_encode(_zigzag(deltas))
+    has_missing = bool(missing.any())
+    if has_missing:
+        payload = np.packbits(missing).tobytes() + payload
+    header = HEADER.pack(MAGIC, kind, DELTA_ORDER[kind], decimals, has_missing, len(integers))
+    return header + zlib.compress(payload, level)
+
+
+def _zigzag(values):
+    values = values.astype("int64")
+    return ((values << 1) ^ (values >> 63)).view("uint64")
+
+
+def _unzigzag(values):
+    return ((values >> np.uint64(1)).astype("int64")) ^ -((values & np.uint64(1)).astype("int64"))
+
+
+def _varint_encode(values):
+    # LEB128: 7 bits per byte, high bit set on every byte but the last of a value
+    values = values.astype("uint64")
+    sizes = np.ones(len(values), dtype="int64")
+    for byte in range(1, 10):
+        sizes += values >= np.uint64(1) << np.uint64(7 * byte)
+    ends = np.cumsum(sizes)
+    starts = ends - sizes
+
+    out = np.zeros(int(ends[-1]) if len(ends) else 0, dtype="uint8")
+    for byte in range(int(sizes.max()) if len(sizes) else 0):
+        has_byte = sizes > byte
+        chunk = (values[has_byte] >> np.uint64(7 * byte)) & np.uint64(0x7F)
+        continuation = np.where(sizes[has_byte] > byte + 1, 0x80, 0).astype("uint64")
+        out[starts[has_byte] + byte] = (chunk | continuation).astype("uint8")
+    return out.tobytes()
+
+
+def _varint_decode(data, count):
+    if count == 0:
+        return np.zeros(0, dtype="uint64")
+    last_byte = (data & 0x80) == 0
+    ends = np.flatnonzero(last_byte)
+    if len(ends) != count:
+        raise ValueError(f"Expected {count} values, found {len(ends)}")
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    # position of every byte within its value, used as the 7-bit shift
+    value_index = np.repeat(np.arange(count), ends - starts + 1)
+    shifts = (np.arange(len(data)) - starts[value_index]) * 7
+    parts = (data & 0x7F).astype("uint64") << shifts.astype("uint64")
+    return np.add.reduceat(parts, starts)
+
+
+if __name__ == "__main__":
+    # usage: python SeriesCodec.py bars.csv  (columns Date/date plus open, high, low, close, volume)
+    frame = pd.read_csv(sys.argv[1])
+    frame.columns = [column.lower() for column in frame.columns]
+    columns = {name: frame[name].to_numpy() for name in ("open", "high", "low", "close", "volume") if name in frame}
+    columns["date"] = pd.to_datetime(frame["date"]).to_numpy()
+    for name, stats in codec_report(columns).items():
+        print(f"{name:>8}: {stats['compression_ratio']:.2f}x, "
+              f"{stats['decode_values_per_second'] / 1e6:.1f}M values/s decode, "
+              f"max error {stats['max_abs_error']:g}")
@@ -0,0 +1,201 @@
+# StorageBackends.py
+
+"""
+StorageBackends.py
+
+Pluggable storage backends for bar history. Every backend exposes the same
+insert/query interface so research code can switch between the MongoDB store
+managed by DataStorageManager and local columnar files without changes.
+"""
+
+import logging
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from DataStorageManager import DEFAULT_BAR_FIELDS, frame_for_storage
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = ds = pq = None
+
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend(ABC):
+    """The interface shared by all bar storage backends."""
+
+    @abstractmethod
+    def insert(self, collection_name: str, data: Union[pd.DataFrame, Iterable[dict]]) -> int:
+        """
+        Store bars in a collection. A bar whose (symbol, date) is already stored is not written again and
+        the stored bar is kept: MongoBackend's unique index rejects it, raising BulkWriteError once the other
+        bars are written, while ParquetBackend skips it and writes the rest.
+
+        Parameters:
+        collection_name (str): The collection (dataset) to write to.
+        data (pandas.DataFrame or iterable of dict): One row/record per bar, with a symbol and a date.
+
+        Returns:
+        int: The number of rows written.
+        """
+
+    @abstractmethod
+    def query(
+        self,
+        collection_name: str,
+        symbols: Optional[Union[str, Sequence[str]]] = None,
+        start=None,
+        end=None,
+        fields: Sequence[str] = DEFAULT_BAR_FIELDS,
+        dtypes: Optional[dict] = None,
+    ) -> pd.DataFrame:
+        """
+        Read bars from a collection.
+
+        Parameters:
+        collection_name (str): The collection (dataset) to read from.
+        symbols (str or list[str]): The symbols to read. If None, read all symbols.
+        start, end: Inclusive date bounds. If None, the range is open on that side.
+        fields (list[str]): The bar fields to return.
+        dtypes (dict): Per-field NumPy dtypes. Fields default to float64.
+
+        Returns:
+        pandas.DataFrame: Columns symbol, date and fields, sorted by symbol and date.
+        """
+
+
+class MongoBackend(StorageBackend):
+    """Stores bars in MongoDB through a DataStorageManager."""
+
+    def __init__(self, storage_manager, batch_size: int = 1000) -> None:
+        self.storage_manager = storage_manager
+        self.batch_size = batch_size
+
+    def insert(self, collection_name, data):
+        batch_stats = self.storage_manager.bulk_insert_data(collection_name, data, batch_size=self.batch_size)
+        return sum(batch["documents"] for batch in batch_stats)
+
+    def query(self, collection_name, symbols=None, start=None, end=None, fields=DEFAULT_BAR_FIELDS, dtypes=None):
+        return self.storage_manager.query_frame(collection_name, symbols=symbols, start=start, end=end,
+                                                fields=fields, dtypes=dtypes)
+
+
+class ParquetBackend(StorageBackend):
+    """
+    Stores bars as local Parquet files partitioned by ticker and year:
+
+        <root_path>/<collection>/symbol=<symbol>/year=<year>/part-<id>.parquet
+
+    Queries only open the partitions for the requested symbols and years, read
+    only the requested columns and push the date range down to the row groups.
+    """
+
+    def __init__(self, root_path: str = "parquet_store", date_field: str = "date", compression: str = "zstd") -> None:
+        if pq is None:
+            raise ImportError("pyarrow module not found. Please install it using 'pip install pyarrow'")
+        self.root_path = root_path
+        self.date_field = date_field
+        self.compression = compression
+
+    def insert(self, collection_name, data):
+        frame = frame_for_storage(data) if isinstance(data, pd.DataFrame) else pd.DataFrame.from_records(data)
+        if frame.empty:
+            return 0
+        frame = frame.drop(columns="_id", errors="ignore")
+        frame[self.date_field] = pd.to_datetime(frame[self.date_field]).astype("datetime64[ms]")
+        frame = frame.drop_duplicates(["symbol", self.date_field])
+
+        start = time.perf_counter()
+        partitions = 0
+        written = 0
+        years = frame[self.date_field].dt.year
+        for (symbol, year), partition in frame.groupby([frame["symbol"], years], sort=False):
+            partition_path = self._partition_path(collection_name, symbol, year)
+            # skip the bars already stored, as the unique (symbol, date) index does in MongoDB; only the
+            # partition's date column is read
+            stored = [os.path.join(partition_path, name) for name in sorted(os.listdir(partition_path))
+                      if name.endswith(".parquet")] if os.path.isdir(partition_path) else []
+            if stored:
+                stored_dates = ds.dataset(stored, format="parquet").to_table(columns=[self.date_field])
+                partition = partition[~partition[self.date_field].isin(
+                    stored_dates.column(self.date_field).to_pandas().astype("datetime64[ms]"))]
+                if partition.empty:
+                    continue
+            os.makedirs(partition_path, exist_ok=True)
+            # new rows go to a new part file, so inserts never rewrite existing data
+            part_file = os.path.join(partition_path, f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet")
+            table = pa.Table.from_pandas(partition.sort_values(self.date_field), preserve_index=False)
+            pq.write_table(table, part_file, compression=self.compression)
+            partitions += 1
+            written += len(partition)
+
+        logger.info(f"Wrote {written} row(s) to {collection_name} in {partitions} partition(s), skipped "
+                    f"{len(frame) - written} already stored ({time.perf_counter() - start:.3f}s)")
+        return written
+
+    def query(self, collection_name, symbols=None, start=None, end=None, fields=DEFAULT_BAR_FIELDS, dtypes=None):
+        columns = ["symbol", self.date_field, *fields]
+        files = self._partition_files(collection_name, symbols, start, end)
+        if not files:
+            return self._typed_frame(pd.DataFrame({column: [] for column in columns}), fields, dtypes)
+
+        dataset = ds.dataset(files, format="parquet")
+        missing = [field for field in fields if field not in dataset.schema.names]
+        predicate = None
+        if start is not None:
+            predicate = ds.field(self.date_field) >= pa.scalar(pd.Timestamp(start), type=pa.timestamp("ms"))
+        if end is not None:
+            upper = ds.field(self.date_field) <= pa.scalar(pd.Timestamp(end), type=pa.timestamp("ms"))
+            predicate = upper if predicate is None else predicate & upper
+
+        table = dataset.to_table(columns=[column for column in columns if column not in missing], filter=predicate)
+        frame = table.to_pandas()
+        for field in missing:
+            frame[field] = np.nan
+        frame = frame[columns].sort_values(["symbol", self.date_field], kind="stable", ignore_index=True)
+        return self._typed_frame(frame, fields, dtypes)
+
+    def _partition_path(self, collection_name, symbol, year):
+        return os.path.join(self.root_path, collection_name, f"symbol={symbol}", f"year={year}")
+
+    def _partition_files(self, collection_name, symbols, start, end):
+        collection_path = os.path.join(self.root_path, collection_name)
+        if not os.path.isdir(collection_path):
+            return []
+        if symbols is None:
+            symbol_dirs = sorted(name for name in os.listdir(collection_path) if name.startswith("symbol="))
+        else:
+            symbols = [symbols] if isinstance(symbols, str) else symbols
+            symbol_dirs = [f"symbol={symbol}" for symbol in symbols]
+
+        first_year = pd.Timestamp(start).year if start is not None else None
+        last_year = pd.Timestamp(end).year if end is not None else None
+        files = []
+        for symbol_dir in symbol_dirs:
+            symbol_path = os.path.join(collection_path, symbol_dir)
+            if not os.path.isdir(symbol_path):
+                continue
+            for year_dir in sorted(os.listdir(symbol_path)):
+                year = int(year_dir.split("=", 1)[1])
+                if (first_year is not None and year < first_year) or (last_year is not None and year > last_year):
+                    continue
+                year_path = os.path.join(symbol_path, year_dir)
+                files.extend(os.path.join(year_path, name) for name in sorted(os.listdir(year_path))
+                             if name.endswith(".parquet"))
+        return files
+
+    def _typed_frame(self, frame, fields, dtypes):
+        dtypes = dtypes or {}
+        frame[self.date_field] = frame[self.date_field].astype("datetime64[ms]")
+        for field in fields:
+            frame[field] = frame[field].astype(dtypes.get(field, "float64"))
+        return frame
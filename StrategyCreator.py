@@ -1,4 +1,5 @@
 # import needed libraries
+import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -7,6 +8,16 @@ from keras.models import Sequential
 from keras.layers import Dense, Dropout
 from keras.optimizers import Adam
 from AdvancedDataProcessor import AdvancedDataProcessor
+from BacktestEngine import SIGNAL_HOLD, positions_from_signals, run_backtest
+from HyperbandSearch import full_grid, hyperband, successive_halving
+from InferenceService import InferenceService
+from ModelRegistry import ModelRegistry, model_key
+from NumpyModel import NumpyDenseModel, export_dense_model
+from ParallelSearch import SharedArrays, parallel_search, shared_frame
+from PerformanceMetrics import compute_metrics
+from TickerBatchStream import TickerBatchStream
+from WalkForward import aggregate_folds, walk_forward_folds
+from WindowDataset import WindowDataset, sliding_windows
 
 # define the StrategyCreator class
 
@@ -14,13 +25,20 @@ from AdvancedDataProcessor import AdvancedDataProcessor
 class StrategyCreator:
 
     # initialize the class with the data and parameters
-    def __init__(self, data, initial_capital=100000, commission=0.001):
+    def __init__(self, data, initial_capital=100000, commission=0.001, registry=None):
         self.data = data  # the market data as a pandas DataFrame
         self.initial_capital = initial_capital  # the initial capital for trading
         self.commission = commission  # the commission rate for each trade
         # an instance of the AdvancedDataProcessor class
         self.adp = AdvancedDataProcessor()
         self.model = None  # the machine learning model for trading signals
+        self.model_config = None  # the parameters the model was created with
+        # the trained models, filed by a hash of their config and training data and cached in memory
+        self.registry = registry if registry is not None else ModelRegistry()
+        self.model_key = None  # the registry key of the current trained model
+        self.backtest_result = None  # the BacktestResult of the last backtest
+        self.results = None  # the per-bar returns of the last backtest, read by the performance metrics
+        self.walk_forward_results = None  # the out-of-sample returns of every fold of the last walk-forward run
 
     # define a method to create the machine learning model
     def create_model(self, input_dim, output_dim, hidden_layers, activation, dropout_rate, learning_rate):
@@ -31,6 +49,10 @@ class StrategyCreator:
         # dropout_rate: the dropout rate for regularization
         # learning_rate: the learning rate for the optimizer
 
+        # remember the parameters, which are part of the trained model's registry key
+        self.model_config = {'input_dim': input_dim, 'output_dim': output_dim, 'hidden_layers': list(hidden_layers),
+                             'activation': activation, 'dropout_rate': dropout_rate, 'learning_rate': learning_rate}
+
         # create a sequential model
         self.model = Sequential()
 
@@ -56,16 +78,35 @@ class StrategyCreator:
                            loss='categorical_crossentropy', metrics=['accuracy'])
 
     # define a method to train the machine learning model on historical data
-    def train_model(self, train_start_date, train_end_date, window_size, batch_size, epochs):
+    def train_model(self, train_start_date, train_end_date, window_size, batch_size, epochs, resume_from=None):
         # train_start_date: the start date of the training period as a string in YYYY-MM-DD format
         # train_end_date: the end date of the training period as a string in YYYY-MM-DD format
         # window_size: the number of previous days to use as input features
         # batch_size: the batch size for training
         # epochs: the number of epochs for training
+        # resume_from: the registry key of a model trained on the same data for fewer epochs, to continue
+        #   training instead of starting again
+        # returns the training history, or None if an identical model was already trained
 
         # filter the data by the training period
         train_data = self.data.loc[train_start_date:train_end_date]
 
+        # the same model config trained the same way on the same data is filed under the same key
+        config = {**self.model_config, 'window_size': window_size, 'batch_size': batch_size, 'epochs': epochs}
+        if resume_from is not None:
+            config['resume_from'] = resume_from
+        key = model_key(config, train_data)
+
+        # reuse the registered model and its fitted scaler instead of fitting identical ones again
+        if key in self.registry:
+            try:
+                self.scaler = self.registry.load_artifact(key, 'scaler')
+            except KeyError:
+                self.scaler = MinMaxScaler().fit(self.adp.get_indicators(train_data))
+            self.model = self.registry.load(key)
+            self.model_key = key
+            return None
+
         # get the technical indicators from the AdvancedDataProcessor class
         indicators = self.adp.get_indicators(train_data)
 
@@ -73,245 +114,383 @@ class StrategyCreator:
         scaler = MinMaxScaler()
         indicators_scaled = scaler.fit_transform(indicators)
 
-        # create empty lists to store the input features (X) and output labels (y)
-        X = []
-        y = []
+        # build the training windows as a strided view over the scaled indicators; each window is
+        # labelled by the next day's price change, in the classes the backtest trades on, and one-hot encoded:
+        # buy (1, 0, 0) for a rise, sell (0, 1, 0) for a fall, or hold (0, 0, 1) for no change
+        # a Dense model takes each window flattened into a single row
+        dataset = WindowDataset(indicators_scaled, train_data['Close'].to_numpy(), window_size,
+                                flatten=len(self.model.input_shape) == 2)
+
+        # continue from the registered model's weights and optimizer state, keeping its loss history; training
+        # a private copy leaves the checkpoint the registry serves from memory as it was saved
+        initial_epoch = 0
+        loss = []
+        if resume_from is not None:
+            self.model = self.registry.load(resume_from, cached=False)
+            loss = self.registry.metadata(resume_from)['loss']
+            initial_epoch = len(loss)
+
+        # train the model on batches copied out of the view one at a time, reshuffled every epoch
+        history = self.model.fit(dataset.repeat_batches(batch_size), steps_per_epoch=dataset.steps(batch_size),
+                                 epochs=epochs, initial_epoch=initial_epoch)
+
+        # save the scaler and register both for later use; the scaler goes first, so a registered model
+        # always has its scaler
+        self.scaler = scaler
+        self.registry.save_artifact(key, 'scaler', scaler)
+        self.registry.save(key, self.model, {'config': self.model_config, 'window_size': window_size,
+                                             'batch_size': batch_size, 'epochs': epochs,
+                                             'train_start_date': train_start_date, 'train_end_date': train_end_date,
+                                             'resume_from': resume_from, 'loss': loss + history.history['loss']})
+        self.model_key = key
+
+        # return the training history (loss and accuracy per epoch)
+        return history
+
+    # define a method to train the machine learning model across many tickers
+    def train_model_streaming(self, tickers, loader, window_size, batch_size, epochs, **stream_options):
+        # tickers: the tickers to train on
+        # loader: a function returning (features, close) for a ticker, with the features already scaled
+        # window_size: the number of previous days to use as input features
+        # batch_size: the batch size for training
+        # epochs: the number of passes over every ticker's windows
+        # stream_options: passed to TickerBatchStream (shards_in_memory, workers, prefetch, seed)
+
+        # stream shuffled batches from a few tickers at a time instead of concatenating the universe
+        stream = TickerBatchStream(tickers, loader, window_size, batch_size,
+                                   flatten=len(self.model.input_shape) == 2, **stream_options)
+        try:
+            self.model.fit(iter(stream), steps_per_epoch=stream.steps_per_epoch(), epochs=epochs)
+        finally:
+            stream.close()
+
+        # register the model for later use; the tickers stand in for the streamed training data
+        self.model_key = model_key({**self.model_config, 'window_size': window_size, 'batch_size': batch_size,
+                                    'epochs': epochs}, np.array(tickers, dtype=str))
+        self.registry.save(self.model_key, self.model, {'config': self.model_config, 'tickers': list(tickers),
+                                                        'window_size': window_size, 'batch_size': batch_size,
+                                                        'epochs': epochs})
+
+    # define a method to export the trained model's weights for inference in plain NumPy
+    def export_model(self, path=None):
+        # path: the .npz file to write, defaults to the model's registry key next to the registered model
+        # returns the path; load it with NumpyModel.NumpyDenseModel.load, which needs neither Keras nor TensorFlow
+        if path is None:
+            path = os.path.join(self.registry.root_path, self.model_key + '.npz')
+        return export_dense_model(self.model, path)
+
+    # define a method to serve live predictions from the trained model in micro-batches
+    def create_inference_service(self, max_batch_size=256, max_latency=0.005, exported_path=None):
+        # max_batch_size: the most requests combined into one forward pass
+        # max_latency: the seconds a request may wait for its batch to fill up
+        # exported_path: a file written by export_model, to predict in plain NumPy instead of through Keras
+        # returns an InferenceService; submit one window per ticker and bar and read the Future
+
+        # one predict_on_batch call per micro-batch instead of one predict call per ticker and bar
+        model = self.model if exported_path is None else NumpyDenseModel.load(exported_path)
+        return InferenceService(lambda X: np.asarray(model.predict_on_batch(X)), max_batch_size, max_latency)
+
+    # define a method to backtest the strategy on historical data
+    def backtest_strategy(self, test_start_date, test_end_date, window_size, position_size=1.0, allow_short=True):
+        # test_start_date: the start date of the testing period as a string in YYYY-MM-DD format
+        # test_end_date: the end date of the testing period as a string in YYYY-MM-DD format
+        # window_size: the number of previous days to use as input features
+        # position_size: the fraction of equity each position takes
+        # allow_short: whether a sell signal opens a short position instead of going flat
+        # returns a BacktestResult with the equity curve, positions and trade list
 
-        # loop through the indicators and create X and y by using a sliding window of size window_size
-        for i in range(window_size, len(indicators_scaled)):
-            # get the indicators for the current window as input features
-            X.append(indicators_scaled[i-window_size:i])
+        # filter the data by the testing period
+        test_data = self.data.loc[test_start_date:test_end_date]
 
-            # get the price change for the next day as output label (1 for positive change, 0 for negative change or no change)
-            price_change = train_data['Close'].iloc[i] - \
-                train_data['Close'].iloc[i-1]
-            if price_change > 0:
-                y.append(1)
+        # get the technical indicators from the AdvancedDataProcessor class
+        indicators = self.adp.get_indicators(test_data)
+
+        # scale the indicators using the scaler saved from the training
+        indicators_scaled = np.asarray(self.scaler.transform(indicators), dtype='float32')
+
+        # get the trained model from the registry, in memory unless it was evicted
+        self.model = self.registry.load(self.model_key)
+
+        # the window ending at each bar as a strided view; a Dense model takes each window flattened
+        windows = sliding_windows(indicators_scaled, window_size)
+        if len(self.model.input_shape) == 2:
+            windows = windows.reshape(len(windows), -1)
+
+        # only windows without missing indicator values (e.g. during warm-up) are predicted
+        finite_rows = np.isfinite(indicators_scaled).all(axis=1)
+        complete = sliding_windows(finite_rows[:, None], window_size).all(axis=(1, 2))
+
+        # predict a signal at the close of every bar with a complete window (0 for buy, 1 for sell, or 2 for hold);
+        # the other bars hold
+        signals = np.full(len(test_data), SIGNAL_HOLD)
+        if complete.any():
+            signals[window_size - 1:][complete] = np.argmax(self.model.predict(windows[complete]), axis=1)
+
+        # turn the signals into long, short or flat positions and run the commission-aware backtest
+        targets = positions_from_signals(signals, allow_short)
+        close = test_data['Close'].to_numpy(dtype='float64')
+        self.backtest_result = run_backtest(close, targets, self.initial_capital, self.commission, position_size,
+                                            test_data.index)
+
+        # keep the per-bar results for the performance metrics and plot_backtest
+        self.results = pd.DataFrame({
+            'Signal': signals,
+            'Position': self.backtest_result.positions,
+            'Return': np.concatenate(([0.0], close[1:] / close[:-1] - 1.0)),
+            'Strategy_Return': self.backtest_result.returns,
+            'Cumulative_Return': close / close[0],
+            'Cumulative_Strategy_Return': self.backtest_result.equity / self.initial_capital,
+        }, index=test_data.index)
+
+        # return the backtest result
+        return self.backtest_result
+
+    # define a method to plot the last backtest against buy and hold
+    def plot_backtest(self):
+        # plot the cumulative returns and cumulative strategy returns
+        plt.figure(figsize=(12, 8))
+        plt.plot(self.results['Cumulative_Return'], label='Buy and Hold')
+        plt.plot(self.results['Cumulative_Strategy_Return'],
+                 label='Machine Learning Strategy')
+        plt.title('Backtesting Results')
+        plt.xlabel('Date')
+        plt.ylabel('Cumulative Return')
+        plt.legend()
+        plt.show()
+
+    # define a method to optimize the strategy parameters using grid search
+    def optimize_strategy(self, train_start_date, train_end_date, window_size_range, batch_size_range, epochs_range,
+                          max_workers=None, threads_per_worker=1):
+        # train_start_date: the start date of the training period as a string in YYYY-MM-DD format
+        # train_end_date: the end date of the training period as a string in YYYY-MM-DD format
+        # window_size_range: a list of integers indicating the range of window sizes to try
+        # batch_size_range: a list of integers indicating the range of batch sizes to try
+        # epochs_range: a list of integers indicating the range of epochs to try
+        # max_workers: the number of worker processes, defaults to one per core
+        # threads_per_worker: the thread limit for each worker's deep-learning backend
+
+        # one grid point per combination of parameters
+        grid = [{'train_start_date': train_start_date, 'train_end_date': train_end_date,
+                 'window_size': window_size, 'batch_size': batch_size, 'epochs': epochs,
+                 'initial_capital': self.initial_capital, 'commission': self.commission}
+                for window_size in window_size_range
+                for batch_size in batch_size_range
+                for epochs in epochs_range]
+
+        # create empty lists to store the results and the failed grid points
+        results = []
+        failures = []
+
+        # build, train and backtest every grid point in its own worker process; the market data is
+        # shared with the workers once instead of being pickled for every grid point
+        with SharedArrays.from_frame(self.data.select_dtypes('number')) as shared:
+            for params, result in parallel_search(evaluate_grid_point, grid, shared, max_workers=max_workers,
+                                                  threads_per_worker=threads_per_worker):
+                if isinstance(result, Exception):
+                    print(f"Window Size: {params['window_size']}, Batch Size: {params['batch_size']}, "
+                          f"Epochs: {params['epochs']} failed: {result}")
+                    failures.append(result)
+                    continue
+                print(f"Window Size: {result['Window Size']}, Batch Size: {result['Batch Size']}, "
+                      f"Epochs: {result['Epochs']}")
+                print(f"Sharpe Ratio: {result['Sharpe Ratio']}, Max Drawdown: {result['Max Drawdown']}, "
+                      f"Profit Factor: {result['Profit Factor']}")
+
+                # append the parameters and metrics to the results list as they finish
+                results.append(result)
+
+        # a search in which every grid point failed has no results to rank
+        if grid and len(failures) == len(grid):
+            raise RuntimeError(f"All {len(grid)} grid points failed, the first with: {failures[0]}") from failures[0]
+
+        # convert the results list to a pandas DataFrame
+        results_df = pd.DataFrame(results, columns=['Window Size', 'Batch Size', 'Epochs',
+                                                    'Sharpe Ratio', 'Max Drawdown', 'Profit Factor'])
+
+        # sort the results by Sharpe Ratio in descending order
+        results_df = results_df.sort_values(
+            by='Sharpe Ratio', ascending=False)
+
+        # return the results DataFrame
+        return results_df
+
+    # define a method to optimize the strategy parameters with successive halving or Hyperband
+    def optimize_strategy_adaptive(self, train_start_date, train_end_date, search_space, min_epochs=1, max_epochs=27,
+                                   eta=3, metric='Sharpe Ratio', mode='hyperband', seed=None, max_workers=None,
+                                   threads_per_worker=1):
+        # train_start_date: the start date of the training period as a string in YYYY-MM-DD format
+        # train_end_date: the end date of the training period as a string in YYYY-MM-DD format
+        # search_space: the values to try for window_size, batch_size, hidden_layers and learning_rate,
+        #   e.g. {'window_size': [5, 10, 20], 'hidden_layers': [[32, 16], [64, 32]], 'learning_rate': [0.01, 0.001]}
+        # min_epochs, max_epochs: the epoch budget of the first and the last round
+        # eta: keep the best 1/eta of the candidates each round and train them for eta times the epochs
+        # metric: the metric to rank by, 'Sharpe Ratio' (higher is better) or 'Loss' (lower is better)
+        # mode: 'hyperband', or 'halving' to run successive halving over the whole grid
+        # seed: seeds the Hyperband candidate sampling
+        # max_workers, threads_per_worker: as for optimize_strategy
+
+        # fill in the parameters the search space leaves out
+        space = {'window_size': [10], 'batch_size': [32], 'hidden_layers': [[32, 16]], 'learning_rate': [0.01],
+                 **search_space}
+        space['train_start_date'] = [train_start_date]
+        space['train_end_date'] = [train_end_date]
+        space['initial_capital'] = [self.initial_capital]
+        space['commission'] = [self.commission]
+        options = {'score_key': metric, 'maximize': metric != 'Loss', 'budget_key': 'epochs',
+                   'max_workers': max_workers, 'threads_per_worker': threads_per_worker}
+
+        # train every candidate briefly and only keep training the ones still winning
+        with SharedArrays.from_frame(self.data.select_dtypes('number')) as shared:
+            if mode == 'hyperband':
+                records = hyperband(evaluate_grid_point, space, shared, min_epochs, max_epochs, eta, seed, **options)
+            elif mode == 'halving':
+                records = successive_halving(evaluate_grid_point, full_grid(space), shared, min_epochs, max_epochs,
+                                             eta, **options)
             else:
-                y.append(0)
-
-        # convert X and y to numpy arrays
-        X = np.array(X)
-        y = np.array(y)
-
-        # one-hot encode y to have three classes: buy (1, 0, 0), sell (0, 1, 0), or hold (0, 0, 1)
-        y = np.eye(3)[y]
-
-        # train the model on X and y using batch_size and epochs
-        self.model.fit(X, y, batch_size=batch_size, epochs=epochs)
-        # save the scaler and the model for later use
+                raise ValueError(f"Invalid or unsupported search mode: {mode}")
+
+        # convert the records to a pandas DataFrame, the fully trained candidates first, best first
+        results_df = pd.DataFrame(records).drop(
+            columns=['train_start_date', 'train_end_date', 'initial_capital', 'commission'], errors='ignore')
+        results_df = results_df.sort_values(by=['epochs', metric], ascending=[False, metric == 'Loss'])
+
+        # return the results DataFrame
+        return results_df
+
+    # define a method to evaluate the strategy out of sample over consecutive train/test folds
+    def walk_forward(self, train_size, test_size, window_size, batch_size, epochs, step=None, anchored=False,
+                     context_size=None, hidden_layers=(32, 16), learning_rate=0.01, metrics=None, max_workers=None,
+                     threads_per_worker=1):
+        # train_size: the number of bars each fold trains on (the first fold's, if anchored)
+        # test_size: the number of bars each fold is tested on, following its training period
+        # window_size, batch_size, epochs: the training parameters of every fold's model
+        # step: the number of bars between folds, defaults to test_size
+        # anchored: whether every fold trains from the first bar instead of a rolling period
+        # context_size: the number of training bars each fold's backtest runs over before its test period, so the
+        #   windows and indicators are warmed up by the first test bar; defaults to the whole training period
+        # hidden_layers, learning_rate: the model architecture
+        # metrics: metric name -> function of a fold's returns array, defaults to every metric of compute_metrics
+        # max_workers, threads_per_worker: as for optimize_strategy
+        # returns a DataFrame with one row of out-of-sample metrics per fold and one for all folds chained
+
+        # one grid point per fold, with the fold's training and testing period
+        grid = [{**fold, 'window_size': window_size, 'batch_size': batch_size, 'epochs': epochs,
+                 'hidden_layers': list(hidden_layers), 'learning_rate': learning_rate,
+                 'initial_capital': self.initial_capital, 'commission': self.commission}
+                for fold in walk_forward_folds(self.data.index, train_size, test_size, step, anchored, context_size)]
+
+        # fit every fold's scaler and model in its own worker process; fitted folds are found in the
+        # registry by content, so a rerun only backtests them again
+        self.walk_forward_results = []
+        failures = []
+        with SharedArrays.from_frame(self.data.select_dtypes('number')) as shared:
+            for params, result in parallel_search(evaluate_fold, grid, shared, max_workers=max_workers,
+                                                  threads_per_worker=threads_per_worker):
+                if isinstance(result, Exception):
+                    print(f"Fold {params['fold']} failed: {result}")
+                    failures.append(result)
+                    continue
+                self.walk_forward_results.append(result)
+
+        # a run in which every fold failed has nothing to score
+        if grid and len(failures) == len(grid):
+            raise RuntimeError(f"All {len(grid)} folds failed, the first with: {failures[0]}") from failures[0]
+
+        # score the folds' out-of-sample returns
+        return self.score_walk_forward(metrics)
+
+    # define a method to score the last walk-forward run with other metrics, without refitting or backtesting
+    def score_walk_forward(self, metrics=None):
+        # metrics: metric name -> function of a fold's returns array, defaults to every metric of compute_metrics
+        return aggregate_folds(self.walk_forward_results, metrics)
+
+    # define a method to evaluate the strategy on unseen data
+    def evaluate_strategy(self, eval_start_date, eval_end_date, window_size):
+        # eval_start_date: the start date of the evaluation period as a string in YYYY-MM-DD format
+        # eval_end_date: the end date of the evaluation period as a string in YYYY-MM-DD format
+        # window_size: the number of previous days to use as input features
 
-        self.scaler = scaler
-        self.model.save('model.h5')
-        # define a method to backtest the strategy on historical data
-
-        def backtest_strategy(self, test_start_date, test_end_date, window_size):
-            # test_start_date: the start date of the testing period as a string in YYYY-MM-DD format
-            # test_end_date: the end date of the testing period as a string in YYYY-MM-DD format
-            # window_size: the number of previous days to use as input features
-
-            # filter the data by the testing period
-            test_data = self.data.loc[test_start_date:test_end_date]
-
-            # get the technical indicators from the AdvancedDataProcessor class
-            indicators = self.adp.get_indicators(test_data)
-
-            # scale the indicators using the scaler saved from the training
-            indicators_scaled = self.scaler.transform(indicators)
-
-            # create empty lists to store the input features (X) and output labels (y)
-            X = []
-            y = []
-
-            # loop through the indicators and create X and y by using a sliding window of size window_size
-            for i in range(window_size, len(indicators_scaled)):
-                # get the indicators for the current window as input features
-                X.append(indicators_scaled[i-window_size:i])
-
-                # get the price change for the next day as output label (1 for positive change, 0 for negative change or no change)
-                price_change = test_data['Close'].iloc[i] - \
-                    test_data['Close'].iloc[i-1]
-                if price_change > 0:
-                    y.append(1)
-                else:
-                    y.append(0)
-
-            # convert X and y to numpy arrays
-            X = np.array(X)
-            y = np.array(y)
-
-            # one-hot encode y to have three classes: buy (1, 0, 0), sell (0, 1, 0), or hold (0, 0, 1)
-            y = np.eye(3)[y]
-
-            # load the model saved from the training
-            self.model = keras.models.load_model('model.h5')
-            #
-            # predict the output labels for X using the model
-            y_pred = self.model.predict(X)
-            # get the predicted signals as a list of integers (0 for buy, 1 for sell, or 2 for hold)
-            signals = np.argmax(y_pred, axis=1)
-
-            # create a new column in the test data to store the signals
-            test_data['Signal'] = signals
-
-            # create a new column in the test data to store the positions (1 for long, -1 for short, or 0 for flat)
-            test_data['Position'] = test_data['Signal'].diff()
-
-            # create a new column in the test data to store the returns (percentage change in price)
-            test_data['Return'] = test_data['Close'].pct_change()
-
-            # create a new column in the test data to store the strategy returns (returns multiplied by positions)
-            test_data['Strategy_Return'] = test_data['Return'] * \
-                test_data['Position']
-
-            # create a new column in the test data to store the cumulative returns
-            test_data['Cumulative_Return'] = (
-                test_data['Return'] + 1).cumprod()
-
-            # create a new column in the test data to store the cumulative strategy returns
-            test_data['Cumulative_Strategy_Return'] = (
-                test_data['Strategy_Return'] + 1).cumprod()
-
-            # plot the cumulative returns and cumulative strategy returns
-            plt.figure(figsize=(12, 8))
-            plt.plot(test_data['Cumulative_Return'], label='Buy and Hold')
-            plt.plot(test_data['Cumulative_Strategy_Return'],
-                     label='Machine Learning Strategy')
-            plt.title('Backtesting Results')
-            plt.xlabel('Date')
-            plt.ylabel('Cumulative Return')
-            plt.legend()
-            plt.show()
-
-            # define a method to optimize the strategy parameters using grid search
-            def optimize_strategy(self, train_start_date, train_end_date, window_size_range, batch_size_range, epochs_range):
-                # train_start_date: the start date of the training period as a string in YYYY-MM-DD format
-                # train_end_date: the end date of the training period as a string in YYYY-MM-DD format
-                # window_size_range: a list of integers indicating the range of window sizes to try
-                # batch_size_range: a list of integers indicating the range of batch sizes to try
-                # epochs_range: a list of integers indicating the range of epochs to try
-
-                # create an empty list to store the results
-                results = []
-
-                # loop through all possible combinations of parameters
-                for window_size in window_size_range:
-                    for batch_size in batch_size_range:
-                        for epochs in epochs_range:
-                            # create a new model with the given parameters
-                            self.create_model(input_dim=window_size*len(self.adp.indicator_list), output_dim=3,
-                                              hidden_layers=[32, 16], activation='relu', dropout_rate=0.2,
-                                              learning_rate=0.01)
-
-                            # train the model on historical data with the given parameters
-                            self.train_model(train_start_date=train_start_date,
-                                             train_end_date=train_end_date,
-                                             window_size=window_size,
-                                             batch_size=batch_size,
-                                             epochs=epochs)
-
-                            # backtest the strategy on historical data with the given parameters
-                            self.backtest_strategy(test_start_date=train_start_date,
-                                                   test_end_date=train_end_date,
-                                                   window_size=window_size)
-
-                            # calculate and print the performance metrics
-                            sharpe_ratio = self.calculate_sharpe_ratio()
-
-                            max_drawdown = self.calculate_max_drawdown()
-                            profit_factor = self.calculate_profit_factor()
-                            print(
-                                f'Window Size: {window_size}, Batch Size: {batch_size}, Epochs: {epochs}')
-                            print(
-                                f'Sharpe Ratio: {sharpe_ratio}, Max Drawdown: {max_drawdown}, Profit Factor: {profit_factor}')
-
-                            # append the parameters and metrics to the results list
-                            results.append(
-                                [window_size, batch_size, epochs, sharpe_ratio, max_drawdown, profit_factor])
-
-                            # convert the results list to a pandas DataFrame
-                            results_df = pd.DataFrame(results, columns=[
-                                                      'Window Size', 'Batch Size', 'Epochs', 'Sharpe Ratio', 'Max Drawdown', 'Profit Factor'])
-
-                            # sort the results by Sharpe Ratio in descending order
-                            results_df = results_df.sort_values(
-                                by='Sharpe Ratio', ascending=False)
-
-                            # return the results DataFrame
-                            return results_df
-
-                            # define a method to evaluate the strategy on unseen data
-                            def evaluate_strategy(self, eval_start_date, eval_end_date, window_size):
-                                # eval_start_date: the start date of the evaluation period as a string in YYYY-MM-DD format
-                                # eval_end_date: the end date of the evaluation period as a string in YYYY-MM-DD format
-                                # window_size: the number of previous days to use as input features
-
-                                # load the model saved from the optimization
-                                self.model = keras.models.load_model(
-                                    'model.h5')
-
-                                # backtest the strategy on unseen data with the given parameters
-                                self.backtest_strategy(test_start_date=eval_start_date,
-                                                       test_end_date=eval_end_date,
-                                                       window_size=window_size)
-
-                                # calculate and print the performance metrics
-                                sharpe_ratio = self.calculate_sharpe_ratio()
-                                max_drawdown = self.calculate_max_drawdown()
-                                profit_factor = self.calculate_profit_factor()
-                                print(f'Window Size: {window_size}')
-                                print(
-                                    f'Sharpe Ratio: {sharpe_ratio}, Max Drawdown: {max_drawdown}, Profit Factor: {profit_factor}')
-
-                            # define a method to calculate the Sharpe Ratio
-                            def calculate_sharpe_ratio(self):
-                                # calculate the annualized return
-                                annualized_return = (
-                                    self.data['Cumulative_Strategy_Return'].iloc[-1] - 1) * 252 / len(self.data)
-
-                                # calculate the annualized volatility
-                                annualized_volatility = self.data['Strategy_Return'].std(
-                                ) * np.sqrt(252)
-
-                                # calculate the risk-free rate (assuming 0% for simplicity)
-                                risk_free_rate = 0
-
-                                # calculate the Sharpe Ratio
-                                sharpe_ratio = (
-                                    annualized_return - risk_free_rate) / annualized_volatility
-
-                                # return the Sharpe Ratio
-                                return sharpe_ratio
-
-                            # define a method to calculate the Maximum Drawdown
-                            def calculate_max_drawdown(self):
-                                # calculate the cumulative peak
-                                cumulative_peak = self.data['Cumulative_Strategy_Return'].cummax(
-                                )
-
-                                # calculate the cumulative drawdown
-                                cumulative_drawdown = 1 - \
-                                    self.data['Cumulative_Strategy_Return'] / \
-                                    cumulative_peak
-
-                                # calculate the maximum drawdown
-                                max_drawdown = cumulative_drawdown.max()
-
-                                # return the maximum drawdown
-                                return max_drawdown
-
-                            # define a method to calculate the Profit Factor
-                            def calculate_profit_factor(self):
-                                # calculate the gross profit (sum of positive strategy returns)
-                                gross_profit = self.data[self.data['Strategy_Return'] > 0]['Strategy_Return'].sum(
-                                )
-
-                                # calculate the gross loss (sum of negative strategy returns)
-                                gross_loss = self.data[self.data['Strategy_Return'] < 0]['Strategy_Return'].sum(
-                                )
-
-                                # calculate the profit factor (ratio of gross profit to gross loss)
-                                profit_factor = gross_profit / abs(gross_loss)
-
-                                # return the profit factor
-                                return profit_factor
+        # get the model trained last from the registry, in memory unless it was evicted
+        self.model = self.registry.load(self.model_key)
+
+        # backtest the strategy on unseen data with the given parameters
+        self.backtest_strategy(test_start_date=eval_start_date,
+                               test_end_date=eval_end_date,
+                               window_size=window_size)
+
+        # calculate and print the performance metrics
+        metrics = self.calculate_metrics()
+        print(f'Window Size: {window_size}')
+        print(', '.join(f'{name}: {value}' for name, value in metrics.items()))
+
+        # return the performance metrics
+        return metrics
+
+    # define a method to calculate the performance metrics of the last backtest
+    def calculate_metrics(self):
+        # returns the Total Return, Sharpe Ratio, Sortino Ratio, Max Drawdown, Profit Factor, Win Rate and
+        # Exposure, computed together from the strategy returns and positions
+        return compute_metrics(self.results['Strategy_Return'].to_numpy(), self.results['Position'].to_numpy())
+
+
+# evaluate one optimize_strategy grid point; runs in a search worker process
+def evaluate_grid_point(params, arrays):
+    # params: the grid point, with the training period, window size, batch size and epochs
+    # arrays: the market data shared by optimize_strategy
+
+    # rebuild the market data from shared memory; models are filed by content, so workers share the registry
+    strategy = StrategyCreator(shared_frame(arrays), params['initial_capital'], params['commission'])
+
+    # create a new model with the given parameters
+    strategy.create_model(input_dim=params['window_size']*len(strategy.adp.indicator_list), output_dim=3,
+                          hidden_layers=params.get('hidden_layers', [32, 16]), activation='relu',
+                          dropout_rate=0.2, learning_rate=params.get('learning_rate', 0.01))
+
+    # train the model on historical data with the given parameters; a candidate promoted by an adaptive
+    # search continues from the model of its previous round
+    strategy.train_model(train_start_date=params['train_start_date'],
+                         train_end_date=params['train_end_date'],
+                         window_size=params['window_size'],
+                         batch_size=params['batch_size'],
+                         epochs=params['epochs'],
+                         resume_from=params.get('resume_from'))
+
+    # backtest the strategy on historical data with the given parameters
+    strategy.backtest_strategy(test_start_date=params['train_start_date'],
+                               test_end_date=params['train_end_date'],
+                               window_size=params['window_size'])
+
+    # calculate the performance metrics; the loss was recorded when the model was registered, and the
+    # model's registry key is the checkpoint an adaptive search resumes it from
+    return {'Window Size': params['window_size'], 'Batch Size': params['batch_size'], 'Epochs': params['epochs'],
+            **strategy.calculate_metrics(), 'Loss': strategy.registry.metadata(strategy.model_key)['loss'][-1],
+            'checkpoint': strategy.model_key}
+
+
+# fit and backtest one walk_forward fold; runs in a search worker process
+def evaluate_fold(params, arrays):
+    # params: the fold's periods and the training parameters
+    # arrays: the market data shared by walk_forward
+
+    # rebuild the market data from shared memory and fit the fold on its training period
+    strategy = StrategyCreator(shared_frame(arrays), params['initial_capital'], params['commission'])
+    strategy.create_model(input_dim=params['window_size']*len(strategy.adp.indicator_list), output_dim=3,
+                          hidden_layers=params['hidden_layers'], activation='relu',
+                          dropout_rate=0.2, learning_rate=params['learning_rate'])
+    strategy.train_model(train_start_date=params['train_start'],
+                         train_end_date=params['train_end'],
+                         window_size=params['window_size'],
+                         batch_size=params['batch_size'],
+                         epochs=params['epochs'])
+
+    # backtest the fold's model from the end of its training period, so the first test bar already has a full
+    # window of warmed-up indicators, and keep only the unseen testing period
+    result = strategy.backtest_strategy(test_start_date=params['context_start'],
+                                        test_end_date=params['test_end'],
+                                        window_size=params['window_size'])
+    test_offset = result.dates.get_loc(params['test_start'])
+
+    # return the fold's periods and out-of-sample returns, which walk_forward scores
+    return {'fold': params['fold'], 'train_start': params['train_start'], 'train_end': params['train_end'],
+            'test_start': params['test_start'], 'test_end': params['test_end'], 'model_key': strategy.model_key,
+            'returns': result.returns[test_offset:]}
@@ -0,0 +1,188 @@
+# TickerBatchStream.py
+
+"""
+TickerBatchStream.py
+
+Streams training batches from many tickers without holding the universe in
+memory. Tickers are loaded a few at a time (a shard group) by background
+threads, the windows of every ticker in a group are shuffled together, and
+fixed-size batches are handed to the training loop through a bounded
+prefetch queue. Memory is bounded by the number of workers, the shard group
+size and the prefetch depth, not by the number of tickers or years.
+"""
+
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from WindowDataset import WindowDataset
+
+logger = logging.getLogger(__name__)
+
+
+class TickerBatchStream:
+    """An endless stream of shuffled (X, y) batches drawn from many tickers."""
+
+    def __init__(self, tickers: Sequence[str], loader: Callable, window_size: int, batch_size: int,
+                 shards_in_memory: int = 4, workers: int = 2, prefetch: int = 8, flatten: bool = False,
+                 num_classes: int = 3, dtype: str = "float32", seed: Optional[int] = None) -> None:
+        """
+        Parameters:
+        tickers (list[str]): The tickers to train on.
+        loader (callable): Called as loader(ticker) and returns (features, close): the ticker's
+            (bars, features) input matrix, already scaled, and its close prices.
+        window_size (int): The number of previous bars in each input window.
+        batch_size (int): The number of windows per batch.
+        shards_in_memory (int): The number of tickers each worker loads and shuffles together.
+        workers (int): The number of background threads loading tickers and building batches.
+        prefetch (int): The number of ready batches kept ahead of the training loop.
+        flatten (bool): Return each window as one row, for Dense models.
+        num_classes (int): The width of the one-hot labels.
+        dtype (str): The dtype of the input batches.
+        seed (int): Seeds the ticker order and the window shuffling.
+        """
+        if not tickers:
+            raise ValueError("No tickers to stream")
+        self.tickers = list(tickers)
+        self.loader = loader
+        self.window_size = window_size
+        self.batch_size = batch_size
+        self.shards_in_memory = shards_in_memory
+        self.workers = workers
+        self.prefetch = prefetch
+        self.flatten = flatten
+        self.num_classes = num_classes
+        self.dtype = dtype
+        self.seed = seed
+
+        self.window_count = None
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.tasks = None
+        self.batches = None
+
+    def count_windows(self) -> int:
+        """Count the usable windows across every ticker, loading them a few at a time. The result is cached."""
+        if self.window_count is None:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                self.window_count = sum(executor.map(lambda ticker: len(self._dataset(ticker) or ()), self.tickers))
+        return self.window_count
+
+    def steps_per_epoch(self) -> int:
+        """The number of batches in one pass over every ticker, for fit(..., steps_per_epoch=...)."""
+        return max(1, -(-self.count_windows() // self.batch_size))
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        self.start()
+        pending_X, pending_y, pending_rows = [], [], 0
+        try:
+            while True:
+                item = self.batches.get()
+                if isinstance(item, BaseException):
+                    raise item
+                X, y = item
+                # workers hand over each shard group's last, partial batch too; regroup so every batch is full
+                if pending_rows == 0 and len(X) == self.batch_size:
+                    yield X, y
+                    continue
+                pending_X.append(X)
+                pending_y.append(y)
+                pending_rows += len(X)
+                while pending_rows >= self.batch_size:
+                    X, y = np.concatenate(pending_X), np.concatenate(pending_y)
+                    yield X[:self.batch_size], y[:self.batch_size]
+                    pending_X, pending_y = [X[self.batch_size:]], [y[self.batch_size:]]
+                    pending_rows -= self.batch_size
+        finally:
+            self.close()
+
+    def start(self) -> None:
+        """Start the background threads. Iterating starts them if needed."""
+        if self.threads:
+            return
+        self.stop_event.clear()
+        self.tasks = queue.Queue(maxsize=self.workers)
+        self.batches = queue.Queue(maxsize=self.prefetch)
+        self.threads = [threading.Thread(target=self._schedule, name="batch-stream-scheduler", daemon=True)]
+        self.threads += [threading.Thread(target=self._work, name=f"batch-stream-{number}", daemon=True)
+                         for number in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop the background threads."""
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _schedule(self):
+        # every pass visits each ticker once, in a new order, split into shard groups
+        rng = np.random.default_rng(self.seed)
+        while not self.stop_event.is_set():
+            order = rng.permutation(len(self.tickers))
+            for offset in range(0, len(order), self.shards_in_memory):
+                group = [self.tickers[i] for i in order[offset:offset + self.shards_in_memory]]
+                if not self._put(self.tasks, (group, int(rng.integers(2 ** 32)))):
+                    return
+
+    def _work(self):
+        while not self.stop_event.is_set():
+            try:
+                group, seed = self.tasks.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                datasets = [dataset for dataset in map(self._dataset, group) if dataset is not None and len(dataset)]
+                for batch in self._group_batches(datasets, np.random.default_rng(seed)):
+                    if not self._put(self.batches, batch):
+                        return
+            except Exception as e:
+                logger.error(f"Failed to build batches for {', '.join(group)}. Error: {e}")
+                self._put(self.batches, e)
+                return
+
+    def _group_batches(self, datasets, rng):
+        # shuffle the windows of every ticker in the group together, then copy out one batch at a time
+        sizes = np.array([len(dataset) for dataset in datasets], dtype="int64")
+        if not sizes.sum():
+            return
+        shard_of = np.repeat(np.arange(len(datasets)), sizes)
+        position_of = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        order = rng.permutation(sizes.sum())
+        for offset in range(0, len(order), self.batch_size):
+            selected = order[offset:offset + self.batch_size]
+            shards, positions = shard_of[selected], position_of[selected]
+            X = np.empty((len(selected), *datasets[0].input_shape), dtype=self.dtype)
+            y = np.empty((len(selected), self.num_classes), dtype=self.dtype)
+            for shard in np.unique(shards):
+                rows = shards == shard
+                X[rows], y[rows] = datasets[shard].batch(positions[rows])
+            yield X, y
+
+    def _dataset(self, ticker):
+        features, close = self.loader(ticker)
+        if len(close) <= self.window_size:
+            logger.warning(f"Skipping {ticker}: {len(close)} bar(s) is too short for a window of {self.window_size}")
+            return None
+        return WindowDataset(features, close, self.window_size, self.flatten, self.num_classes, self.dtype)
+
+    def _put(self, target, item):
+        # block while the consumer is behind, but give up once the stream is closed
+        while not self.stop_event.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,94 @@
+# WalkForward.py
+
+"""
+WalkForward.py
+
+Walk-forward evaluation helpers: rolling or anchored train/test folds over a
+bar index, and per-fold aggregation of out-of-sample returns. The folds are
+fitted in worker processes by StrategyCreator.walk_forward; the metrics are
+computed here from the returned per-bar returns, so changing the metrics
+never requires refitting a fold.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from PerformanceMetrics import compute_metrics
+
+
+def walk_forward_folds(index: Sequence, train_size: int, test_size: int, step: Optional[int] = None,
+                       anchored: bool = False, context_size: Optional[int] = None) -> List[dict]:
+    """
+    Split a bar index into consecutive train/test folds.
+
+    Parameters:
+    index (sequence): The bar labels, e.g. the DatetimeIndex of the market data, in order.
+    train_size (int): The number of training bars (the first fold's, when anchored).
+    test_size (int): The number of out-of-sample bars following each training period.
+    step (int): The number of bars between fold starts, defaults to test_size.
+    anchored (bool): Keep every training period starting at the first bar instead of rolling it forward.
+    context_size (int): The number of training bars before the test period a backtest of the fold runs
+        over first, so the input windows and indicators are warmed up by the first test bar. If None,
+        the whole training period.
+
+    Returns:
+    list[dict]: One dict per fold with "fold", "train_start", "train_end", "context_start", "test_start"
+    and "test_end" (inclusive labels from index).
+
+    Raises:
+    ValueError: If the sizes are not positive or the index is too short for one fold.
+    """
+    step = test_size if step is None else step
+    if min(train_size, test_size, step) <= 0 or (context_size is not None and context_size < 0):
+        raise ValueError("Train size, test size and step must be positive and context size not negative")
+    if len(index) < train_size + test_size:
+        raise ValueError(f"{len(index)} bar(s) are too few for a fold of {train_size} + {test_size} bars")
+
+    folds = []
+    for number, test_start in enumerate(range(train_size, len(index) - test_size + 1, step)):
+        train_start = 0 if anchored else test_start - train_size
+        context_start = train_start if context_size is None else max(train_start, test_start - context_size)
+        folds.append({
+            "fold": number,
+            "train_start": index[train_start],
+            "train_end": index[test_start - 1],
+            "context_start": index[context_start],
+            "test_start": index[test_start],
+            "test_end": index[test_start + test_size - 1],
+        })
+    return folds
+
+
+def aggregate_folds(fold_results: Sequence[dict], metrics: Optional[Dict[str, Callable]] = None) -> pd.DataFrame:
+    """
+    Score every fold's out-of-sample returns.
+
+    Parameters:
+    fold_results (list[dict]): One dict per fold with the fold's labels (see walk_forward_folds) and
+        "returns", its per-bar out-of-sample strategy returns.
+    metrics (dict): Metric name -> function of a returns array. If None, every metric of
+        PerformanceMetrics.compute_metrics.
+
+    Returns:
+    pandas.DataFrame: One row per fold, in fold order, with the fold's dates and every metric, plus
+    an "All Folds" row scoring the folds' returns chained together.
+    """
+    def score(returns):
+        if metrics is None:
+            return compute_metrics(returns)
+        return {name: function(returns) for name, function in metrics.items()}
+
+    fold_results = sorted(fold_results, key=lambda result: result["fold"])
+    rows = []
+    for result in fold_results:
+        returns = np.asarray(result["returns"], dtype="float64")
+        row = {key: value for key, value in result.items() if key != "returns"}
+        row.update(score(returns))
+        rows.append(row)
+    frame = pd.DataFrame(rows)
+    if rows:
+        chained = np.concatenate([np.asarray(result["returns"], dtype="float64") for result in fold_results])
+        frame.loc[len(frame)] = {"fold": "All Folds", **score(chained)}
+    return frame
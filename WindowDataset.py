@@ -0,0 +1,142 @@
+# WindowDataset.py
+
+"""
+WindowDataset.py
+
+Sliding-window training data for StrategyCreator. The windows are a strided
+view over the feature matrix, so building a dataset costs O(n * features)
+memory whatever the window size; labels and the mask of usable windows are
+computed with array operations, and windows are copied out only one batch at
+a time while training.
+"""
+
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from BacktestEngine import SIGNAL_BUY, SIGNAL_HOLD, SIGNAL_SELL
+
+
+def sliding_windows(values: np.ndarray, window_size: int) -> np.ndarray:
+    """
+    View every run of window_size consecutive rows.
+
+    Parameters:
+    values (numpy.ndarray): A (bars, features) array.
+    window_size (int): The number of rows per window.
+
+    Returns:
+    numpy.ndarray: A read-only (bars - window_size + 1, window_size, features) view of values.
+    """
+    # sliding_window_view puts the window axis last; swap it back in front of the features
+    return sliding_window_view(values, window_size, axis=0).transpose(0, 2, 1)
+
+
+def next_bar_labels(close: np.ndarray, window_size: int, threshold: float = 0.0) -> np.ndarray:
+    """
+    Label each window by the move of the bar after it, in the classes BacktestEngine trades on:
+    SIGNAL_BUY if that bar closed higher than the window's last bar by more than threshold,
+    SIGNAL_SELL if it closed lower by more than threshold, and SIGNAL_HOLD otherwise.
+
+    Parameters:
+    close (array-like): The close price of every bar.
+    window_size (int): The number of bars in each window.
+    threshold (float): The relative move at or below which the label is SIGNAL_HOLD.
+
+    Returns:
+    numpy.ndarray: len(close) - window_size int64 labels, one per window with a next bar.
+    """
+    close = np.asarray(close, dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        move = close[window_size:] / close[window_size - 1:-1] - 1.0
+    return np.where(move > threshold, SIGNAL_BUY,
+                    np.where(move < -threshold, SIGNAL_SELL, SIGNAL_HOLD)).astype("int64")
+
+
+class WindowDataset:
+    """Windows of features and next-bar labels, materialized batch by batch."""
+
+    def __init__(self, features, close, window_size: int, flatten: bool = False, num_classes: int = 3,
+                 dtype: str = "float32") -> None:
+        """
+        Parameters:
+        features (array-like): The (bars, features) input matrix, e.g. scaled indicators.
+        close (array-like): The close price of every bar, used for the labels.
+        window_size (int): The number of previous bars in each input window.
+        flatten (bool): Return each window as one (window_size * features) row, for Dense models.
+        num_classes (int): The width of the one-hot labels.
+        dtype (str): The dtype of the input batches.
+
+        Raises:
+        ValueError: If features and close differ in length or there are too few bars for one window.
+        """
+        self.features = np.ascontiguousarray(features, dtype=dtype)
+        close = np.asarray(close, dtype="float64")
+        if self.features.ndim != 2 or len(self.features) != len(close):
+            raise ValueError(f"Expected a 2-D feature matrix with one row per close, got {self.features.shape} "
+                             f"and {close.shape}")
+        if not 0 < window_size < len(close):
+            raise ValueError(f"Window size {window_size} needs between 1 and {len(close) - 1} bars")
+        self.window_size = window_size
+        self.flatten = flatten
+        self.num_classes = num_classes
+
+        # only windows followed by a bar have a label
+        self.windows = sliding_windows(self.features, window_size)[:len(close) - window_size]
+        self.labels = next_bar_labels(close, window_size)
+
+        # a window is usable when none of its rows has a missing feature (e.g. indicator warm-up)
+        # and both closes behind its label are known
+        bad_rows = ~np.isfinite(self.features).all(axis=1)
+        bad_counts = np.concatenate(([0], np.cumsum(bad_rows)))
+        window_clean = bad_counts[window_size:-1] == bad_counts[:len(close) - window_size]
+        finite_close = np.isfinite(close)
+        self.mask = window_clean & finite_close[window_size:] & finite_close[window_size - 1:-1]
+        self.indices = np.flatnonzero(self.mask)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    @property
+    def input_shape(self) -> Tuple[int, ...]:
+        width = self.features.shape[1]
+        return (self.window_size * width,) if self.flatten else (self.window_size, width)
+
+    def steps(self, batch_size: int) -> int:
+        """The number of batches in one pass over the dataset."""
+        return -(-len(self) // batch_size)
+
+    def batch(self, positions) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Materialize the windows at positions (indices into the usable windows).
+
+        Returns:
+        tuple: The inputs, (batch, window_size, features) or flattened, and the one-hot labels.
+        """
+        rows = self.indices[positions]
+        X = self.windows[rows]
+        if self.flatten:
+            X = X.reshape(len(rows), -1)
+        y = np.eye(self.num_classes, dtype=X.dtype)[self.labels[rows]]
+        return X, y
+
+    def iter_batches(self, batch_size: int, shuffle: bool = False,
+                     seed: Optional[int] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (X, y) batches covering the dataset once."""
+        order = np.arange(len(self))
+        if shuffle:
+            np.random.default_rng(seed).shuffle(order)
+        for offset in range(0, len(order), batch_size):
+            yield self.batch(order[offset:offset + batch_size])
+
+    def repeat_batches(self, batch_size: int, shuffle: bool = True,
+                       seed: Optional[int] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield batches forever, reshuffling every pass, for fit(..., steps_per_epoch=steps(batch_size))."""
+        rng = np.random.default_rng(seed)
+        while True:
+            yield from self.iter_batches(batch_size, shuffle, int(rng.integers(2 ** 32)) if shuffle else None)
+
+    def materialize(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Copy out every usable window at once, for small datasets or evaluation."""
+        return self.batch(slice(None))
@@ -0,0 +1,233 @@
+# benchmark_storage.py
+
+"""
+benchmark_storage.py
+
+Offline benchmarks for DataStorageManager. Runs against a locally started
+mongod when one is installed (or a server given with --uri), otherwise against
+an in-process mongomock stand-in, and measures insert, bulk insert, query and
+upsert throughput and latency across data sizes. The JSON report records the
+backend and environment so runs can be compared.
+
+    python benchmark_storage.py --sizes 1000 10000 100000 --output bench_report.json
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pymongo
+
+from DataStorageManager import DataStorageManager
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+DATABASE_NAME = "benchmark_db"
+COLLECTION_NAME = "bars"
+
+
+def make_universe(rows: int, symbols: int = 10, seed: int = 0) -> pd.DataFrame:
+    """Generate `rows` random daily bars spread evenly over `symbols` tickers."""
+    rng = np.random.default_rng(seed)
+    per_symbol = -(-rows // symbols)
+    frames = []
+    for number in range(symbols):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, per_symbol)))
+        frames.append(pd.DataFrame({
+            "symbol": f"SYM{number:04d}",
+            "date": pd.date_range("1990-01-01", periods=per_symbol, freq="D"),
+            "open": close * (1 + rng.normal(0, 0.002, per_symbol)),
+            "high": close * 1.01,
+            "low": close * 0.99,
+            "close": close,
+            "volume": rng.integers(1_000, 10_000_000, per_symbol).astype("float64"),
+        }))
+    return pd.concat(frames, ignore_index=True).iloc[:rows]
+
+
+@contextmanager
+def local_mongod():
+    """Start a throwaway mongod on a free port and yield its URI."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    db_path = tempfile.mkdtemp(prefix="mm_bench_")
+    process = subprocess.Popen(["mongod", "--dbpath", db_path, "--port", str(port), "--bind_ip", "127.0.0.1"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    uri = f"mongodb://127.0.0.1:{port}"
+    try:
+        client = pymongo.MongoClient(uri, serverSelectionTimeoutMS=20000)
+        client.admin.command("ping")
+        client.close()
+        yield uri
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        shutil.rmtree(db_path, ignore_errors=True)
+
+
+@contextmanager
+def open_storage(backend: str, uri: str = None):
+    """Yield (backend name, DataStorageManager) for the requested backend."""
+    if backend == "auto":
+        backend = "uri" if uri else ("mongod" if shutil.which("mongod") else "mongomock")
+
+    if backend not in ("uri", "mongod", "mongomock"):
+        raise ValueError(f"Invalid or unsupported backend: {backend}")
+    if backend == "mongomock" and mongomock is None:
+        raise ImportError("mongomock module not found. Please install it using 'pip install mongomock'")
+
+    # keep backups out of the working directory and log to the console only
+    with tempfile.TemporaryDirectory() as directory:
+        options = {"cache_bytes": 0, "backup_path": directory, "log_path": None}
+        if backend == "uri":
+            yield backend, DataStorageManager(DATABASE_NAME, host=uri, **options)
+        elif backend == "mongod":
+            with local_mongod() as local_uri:
+                yield backend, DataStorageManager(DATABASE_NAME, host=local_uri, **options)
+        else:
+            yield backend, DataStorageManager(DATABASE_NAME, client=mongomock.MongoClient(), **options)
+
+
+def latency_summary(latencies):
+    latencies = np.asarray(latencies) * 1000.0
+    return {
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "p99": float(np.percentile(latencies, 99)),
+        "max": float(latencies.max()),
+    }
+
+
+def timed(operation, size, documents, function, repeat=1):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+    seconds = float(np.median(latencies))
+    return {
+        "operation": operation,
+        "size": size,
+        "documents": documents,
+        "seconds": seconds,
+        "documents_per_second": documents / seconds if seconds > 0 else float("inf"),
+        "latency_ms": latency_summary(latencies),
+    }
+
+
+def benchmark_size(storage, size, single_inserts=500, query_repeat=20, batch_size=1000):
+    bars = make_universe(size)
+    symbol = bars["symbol"].iloc[0]
+    results = []
+    storage.drop_collection(COLLECTION_NAME)
+    storage.ensure_indexes()
+
+    # single-document inserts, timed one by one for their latency distribution
+    records = bars.iloc[:min(single_inserts, size)].to_dict("records")
+    latencies = []
+    for record in records:
+        start = time.perf_counter()
+        storage.insert_data("single_inserts", record)
+        latencies.append(time.perf_counter() - start)
+    storage.drop_collection("single_inserts")
+    results.append({"operation": "insert_data", "size": size, "documents": len(records),
+                    "seconds": float(sum(latencies)),
+                    "documents_per_second": len(records) / sum(latencies),
+                    "latency_ms": latency_summary(latencies)})
+
+    results.append(timed("bulk_insert_data", size, size,
+                         lambda: storage.bulk_insert_data(COLLECTION_NAME, bars, batch_size=batch_size)))
+
+    symbol_rows = int((bars["symbol"] == symbol).sum())
+    results.append(timed("query_data", size, symbol_rows,
+                         lambda: storage.query_data(COLLECTION_NAME, {"symbol": symbol}), query_repeat))
+    results.append(timed("query_frame", size, symbol_rows,
+                         lambda: storage.query_frame(COLLECTION_NAME, symbols=symbol), query_repeat))
+    results.append(timed("query_frame_universe", size, size,
+                         lambda: storage.query_frame(COLLECTION_NAME)))
+    results.append(timed("query_panel_universe", size, size,
+                         lambda: storage.query_panel(COLLECTION_NAME, symbols_per_partition=2)))
+
+    # a refresh where nothing changed, then one where every close is revised; bulk inserted bars have no
+    # content hash yet, so upsert them once untimed first
+    storage.upsert_bars(COLLECTION_NAME, bars, batch_size=batch_size)
+    results.append(timed("upsert_bars_unchanged", size, size,
+                         lambda: storage.upsert_bars(COLLECTION_NAME, bars, batch_size=batch_size)))
+    revised = bars.assign(close=bars["close"] * 1.001)
+    results.append(timed("upsert_bars_changed", size, size,
+                         lambda: storage.upsert_bars(COLLECTION_NAME, revised, batch_size=batch_size)))
+
+    storage.drop_collection(COLLECTION_NAME)
+    return results
+
+
+def run_benchmarks(backend="auto", uri=None, sizes=(1000, 10000), single_inserts=500, query_repeat=20,
+                   batch_size=1000):
+    """
+    Run the benchmark suite.
+
+    Parameters:
+    backend (str): "auto", "mongomock", "mongod" (start a local server) or "uri" (use `uri`).
+    uri (str): A MongoDB URI for the "uri" backend.
+    sizes (list[int]): The numbers of bars to benchmark with.
+    single_inserts (int): The number of documents inserted one at a time per size.
+    query_repeat (int): The number of times each single-symbol query is timed.
+    batch_size (int): The batch size for bulk inserts and upserts.
+
+    Returns:
+    dict: The report, with environment metadata and one result per operation and size.
+    """
+    with open_storage(backend, uri) as (backend_name, storage):
+        server_version = None
+        if backend_name != "mongomock":
+            server_version = storage.client.server_info().get("version")
+        results = []
+        for size in sizes:
+            results.extend(benchmark_size(storage, size, single_inserts, query_repeat, batch_size))
+
+    return {
+        "meta": {
+            "backend": backend_name,
+            "server_version": server_version,
+            "pymongo_version": pymongo.version,
+            "python_version": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.now(timezone.utc).isoformat(),
+            "sizes": list(sizes),
+            "batch_size": batch_size,
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark DataStorageManager operations.")
+    parser.add_argument("--backend", default="auto", choices=["auto", "mongomock", "mongod", "uri"])
+    parser.add_argument("--uri", help="MongoDB URI for the 'uri' backend")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--single-inserts", type=int, default=500)
+    parser.add_argument("--query-repeat", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.backend, args.uri, args.sizes, args.single_inserts, args.query_repeat,
+                            args.batch_size)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
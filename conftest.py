@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    # run against an in-process mongomock server and keep logs/backups out of the repo
+    mongomock = pytest.importorskip("mongomock")
+    import DataStorageManager as storage_module
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(storage_module, "MongoClient", mongomock.MongoClient)
+    monkeypatch.setattr(storage_module, "_clients", {})
+    monkeypatch.setattr(storage_module, "_indexed_databases", set())
+    monkeypatch.setattr(storage_module, "_caches", {})
+    return storage_module.DataStorageManager("test_db")
+
+
+@pytest.fixture
+def make_bars():
+    def make(symbol="AAPL", periods=10, start="2023-01-02"):
+        dates = pd.date_range(start, periods=periods, freq="D")
+        close = [100.0 + i for i in range(periods)]
+        return pd.DataFrame({
+            "symbol": symbol,
+            "open": close,
+            "high": [c + 1 for c in close],
+            "low": [c - 1 for c in close],
+            "close": close,
+            "volume": [1000 * (i + 1) for i in range(periods)],
+        }, index=dates)
+    return make
@@ -0,0 +1,72 @@
+import time
+
+import numpy as np
+import pytest
+
+from BacktestEngine import FLAT, LONG, SHORT, positions_from_signals, run_backtest
+from WindowDataset import next_bar_labels
+
+
+def loop_backtest(close, targets, initial_capital, commission, position_size):
+    # the reference: the same rules stepped bar by bar
+    equity, position, previous_target, curve = initial_capital, FLAT, FLAT, []
+    for t in range(len(close)):
+        bar_return = close[t] / close[t - 1] - 1 if t else 0.0
+        cost = abs(targets[t] - previous_target) * position_size * commission
+        equity *= 1 + position * position_size * bar_return - cost
+        curve.append(equity)
+        position = previous_target = targets[t]
+    return np.array(curve)
+
+
+def test_positions_from_signals_carry_holds():
+    signals = [2, 0, 2, 1, 2, 2, 0]
+    assert list(positions_from_signals(signals)) == [FLAT, LONG, LONG, SHORT, SHORT, SHORT, LONG]
+    assert list(positions_from_signals(signals, allow_short=False)) == [FLAT, LONG, LONG, FLAT, FLAT, FLAT, LONG]
+
+
+def test_training_labels_trade_in_their_direction():
+    # a model that predicts its training labels perfectly must go long before rises and short before falls
+    close = np.array([100.0, 101.0, 102.0, 102.0, 99.0, 98.0, 98.5])
+    labels = next_bar_labels(close, window_size=1)
+    targets = positions_from_signals(np.append(labels, 2))
+
+    assert list(targets[:-1]) == [LONG, LONG, LONG, SHORT, SHORT, LONG]
+    result = run_backtest(close, targets, commission=0.0)
+    assert (result.returns >= 0).all() and result.returns.sum() > 0
+
+
+def test_equity_matches_bar_by_bar_reference():
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 500)))
+    targets = positions_from_signals(rng.integers(0, 3, 500))
+
+    result = run_backtest(close, targets, initial_capital=50000, commission=0.002, position_size=0.5)
+    np.testing.assert_allclose(result.equity, loop_backtest(close, targets, 50000, 0.002, 0.5))
+    assert (result.positions[1:] == targets[:-1]).all(), "Expected positions to lag the signals by one bar"
+
+
+def test_trade_list_and_commission():
+    close = np.array([100.0, 110.0, 121.0, 110.0, 100.0, 100.0])
+    targets = np.array([LONG, LONG, SHORT, SHORT, FLAT, LONG])
+
+    result = run_backtest(close, targets, initial_capital=1000, commission=0.01, dates=np.arange(6))
+    trades = result.trades
+    assert list(trades["direction"]) == [LONG, SHORT, LONG]
+    assert list(trades["entry_index"]) == [0, 2, 5] and list(trades["exit_index"]) == [2, 4, 5]
+    assert list(trades["open"]) == [False, False, True]
+    assert trades["price_return"].iloc[0] == pytest.approx(0.21)
+    assert trades["net_return"].iloc[0] == pytest.approx(1.21 * 0.99 ** 2 - 1)
+    assert result.costs[2] == pytest.approx(0.02), "Expected a reversal to trade twice the position"
+    assert list(result.to_frame().columns) == ["equity", "returns", "position", "target", "cost"]
+
+
+def test_decades_of_bars_run_fast():
+    rng = np.random.default_rng(1)
+    bars = 252 * 50
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    targets = positions_from_signals(rng.integers(0, 3, bars))
+
+    start = time.perf_counter()
+    run_backtest(close, targets)
+    assert time.perf_counter() - start < 0.5
@@ -0,0 +1,86 @@
+import json
+from datetime import timedelta
+
+import pytest
+from bson import ObjectId
+
+from BackupManager import BackupError, BackupManager
+
+
+def test_incremental_backup_and_restore(storage):
+    storage.bulk_insert_data("trades", [{"symbol": "AAPL", "qty": i} for i in range(5)])
+    full = storage.backup_database()
+    storage.bulk_insert_data("trades", [{"symbol": "MSFT", "qty": i} for i in range(3)])
+    incremental = storage.backup_database(background=True).result()
+
+    assert not full["incremental"] and full["collections"]["trades"]["documents"] == 5
+    assert incremental["incremental"] and incremental["parent"] == full["backup_id"]
+    assert incremental["collections"]["trades"]["documents"] == 3, "Expected only the new documents"
+
+    storage.drop_collection("trades")
+    assert storage.restore_database() == 8
+    assert storage.db["trades"].count_documents({}) == 8
+
+
+def test_verify_detects_corruption(storage):
+    storage.insert_data("trades", {"symbol": "AAPL", "qty": 1})
+    manifest = storage.backup_database()
+    manager = storage.backup_manager
+    assert manager.verify(manifest["backup_id"])
+
+    path = f"{manager.database_path}/{manifest['backup_id']}/trades.bson.gz"
+    with open(path, "ab") as f:
+        f.write(b"corrupt")
+    with pytest.raises(BackupError):
+        manager.verify(manifest["backup_id"])
+    with pytest.raises(BackupError):
+        storage.restore_database()
+
+
+def test_incremental_backup_catches_out_of_order_inserts(storage):
+    storage.bulk_insert_data("trades", [{"symbol": "AAPL", "qty": i} for i in range(3)])
+    full = storage.backup_database()
+    newest = storage.db["trades"].find_one(sort=[("_id", -1)])["_id"]
+
+    # a concurrent writer's ObjectId can sort behind the ids the last backup already exported
+    late_id = ObjectId.from_datetime(newest.generation_time.replace(microsecond=0) - timedelta(seconds=2))
+    storage.insert_data("trades", {"_id": late_id, "symbol": "MSFT", "qty": 9})
+    storage.insert_data("trades", {"symbol": "MSFT", "qty": 10})
+    incremental = storage.backup_database()
+
+    assert full["collections"]["trades"]["documents"] == 3
+    assert incremental["collections"]["trades"]["documents"] == 2, "Expected only the two new documents"
+    storage.drop_collection("trades")
+    assert storage.restore_database() == 5
+
+
+def test_custom_high_water_field_is_indexed(storage):
+    BackupManager(storage.db, "backups", high_water_fields={"trades": "ingested_at"})
+    assert any(index["key"] == [("ingested_at", 1)] for index in storage.db["trades"].index_information().values())
+
+
+def test_overlap_ids_in_the_state_file_are_bounded(storage):
+    manager = BackupManager(storage.db, "bounded", max_recent_ids=2)
+    storage.bulk_insert_data("trades", [{"symbol": "AAPL", "qty": i} for i in range(5)])
+    manager.backup()
+
+    with open(f"{manager.database_path}/state.json") as f:
+        assert len(json.load(f)["recent_ids"]["trades"]) == 2, "Expected only the newest ids to be kept"
+    # the documents whose ids were dropped are exported again, and restoring them stays idempotent
+    assert manager.backup()["collections"]["trades"]["documents"] == 3
+    storage.drop_collection("trades")
+    manager.restore()
+    assert storage.db["trades"].count_documents({}) == 5
+
+
+def test_backups_of_one_database_share_a_lock(storage):
+    first = BackupManager(storage.db, "shared")
+    second = BackupManager(storage.db, "shared")
+    assert first.lock is second.lock
+    assert first.lock is not BackupManager(storage.db, "elsewhere").lock
+
+    # a backup started by one manager waits for the other's to finish
+    with first.lock:
+        pending = second.backup_in_background()
+        assert not pending.done()
+    assert pending.result(timeout=5)["collections"] is not None
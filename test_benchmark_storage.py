@@ -0,0 +1,16 @@
+import pytest
+
+pytest.importorskip("mongomock")
+
+from benchmark_storage import run_benchmarks
+
+
+def test_benchmark_report_on_mongomock(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    report = run_benchmarks("mongomock", sizes=[200], single_inserts=5, query_repeat=2)
+
+    assert report["meta"]["backend"] == "mongomock"
+    operations = {result["operation"] for result in report["results"]}
+    assert {"insert_data", "bulk_insert_data", "query_data", "query_frame", "upsert_bars_changed"} <= operations
+    assert all(result["documents_per_second"] > 0 for result in report["results"])
+    assert not (tmp_path / "database_backup").exists(), "Expected backups to stay out of the working directory"
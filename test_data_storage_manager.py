@@ -0,0 +1,288 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_bulk_insert_dataframe_in_batches(storage, make_bars):
+    stats = storage.bulk_insert_data("bars", make_bars(periods=25), batch_size=10)
+
+    assert [batch["documents"] for batch in stats] == [10, 10, 5], "Expected three batches of at most 10 documents"
+    assert all(batch["seconds"] >= 0 for batch in stats)
+
+    stored = storage.db["bars"].find_one({"close": 100.0})
+    assert stored["date"] == pd.Timestamp("2023-01-02"), "Expected the DatetimeIndex to be stored as a date field"
+    assert storage.db["bars"].count_documents({}) == 25
+
+
+def test_bulk_insert_records_iterable(storage):
+    records = ({"symbol": "MSFT", "price": float(i)} for i in range(7))
+    stats = storage.bulk_insert_data("prices", records, batch_size=3)
+
+    assert sum(batch["documents"] for batch in stats) == 7
+    assert storage.db["prices"].count_documents({"symbol": "MSFT"}) == 7
+
+
+def test_bulk_insert_rejects_invalid_batch_size(storage):
+    with pytest.raises(ValueError):
+        storage.bulk_insert_data("bars", [], batch_size=0)
+
+
+def test_bucketed_bars_round_trip(storage, make_bars):
+    bars = make_bars(periods=90, start="2023-01-01").drop(columns="symbol")
+    # write the history in two appends to exercise appending into an existing bucket
+    storage.insert_bars_bucketed("bars_monthly", "AAPL", bars.iloc[:40])
+    storage.insert_bars_bucketed("bars_monthly", "AAPL", bars.iloc[40:])
+
+    assert storage.db["bars_monthly"].count_documents({"symbol": "AAPL"}) == 3, "Expected one document per month"
+
+    columns = storage.query_bars_bucketed("bars_monthly", "AAPL")
+    assert columns["date"].dtype == "datetime64[ms]"
+    assert (columns["close"] == bars["close"].to_numpy()).all()
+    assert (columns["volume"] == bars["volume"].to_numpy()).all()
+
+
+def test_bucketed_bars_range_and_fields(storage, make_bars):
+    bars = make_bars(periods=90, start="2023-01-01").drop(columns="symbol")
+    storage.insert_bars_bucketed("bars_monthly", "AAPL", bars)
+
+    columns = storage.query_bars_bucketed("bars_monthly", "AAPL", start="2023-02-10", end="2023-02-12",
+                                          fields=["close"])
+    assert set(columns) == {"date", "close"}
+    assert list(columns["close"]) == list(bars.loc["2023-02-10":"2023-02-12", "close"])
+
+
+def test_bucketed_writes_merge_overlapping_and_out_of_order_bars(storage, make_bars):
+    bars = make_bars(periods=20, start="2023-01-01").drop(columns="symbol")
+    storage.insert_bars_bucketed("bars_monthly", "AAPL", bars.iloc[10:], fields=["close"])
+    # older bars arrive later, overlapping the stored ones and carrying a field the first write lacked
+    storage.insert_bars_bucketed("bars_monthly", "AAPL", bars.iloc[:15], fields=["close", "volume"])
+
+    columns = storage.query_bars_bucketed("bars_monthly", "AAPL")
+    assert list(columns["date"]) == list(bars.index.to_numpy(dtype="datetime64[ms]")), \
+        "Expected each date once, in order"
+    assert (columns["close"] == bars["close"].to_numpy()).all()
+    assert (columns["volume"][:15] == bars["volume"].to_numpy()[:15]).all()
+    assert np.isnan(columns["volume"][15:]).all(), "Expected bars without a volume to read back as NaN"
+
+
+def test_bucket_arrays_must_match_their_count(storage, make_bars):
+    storage.insert_bars_bucketed("bars_monthly", "AAPL", make_bars(periods=5).drop(columns="symbol"))
+    # a single value would otherwise be broadcast over the whole bucket
+    storage.db["bars_monthly"].update_one({"symbol": "AAPL"}, {"$set": {"volume": [1.0]}})
+
+    with pytest.raises(ValueError):
+        storage.query_bars_bucketed("bars_monthly", "AAPL")
+
+
+def test_indexes_created_idempotently(storage):
+    index_info = storage.db["bars"].index_information()
+    assert index_info["symbol_date"]["unique"], "Expected a unique (symbol, date) index on bars"
+
+    # running the startup step again must not fail or duplicate indexes
+    storage.ensure_indexes()
+    assert len(storage.db["bars"].index_information()) == len(index_info)
+
+
+def test_changed_index_definitions_are_applied(storage):
+    from pymongo import ASCENDING, IndexModel
+
+    from DataStorageManager import COLLECTION_INDEXES, DataStorageManager
+
+    indexes = dict(COLLECTION_INDEXES, bars=COLLECTION_INDEXES["bars"] + [IndexModel([("volume", ASCENDING)],
+                                                                                         name="volume")])
+    DataStorageManager("test_db", indexes=indexes)
+    assert "volume" in storage.db["bars"].index_information(), "Expected the new index definition to be created"
+
+
+def test_summarize_query_plan_flags_collection_scan(storage):
+    collscan = {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN", "filter": {"symbol": {"$eq": "AAPL"}}}},
+                "executionStats": {"totalDocsExamined": 5000, "totalKeysExamined": 0, "nReturned": 10}}
+    ixscan = {"queryPlanner": {"winningPlan": {"queryPlan": {
+        "stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "symbol_date"}}}}}
+
+    assert storage.summarize_query_plan(collscan)["collection_scan"]
+    assert storage.summarize_query_plan(collscan)["docs_examined"] == 5000
+    diagnostics = storage.summarize_query_plan(ixscan)
+    assert not diagnostics["collection_scan"]
+    assert diagnostics["indexes"] == ["symbol_date"]
+
+
+def test_query_frame_filters_and_projects(storage, make_bars):
+    storage.bulk_insert_data("bars", make_bars("AAPL", periods=20))
+    storage.bulk_insert_data("bars", make_bars("MSFT", periods=20))
+    storage.bulk_insert_data("bars", make_bars("GOOG", periods=20))
+
+    frame = storage.query_frame("bars", symbols=["AAPL", "MSFT"], start="2023-01-05", end="2023-01-09",
+                                fields=["close", "volume"], dtypes={"volume": "int64"}, batch_size=3)
+
+    assert list(frame.columns) == ["symbol", "date", "close", "volume"]
+    assert list(frame["symbol"]) == ["AAPL"] * 5 + ["MSFT"] * 5
+    assert frame["volume"].dtype == "int64"
+    assert list(frame["close"][:5]) == [103.0, 104.0, 105.0, 106.0, 107.0]
+
+
+def test_missing_integer_fields_are_masked(storage, make_bars):
+    storage.bulk_insert_data("bars", make_bars("AAPL", periods=4))
+    storage.db["bars"].update_one({"symbol": "AAPL", "date": pd.Timestamp("2023-01-03")}, {"$unset": {"volume": ""}})
+
+    frame = storage.query_frame("bars", symbols="AAPL", fields=["close", "volume"], dtypes={"volume": "int64"})
+    assert frame["volume"].dtype == "Int64"
+    assert frame["volume"].isna().tolist() == [False, True, False, False]
+    assert frame["volume"][2] == 3000
+
+    panel = storage.query_panel("bars", symbols=["AAPL"], fields=["volume"], dtypes={"volume": "int64"})
+    assert panel["volume"][:, 0].tolist() == [1000, 0, 3000, 4000]
+
+
+def test_iter_query_frames_bounds_chunk_size(storage, make_bars):
+    storage.bulk_insert_data("bars", make_bars("AAPL", periods=10))
+
+    chunks = list(storage.iter_query_frames("bars", symbols="AAPL", batch_size=4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert storage.query_frame("bars", symbols="TSLA").empty
+
+
+def test_query_panel_matches_serial_reads(storage, make_bars):
+    for number, symbol in enumerate(["AAPL", "MSFT", "GOOG", "TSLA", "AMZN"]):
+        storage.bulk_insert_data("bars", make_bars(symbol, periods=20 - 2 * number, start=f"2023-01-{2 + number:02d}"))
+
+    symbols = ["TSLA", "AAPL", "AMZN", "MSFT", "GOOG"]
+    panel = storage.query_panel("bars", symbols, start="2023-01-03", end="2023-01-18", fields=["close", "volume"],
+                                symbols_per_partition=2, time_partitions=3, max_workers=4)
+
+    frame = storage.query_frame("bars", symbols, start="2023-01-03", end="2023-01-18", fields=["close", "volume"])
+    expected = frame.pivot(index="date", columns="symbol", values="close")[symbols]
+    assert list(panel["symbols"]) == symbols, "Expected the panel columns in request order"
+    assert (panel["dates"] == expected.index.to_numpy(dtype="datetime64[ms]")).all()
+    assert panel["close"].shape == (len(expected), 5)
+    np.testing.assert_array_equal(panel["close"], expected.to_numpy())
+    assert np.isnan(panel["volume"][0, 0]), "Expected NaN before a symbol's first bar"
+
+
+def test_query_data_returns_documents(storage):
+    storage.insert_data("test_collection", {"symbol": "AAPL", "price": 100})
+    assert storage.query_data("test_collection", {"symbol": "AAPL"}, {"_id": 0}) == [{"symbol": "AAPL", "price": 100}]
+
+
+def test_instances_share_client_and_log_handlers(storage):
+    from DataStorageManager import DataStorageManager
+
+    handlers = list(storage.logger.handlers)
+    other = DataStorageManager("other_db")
+
+    assert other.client is storage.client, "Expected one pooled client per process"
+    assert other.logger.handlers == handlers, "Expected logger handlers to be attached only once"
+    assert DataStorageManager("test_db", client_options={"maxPoolSize": 5}).client is not storage.client
+
+
+def test_upsert_bars_skips_unchanged_rows(storage, make_bars):
+    first = storage.upsert_bars("bars", make_bars(periods=10))
+    assert first == {"inserted": 10, "updated": 0, "unchanged": 0}
+
+    # refetch an overlapping history: 9 identical bars, 1 revised bar and 5 new bars
+    refreshed = make_bars(periods=15).iloc[1:]
+    refreshed.loc["2023-01-05", "close"] = 150.0
+    refreshed["volume"] = refreshed["volume"].astype("float64")
+    second = storage.upsert_bars("bars", refreshed)
+
+    assert second == {"inserted": 5, "updated": 1, "unchanged": 8}
+    assert storage.db["bars"].count_documents({"symbol": "AAPL"}) == 15
+    assert storage.db["bars"].find_one({"date": pd.Timestamp("2023-01-05")})["close"] == 150.0
+
+
+def test_query_cache_hits_and_invalidation(storage, make_bars):
+    storage.bulk_insert_data("bars", make_bars("AAPL", periods=5))
+    storage.bulk_insert_data("bars", make_bars("MSFT", periods=5))
+    assert storage.cache is None, "Expected the query cache to be opt-in"
+    storage = type(storage)("test_db", cache_bytes=1 << 20)
+
+    first = storage.query_frame("bars", symbols="AAPL")
+    first.loc[0, "close"] = -1.0  # callers get a copy and cannot corrupt the cache
+    assert storage.query_frame("bars", symbols="AAPL")["close"][0] == 100.0
+    assert storage.query_data("bars", {"symbol": "MSFT"}, {"_id": 0, "close": 1})[0] == {"close": 100.0}
+
+    # a write to MSFT leaves the cached AAPL frame alone but drops the MSFT result
+    storage.update_data("bars", {"symbol": "MSFT", "close": 100.0}, {"close": 99.0})
+    assert storage.query_data("bars", {"symbol": "MSFT"}, {"_id": 0, "close": 1})[0] == {"close": 99.0}
+    storage.query_frame("bars", symbols="AAPL")
+
+    metrics = storage.cache_metrics()
+    assert metrics["hits"] == 2 and metrics["misses"] == 3
+    assert metrics["invalidations"] == 1
+
+
+def test_query_cache_is_invalidated_by_other_instances(storage, make_bars):
+    storage.bulk_insert_data("bars", make_bars("AAPL", periods=3))
+    reader = type(storage)("test_db", cache_bytes=1 << 20)
+    writer = type(storage)("test_db", cache_bytes=1 << 20)
+    assert reader.cache is writer.cache
+
+    assert len(reader.query_frame("bars", symbols="MSFT")) == 0
+    writer.upsert_bars("bars", make_bars("MSFT", periods=2))
+    assert len(reader.query_frame("bars", symbols="MSFT")) == 2
+
+    # moving a bar to another symbol invalidates the results of both symbols
+    assert len(reader.query_frame("bars", symbols="AAPL")) == 3
+    assert len(reader.query_frame("bars", symbols="GOOG")) == 0
+    writer.update_data("bars", {"symbol": "AAPL", "close": 100.0}, {"symbol": "GOOG"})
+    assert len(reader.query_frame("bars", symbols="GOOG")) == 1
+    assert len(reader.query_frame("bars", symbols="AAPL")) == 2
+
+
+def test_query_cache_refuses_results_read_across_a_write(storage, make_bars):
+    reader = type(storage)("test_db", cache_bytes=1 << 20)
+    read_chunks = reader.iter_query_frames
+
+    def racing_read(*args, **kwargs):
+        # the read finishes before a write lands, and the write lands before the result is cached
+        chunks = list(read_chunks(*args, **kwargs))
+        storage.upsert_bars("bars", make_bars("MSFT", periods=2))
+        return iter(chunks)
+
+    reader.iter_query_frames = racing_read
+    assert len(reader.query_frame("bars", symbols="MSFT")) == 0
+    del reader.iter_query_frames
+
+    assert len(reader.query_frame("bars", symbols="MSFT")) == 2, "Expected the stale result not to be cached"
+    assert reader.cache_metrics()["stale_puts"] == 1
+
+
+def test_query_cache_evicts_least_recently_used():
+    from QueryCache import QueryCache
+
+    cache = QueryCache(max_bytes=3000)
+    for key in "abc":
+        cache.put(key, b"x" * 900, "bars", [key])
+    cache.get("a")
+    cache.put("d", b"x" * 900, "bars", ["d"])
+
+    assert cache.get("b") is None, "Expected the least recently used entry to be evicted"
+    assert cache.get("a") is not None
+    assert cache.metrics()["evictions"] == 1
+
+
+def test_encoded_buckets_round_trip(storage, make_bars):
+    bars = make_bars(periods=90, start="2023-01-01").drop(columns="symbol")
+    storage.insert_bars_bucketed("bar_buckets", "AAPL", bars.iloc[:40], encoded=True)
+    storage.insert_bars_bucketed("bar_buckets", "AAPL", bars.iloc[40:], encoded=True)
+
+    stored = storage.db["bar_buckets"].find_one({"symbol": "AAPL", "bucket": "2023-02"})
+    assert stored["count"] == 28 and isinstance(stored["close"], bytes)
+
+    columns = storage.query_bars_bucketed("bar_buckets", "AAPL", start="2023-01-15")
+    expected = bars.loc["2023-01-15":]
+    assert (columns["date"] == expected.index.to_numpy()).all()
+    assert (columns["close"] == expected["close"].to_numpy()).all()
+    assert (columns["volume"] == expected["volume"].to_numpy()).all()
+
+
+def test_encoded_bucket_writes_keep_fields_they_do_not_cover(storage, make_bars):
+    bars = make_bars(periods=10, start="2023-01-01").drop(columns="symbol")
+    storage.insert_bars_bucketed("bar_buckets", "AAPL", bars, encoded=True)
+    revised = bars.iloc[5:][["close"]] * 2
+    storage.insert_bars_bucketed("bar_buckets", "AAPL", revised, encoded=True)
+
+    columns = storage.query_bars_bucketed("bar_buckets", "AAPL")
+    assert (columns["open"] == bars["open"].to_numpy()).all(), "Expected fields absent from the new bars kept"
+    assert (columns["volume"] == bars["volume"].to_numpy()).all()
+    assert (columns["close"] == np.concatenate([bars["close"][:5], revised["close"]])).all()
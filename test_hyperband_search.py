@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pytest
+
+from HyperbandSearch import budget_schedule, full_grid, hyperband, sample_candidates, successive_halving
+
+
+def noisy_quality(params, arrays):
+    # the true quality peaks at width 64 and learning rate 0.01; short budgets see a damped, noisy estimate
+    quality = -abs(np.log2(params["width"] / 64)) - abs(np.log10(params["learning_rate"] / 0.01))
+    noise = np.random.default_rng(params["width"] + params["epochs"]).normal(0, 0.05)
+    if params["width"] == 8:
+        raise RuntimeError("diverged")
+    return {"score": quality * (1 - 1 / (params["epochs"] + 1)) + noise / params["epochs"],
+            "offset": float(arrays["offset"][0])}
+
+
+def resumable_quality(params, arrays):
+    # the checkpoint records how many epochs the candidate has been trained on in total
+    previous = params.get("resume_from", 0)
+    assert previous == params.get("resumed_budget", 0), "Expected the checkpoint of the candidate's last rung"
+    return {"score": -abs(params["width"] - 64) * params["epochs"], "checkpoint": params["epochs"],
+            "trained": params["epochs"] - previous, "pid": os.getpid()}
+
+
+SPACE = {"width": [8, 16, 32, 64, 128, 256], "learning_rate": [0.1, 0.01, 0.001]}
+
+
+def test_budget_schedule():
+    assert budget_schedule(1, 27, 3) == [1, 3, 9, 27]
+    assert budget_schedule(2, 8, 2) == [2, 4, 8]
+    with pytest.raises(ValueError):
+        budget_schedule(5, 1, 3)
+
+
+def test_successive_halving_finds_the_winner_cheaply():
+    records = successive_halving(noisy_quality, full_grid(SPACE), {"offset": np.array([1.5])}, min_budget=1,
+                                 max_budget=9, eta=3, start_method="fork", max_workers=2)
+
+    finished = [record for record in records if record["epochs"] == 9]
+    best = max(finished, key=lambda record: record["score"])
+    assert (best["width"], best["learning_rate"]) == (64, 0.01)
+    assert sum(record["epochs"] for record in records) < 9 * len(full_grid(SPACE)) / 2, \
+        "Expected a fraction of the full-budget compute"
+    assert sum("error" in record for record in records) == 3, "Expected failed candidates to be dropped at rung 0"
+    assert all(record["offset"] == 1.5 for record in records if "error" not in record)
+
+
+def test_hyperband_brackets_and_sampling():
+    candidates = sample_candidates(SPACE, 5, np.random.default_rng(0))
+    assert len({tuple(sorted(params.items())) for params in candidates}) == 5
+    assert len(sample_candidates(SPACE, 100, np.random.default_rng(0))) == 18
+
+    records = hyperband(noisy_quality, SPACE, {"offset": np.array([0.0])}, min_budget=1, max_budget=9, eta=3,
+                        seed=1, start_method="fork", max_workers=2)
+    assert {record["bracket"] for record in records} == {0, 1, 2}
+    assert min(record["epochs"] for record in records if record["bracket"] == 0) == 9
+
+
+def test_promoted_candidates_resume_on_one_pool():
+    records = hyperband(resumable_quality, SPACE, None, min_budget=1, max_budget=9, eta=3, seed=2,
+                        start_method="fork", max_workers=1)
+
+    assert not any("error" in record for record in records)
+    promoted = [record for record in records if record["rung"] > 0]
+    assert promoted and all(record["trained"] == record["epochs"] - record["epochs"] // 3 for record in promoted), \
+        "Expected promoted candidates to train only on the budget they had not had yet"
+    assert len({record["pid"] for record in records}) == 1, "Expected every rung and bracket on the same worker"
+    assert not any("resume_from" in record for record in records)
@@ -0,0 +1,102 @@
+import threading
+
+import numpy as np
+import pytest
+
+from InferenceService import InferenceService
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, X):
+        self.calls.append(len(X))
+        return X.sum(axis=1, keepdims=True) * 2
+
+
+def test_concurrent_requests_share_forward_passes():
+    model = CountingModel()
+    with InferenceService(model, max_batch_size=64, max_latency=0.05) as service:
+        inputs = [np.full(3, number, dtype="float64") for number in range(200)]
+        results = [None] * len(inputs)
+
+        def worker(offset):
+            futures = [(index, service.submit(inputs[index])) for index in range(offset, len(inputs), 4)]
+            for index, future in futures:
+                results[index] = future.result(timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        metrics = service.metrics()
+
+    assert all(results[number][0] == number * 6 for number in range(200)), "Expected each caller to get its own row"
+    assert len(model.calls) < 200 / 4, "Expected requests to be combined into micro-batches"
+    assert max(model.calls) <= 64
+    assert metrics["requests"] == 200 and metrics["batches"] == len(model.calls)
+    assert sum(metrics["latency_ms"].values()) == 200
+    assert sum(size * count for size, count in metrics["batch_sizes"].items()) == 200
+    assert metrics["max_queue_depth"] > 0
+
+
+def test_model_errors_reach_every_caller_in_the_batch():
+    def broken(X):
+        raise RuntimeError("model failed")
+
+    with InferenceService(broken, max_latency=0.01) as service:
+        futures = [service.submit(np.zeros(2)) for _ in range(3)]
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result(timeout=5)
+        assert service.metrics()["errors"] == 3
+    with pytest.raises(RuntimeError):
+        service.submit(np.zeros(2))
+
+
+def test_requests_queued_behind_the_stop_marker_are_answered():
+    gate = threading.Event()
+    calls = []
+
+    def gated(X):
+        gate.wait()
+        calls.append(len(X))
+        return X * 2
+
+    service = InferenceService(gated, max_batch_size=8, max_latency=0.001)
+    first = service.submit(np.ones(1))
+    while service.queue_depth():
+        pass
+    # the stop marker reaches the queue while the worker is busy and before requests submitted at the same moment
+    service.requests.put(None)
+    late = [service.submit(np.ones(1)) for _ in range(3)]
+    gate.set()
+
+    assert first.result(timeout=5)[0] == 2
+    assert all(future.result(timeout=5)[0] == 2 for future in late), "Expected requests behind the marker answered"
+    assert calls == [1, 3], "Expected the drained requests to share one batch"
+    service.close(timeout=5)
+
+
+def test_cancelled_request_does_not_stop_the_service():
+    gate = threading.Event()
+
+    def gated(X):
+        gate.wait()
+        return X * 2
+
+    with InferenceService(gated, max_batch_size=1, max_latency=0.001) as service:
+        busy = service.submit(np.ones(1))
+        while service.queue_depth():
+            pass
+        # queued behind the busy batch, so it is still pending when its caller cancels it
+        cancelled = service.submit(np.ones(1))
+        assert cancelled.cancel()
+        gate.set()
+
+        assert busy.result(timeout=5)[0] == 2
+        assert service.predict(np.full(1, 3.0), timeout=5)[0] == 6, "Expected the service to keep answering"
+        assert service.thread.is_alive()
@@ -0,0 +1,85 @@
+import queue
+import threading
+
+import pytest
+
+from IngestBuffer import IngestBuffer
+
+
+class RecordingWriter:
+    def __init__(self, gate=None):
+        self.calls = []
+        self.gate = gate
+
+    def __call__(self, collection_name, records):
+        if self.gate is not None:
+            self.gate.wait()
+        self.calls.append((collection_name, list(records)))
+
+
+def test_group_commit_on_size_threshold(make_bars):
+    writer = RecordingWriter()
+    with IngestBuffer(writer, max_batch_size=10, flush_interval=60) as buffer:
+        buffer.put("bars", make_bars(periods=4))
+        buffer.put("bars", make_bars(periods=6))
+        buffer.put("signals", [{"symbol": "AAPL", "signal": 1}])
+        assert buffer.flush(timeout=5)
+
+    bars_calls = [records for name, records in writer.calls if name == "bars"]
+    assert [len(records) for records in bars_calls] == [10], "Expected one group commit for both puts"
+    assert "date" in bars_calls[0][0]
+    assert buffer.stats["records_written"] == 11
+
+
+def test_flushes_on_time_threshold():
+    writer = RecordingWriter()
+    buffer = IngestBuffer(writer, max_batch_size=1000, flush_interval=0.05)
+    buffer.put("signals", [{"symbol": "AAPL"}])
+    assert buffer.flush(timeout=5)
+    buffer.close()
+    assert writer.calls == [("signals", [{"symbol": "AAPL"}])]
+
+
+def test_backpressure_when_full():
+    gate = threading.Event()
+    buffer = IngestBuffer(RecordingWriter(gate), max_batch_size=2, flush_interval=60, max_pending=4)
+    buffer.put("bars", [{"i": 0}, {"i": 1}])  # flushed, writer blocks on the gate
+    buffer.put("bars", [{"i": 2}, {"i": 3}, {"i": 4}])
+    with pytest.raises(queue.Full):
+        buffer.put("bars", [{"i": 5}, {"i": 6}], timeout=0.05)
+
+    gate.set()
+    buffer.put("bars", [{"i": 5}, {"i": 6}], timeout=5)
+    buffer.close()
+    assert buffer.stats["records_written"] == 7
+
+
+def test_close_flushes_pending_records():
+    writer = RecordingWriter()
+    buffer = IngestBuffer(writer, max_batch_size=1000, flush_interval=60)
+    buffer.put("bars", [{"i": i} for i in range(3)])
+    buffer.close()
+
+    assert writer.calls == [("bars", [{"i": 0}, {"i": 1}, {"i": 2}])]
+    with pytest.raises(RuntimeError):
+        buffer.put("bars", [{"i": 3}])
+
+
+def test_retry_after_partial_write_does_not_duplicate_bars(storage, make_bars):
+    attempts = []
+
+    def flaky_upsert(collection_name, records):
+        # the first attempt lands half of the group commit, then fails
+        attempts.append(len(records))
+        if len(attempts) == 1:
+            storage.upsert_bars(collection_name, records[:len(records) // 2])
+            raise ConnectionError("connection reset")
+        storage.upsert_bars(collection_name, records)
+
+    buffer = IngestBuffer(flaky_upsert, max_batch_size=1000, flush_interval=60)
+    buffer.put("bars", make_bars(periods=6))
+    buffer.close()
+
+    assert attempts == [6, 6]
+    assert storage.db["bars"].count_documents({}) == 6
+    assert buffer.stats["records_written"] == 6 and buffer.stats["records_dropped"] == 0
@@ -20,3 +20,60 @@ def test_get_data():
 if __name__ == "__main__":
     test_get_data()
 
+
+
+YAHOO_CSV = """Date,Open,High,Low,Close,Adj Close,Volume
+2023-01-03,130.28,130.90,124.17,125.07,124.54,112117500
+2023-01-04,126.89,128.66,125.08,126.36,125.82,89113600
+"""
+
+
+def collector_frame(ticker, source):
+    # the frames get_data_from_yahoo and get_data_from_alpha_vantage return
+    import io
+
+    if source == "yahoo":
+        return pd.read_csv(io.StringIO(YAHOO_CSV), index_col="Date", parse_dates=True)
+    frame = pd.DataFrame({"2023-01-04": {"1. open": "126.89", "4. close": "126.36", "6. volume": "89113600"},
+                          "2023-01-05": {"1. open": "127.13", "4. close": "125.02", "6. volume": "80962700"}}).T
+    frame.index = pd.to_datetime(frame.index)
+    return frame
+
+
+class RecordingBuffer:
+    def __init__(self):
+        self.puts = []
+
+    def put(self, collection_name, records):
+        self.puts.append((collection_name, records))
+
+
+def test_get_data_stores_every_source_of_every_ticker(monkeypatch):
+    import MarketDataCollector
+
+    buffer = RecordingBuffer()
+    monkeypatch.setattr(MarketDataCollector, "get_data_from_source", collector_frame)
+    monkeypatch.setattr(MarketDataCollector, "ingest_buffer", buffer)
+    get_data(["AAPL", "MSFT"], ["yahoo", "alpha_vantage"])
+
+    stored = {records["symbol"].iloc[0]: records for _, records in buffer.puts}
+    assert sorted(stored) == ["AAPL", "MSFT"], "Expected the bars of every ticker to be stored"
+    for records in stored.values():
+        assert len(records) == 3, "Expected the bars of both sources"
+        assert records["close"].notna().all()
+
+
+def test_collected_bars_are_upserted_on_symbol_and_date(storage, monkeypatch):
+    import MarketDataCollector
+    from IngestBuffer import IngestBuffer
+
+    buffer = IngestBuffer(storage.upsert_bars, max_batch_size=1000, flush_interval=60, max_retries=0)
+    monkeypatch.setattr(MarketDataCollector, "get_data_from_source", collector_frame)
+    monkeypatch.setattr(MarketDataCollector, "ingest_buffer", buffer)
+    get_data(["AAPL"], ["yahoo", "alpha_vantage"])
+    get_data(["AAPL"], ["yahoo"])
+    buffer.close()
+
+    assert buffer.stats["records_dropped"] == 0, "Expected the upserts to accept collector frames"
+    assert storage.db["bars"].count_documents({"symbol": "AAPL"}) == 3, "Expected refetched bars not to duplicate"
+    assert storage.db["bars"].find_one({"date": pd.Timestamp("2023-01-05")}) is not None
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from MmapBarStore import MmapBarStore
+
+
+def test_append_and_read_views(tmp_path, make_bars):
+    store = MmapBarStore(str(tmp_path))
+    bars = make_bars(periods=30).drop(columns="symbol")
+    store.append("AAPL", bars.iloc[:20])
+    store.append("AAPL", bars.iloc[20:])
+
+    columns = store.read("AAPL")
+    assert isinstance(columns["close"].base, np.memmap), "Expected a view over the mapped file"
+    assert not columns["close"].flags.writeable
+    assert (columns["close"] == bars["close"].to_numpy()).all()
+    assert store.symbols() == ["AAPL"]
+
+
+def test_read_date_range(tmp_path, make_bars):
+    store = MmapBarStore(str(tmp_path))
+    bars = make_bars(periods=30).drop(columns="symbol")
+    store.append("AAPL", bars)
+
+    frame = store.read_frame("AAPL", start="2023-01-05", end="2023-01-07", fields=["close"])
+    assert list(frame.columns) == ["close"]
+    assert frame.equals(bars.loc["2023-01-05":"2023-01-07", ["close"]].rename_axis("date"))
+
+
+def test_append_rejects_overlapping_history(tmp_path, make_bars):
+    store = MmapBarStore(str(tmp_path))
+    bars = make_bars(periods=10).drop(columns="symbol")
+    store.append("AAPL", bars)
+
+    with pytest.raises(ValueError):
+        store.append("AAPL", bars.iloc[5:])
+    assert len(store.read("AAPL")["date"]) == 10
@@ -0,0 +1,67 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from ModelRegistry import ModelRegistry, model_key
+
+
+class PickledModel:
+    # stands in for a Keras model: anything with save(path) that the registry's loader can read back
+    def __init__(self, weights):
+        self.weights = weights
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+
+def load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def test_model_key_depends_on_config_and_data(make_bars):
+    bars = make_bars(periods=20)
+    config = {"hidden_layers": [32, 16], "learning_rate": 0.01}
+
+    assert model_key(config, bars) == model_key(dict(reversed(config.items())), bars.copy())
+    assert model_key(config, bars) != model_key({**config, "learning_rate": 0.001}, bars)
+    assert model_key(config, bars) != model_key(config, bars.assign(close=bars["close"] + 1e-9))
+    assert model_key(config, np.arange(3)) != model_key(config, np.arange(3.0))
+
+
+def test_registry_caches_loaded_models(tmp_path):
+    registry = ModelRegistry(str(tmp_path), max_models=2, loader=load_pickle)
+    for number in range(3):
+        registry.save(f"key{number}", PickledModel(number), {"loss": [1.0 / (number + 1)]})
+
+    assert registry.load("key2").weights == 2
+    assert registry.stats["hits"] == 1 and registry.stats["evictions"] == 1
+    assert registry.load("key0").weights == 0, "Expected an evicted model to be read back from disk"
+    assert registry.stats["loads"] == 1
+    assert registry.load("key0") is registry.load("key0")
+    assert registry.metadata("key1") == {"loss": [0.5]}
+    assert "key1" in registry and "missing" not in registry
+    with pytest.raises(KeyError):
+        registry.load("missing")
+    assert sorted(path.name for path in tmp_path.glob("*.h5")) == ["key0.h5", "key1.h5", "key2.h5"]
+
+
+def test_registry_keeps_fitted_artifacts(tmp_path):
+    registry = ModelRegistry(str(tmp_path), loader=load_pickle)
+    registry.save_artifact("key", "scaler", {"min": [0.0], "max": [2.0]})
+
+    assert registry.load_artifact("key", "scaler") == {"min": [0.0], "max": [2.0]}
+    with pytest.raises(KeyError):
+        registry.load_artifact("key", "encoder")
+
+
+def test_private_copies_leave_the_cached_model_untouched(tmp_path):
+    registry = ModelRegistry(str(tmp_path), loader=load_pickle)
+    registry.save("checkpoint", PickledModel(np.zeros(3)))
+
+    resumed = registry.load("checkpoint", cached=False)
+    resumed.weights += 1.0  # training the copy further
+    assert resumed is not registry.load("checkpoint")
+    assert (registry.load("checkpoint").weights == 0).all(), "Expected the checkpoint to keep its weights"
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from NumpyModel import NumpyDenseModel, export_dense_model
+
+
+class Dense:
+    # stands in for a trained Keras Dense layer
+    def __init__(self, kernel, bias, activation):
+        self.name = f"dense_{activation}"
+        self.weights = [kernel, bias]
+        self.activation = activation
+
+    def get_weights(self):
+        return self.weights
+
+    def get_config(self):
+        return {"activation": self.activation}
+
+
+class Dropout:
+    name = "dropout"
+
+
+class Model:
+    def __init__(self, layers):
+        self.layers = layers
+
+
+def test_exported_model_matches_reference_forward_pass(tmp_path):
+    rng = np.random.default_rng(0)
+    w1, b1 = rng.normal(size=(12, 8)), rng.normal(size=8)
+    w2, b2 = rng.normal(size=(8, 3)), rng.normal(size=3)
+    path = export_dense_model(Model([Dense(w1, b1, "relu"), Dropout(), Dense(w2, b2, "softmax")]),
+                              str(tmp_path / "model.npz"))
+
+    model = NumpyDenseModel.load(path)
+    X = rng.normal(size=(5, 12))
+    logits = np.maximum(X @ w1 + b1, 0) @ w2 + b2
+    expected = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+    np.testing.assert_allclose(model.predict(X), expected, rtol=1e-4, atol=1e-6)
+    np.testing.assert_allclose(model.predict_on_batch(X[0]), expected[0], rtol=1e-4, atol=1e-6)
+    assert model.input_shape == (None, 12)
+    assert model.predict(X).dtype == np.float32
+
+
+def test_export_rejects_unsupported_layers(tmp_path):
+    class Conv1D(Dropout):
+        name = "conv"
+
+    with pytest.raises(ValueError):
+        export_dense_model(Model([Conv1D()]), str(tmp_path / "model.npz"))
+    with pytest.raises(ValueError):
+        NumpyDenseModel([(np.ones((4, 2)), np.ones(2), "relu"), (np.ones((3, 1)), np.ones(1), "linear")])
@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ParallelSearch import SharedArrays, parallel_search, shared_frame
+
+
+def scaled_close_sum(params, arrays):
+    if params["scale"] < 0:
+        raise ValueError("negative scale")
+    frame = shared_frame(arrays)
+    return {"pid": os.getpid(), "total": float(frame["close"].sum() * params["scale"]),
+            "threads": os.environ["OMP_NUM_THREADS"], "writeable": arrays["close"].flags.writeable,
+            "first_date": frame.index[0], "zero_copy": np.shares_memory(frame["close"].to_numpy(), arrays["close"])}
+
+
+def test_parallel_search_shares_data_with_workers(make_bars):
+    bars = make_bars(periods=50).drop(columns="symbol")
+    grid = [{"scale": scale} for scale in (1, 2, 3, -1)]
+
+    with SharedArrays.from_frame(bars) as shared:
+        results = {params["scale"]: result
+                   for params, result in parallel_search(scaled_close_sum, grid, shared, max_workers=2,
+                                                         threads_per_worker=1)}
+        assert shared.blocks, "Expected shared memory the caller owns to stay open"
+
+    assert results[3]["total"] == pytest.approx(3 * bars["close"].sum())
+    assert results[1]["threads"] == "1"
+    assert not results[1]["writeable"], "Expected read-only views of the shared arrays"
+    assert results[1]["first_date"] == pd.Timestamp("2023-01-02")
+    assert results[1]["zero_copy"], "Expected the worker's frame to use the shared arrays without copying"
+    assert results[1]["pid"] != os.getpid()
+    assert isinstance(results[-1], ValueError), "Expected a failed grid point to be reported, not raised"
+
+
+def test_shared_arrays_reject_object_columns(make_bars):
+    with pytest.raises(ValueError):
+        SharedArrays.from_frame(make_bars(periods=5))
+    with SharedArrays({"values": np.arange(4.0)}) as shared:
+        assert shared.spec["values"][1] == (4,)
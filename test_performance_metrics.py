@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from PerformanceMetrics import MetricsAccumulator, compute_metrics
+
+
+def test_metrics_match_definitions():
+    returns = np.array([0.02, -0.01, 0.0, 0.03, -0.02, 0.01])
+    positions = np.array([1, 1, 0, -1, -1, 1])
+
+    metrics = compute_metrics(returns, positions)
+    equity = np.cumprod(1 + returns)
+    assert metrics["Total Return"] == pytest.approx(equity[-1] - 1)
+    assert metrics["Sharpe Ratio"] == pytest.approx(returns.mean() / returns.std(ddof=1) * np.sqrt(252))
+    downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2))
+    assert metrics["Sortino Ratio"] == pytest.approx(returns.mean() / downside * np.sqrt(252))
+    assert metrics["Max Drawdown"] == pytest.approx(np.max(1 - equity / np.maximum.accumulate(equity)))
+    assert metrics["Profit Factor"] == pytest.approx(0.06 / 0.03)
+    assert metrics["Win Rate"] == pytest.approx(3 / 5)
+    assert metrics["Exposure"] == pytest.approx(5 / 6)
+
+    assert compute_metrics([0.01, 0.02])["Profit Factor"] == np.inf
+    assert np.isnan(compute_metrics([])["Sharpe Ratio"])
+
+
+def test_accumulator_matches_batch_metrics_and_rolls():
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0.0005, 0.01, 300) * (rng.random(300) < 0.8)
+    positions = (returns != 0).astype(int)
+
+    accumulator = MetricsAccumulator()
+    for value, position in zip(returns, positions):
+        metrics = accumulator.update(value, position)
+    assert metrics == pytest.approx(compute_metrics(returns, positions))
+
+    rolling = MetricsAccumulator(window=50)
+    for value in returns:
+        metrics = rolling.update(value)
+    expected = compute_metrics(returns[-50:])
+    for name in ("Sharpe Ratio", "Sortino Ratio", "Profit Factor", "Win Rate", "Exposure"):
+        assert metrics[name] == pytest.approx(expected[name])
+    assert metrics["Max Drawdown"] == pytest.approx(compute_metrics(returns)["Max Drawdown"])
+
+
+def test_rolling_sharpe_keeps_precision_on_long_streams():
+    rng = np.random.default_rng(1)
+    # a large mean next to a tiny spread is where the sum of squares cancels catastrophically
+    returns = 0.5 + rng.normal(0.0, 1e-7, 20000)
+
+    rolling = MetricsAccumulator(window=100)
+    for value in returns:
+        metrics = rolling.update(value)
+    window = returns[-100:]
+    expected = window.mean() / window.std(ddof=1) * np.sqrt(252)
+    assert metrics["Sharpe Ratio"] == pytest.approx(expected, rel=1e-4)
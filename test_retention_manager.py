@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from RetentionManager import RetentionManager, RetentionTier, downsample_bars
+
+
+def minute_bars(symbol, start, periods, freq="min"):
+    dates = pd.date_range(start, periods=periods, freq=freq)
+    close = 100.0 + np.arange(periods, dtype="float64")
+    return pd.DataFrame({"symbol": symbol, "date": dates, "open": close - 0.5, "high": close + 1,
+                         "low": close - 1, "close": close, "volume": np.full(periods, 10.0)})
+
+
+def test_downsample_bars_aggregates_ohlcv():
+    hourly = downsample_bars(minute_bars("AAPL", "2023-01-02 09:00", 120), "1h")
+
+    assert list(hourly["date"]) == [pd.Timestamp("2023-01-02 09:00"), pd.Timestamp("2023-01-02 10:00")]
+    first = hourly.iloc[0]
+    assert (first["open"], first["high"], first["low"], first["close"]) == (99.5, 160.0, 99.0, 159.0)
+    assert first["volume"] == 600.0
+
+
+def test_roll_up_expire_and_route(storage):
+    tiers = [RetentionTier("bars_5min", "5min", retain="1D"), RetentionTier("bars_1h", "1h", retain="30D", archive=True),
+             RetentionTier("bars_1d", "1D")]
+    manager = RetentionManager(storage, tiers)
+    storage.bulk_insert_data("bars_5min", minute_bars("AAPL", "2023-01-02 00:00", 2 * 288 + 150, freq="5min"))
+
+    summary = manager.run_once(now="2023-01-04 12:30")
+    assert summary["bars_1h"]["rolled_up"] == 60, "Expected every complete hour to be rolled up"
+    assert summary["bars_1d"]["rolled_up"] == 2
+    assert storage.db["bars_5min"].find_one({"date": {"$lt": pd.Timestamp("2023-01-03 12:30")}}) is None
+    assert manager.run_once(now="2023-01-04 12:30")["bars_1h"]["rolled_up"] == 0, "Expected an incremental re-run"
+
+    daily = manager.query("AAPL", start="2023-01-02", end="2023-01-04 23:59", resolution="1D", fields=["close", "volume"])
+    assert list(daily["volume"]) == [2880.0, 2880.0, 1500.0], "Expected the unrolled day to come from finer tiers"
+    assert daily["close"].iloc[-1] == 100.0 + 2 * 288 + 149
+
+    hourly = manager.query("AAPL", start="2023-01-04 11:00", end="2023-01-04 13:00", resolution="1h", fields=["close"])
+    assert len(hourly) == 2
+
+
+def test_late_bars_are_rolled_up_within_the_allowance(storage):
+    manager = RetentionManager(storage, [RetentionTier("bars_5min", "5min"), RetentionTier("bars_1h", "1h")],
+                               lateness="1h")
+    storage.bulk_insert_data("bars_5min", minute_bars("AAPL", "2023-01-02 09:00", 36, freq="5min"))
+    assert manager.run_once(now="2023-01-02 12:10")["bars_1h"]["rolled_up"] == 3
+
+    # a bar for an hour already rolled up arrives after the run
+    storage.bulk_insert_data("bars_5min", minute_bars("MSFT", "2023-01-02 11:30", 1, freq="5min"))
+    assert manager.run_once(now="2023-01-02 12:10")["bars_1h"]["rolled_up"] == 1
+    late = storage.db["bars_1h"].find_one({"symbol": "MSFT"})
+    assert late is not None and late["date"] == pd.Timestamp("2023-01-02 11:00")
+
+
+def test_archiving_again_after_a_failed_delete_adds_no_duplicates(storage, monkeypatch):
+    manager = RetentionManager(storage, [RetentionTier("bars_5min", "5min", retain="1h", archive=True),
+                                         RetentionTier("bars_1h", "1h")], lateness="0s")
+    storage.bulk_insert_data("bars_5min", minute_bars("AAPL", "2023-01-02 09:00", 36, freq="5min"))
+    delete_data = storage.delete_data
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("crashed before the delete")
+
+    monkeypatch.setattr(storage, "delete_data", crash)
+    with pytest.raises(RuntimeError):
+        manager.run_once(now="2023-01-02 12:10")
+    monkeypatch.setattr(storage, "delete_data", delete_data)
+    summary = manager.run_once(now="2023-01-02 12:10")
+
+    archive = storage.db["bars_5min_archive"]
+    assert summary["bars_5min"]["expired"] == 26
+    assert archive.count_documents({}) == 26, "Expected each expired bar archived once"
+    assert len(archive.distinct("date")) == 26
+
+
+def test_bars_inserted_while_archiving_are_not_deleted(storage, monkeypatch):
+    manager = RetentionManager(storage, [RetentionTier("bars_5min", "5min", retain="1h", archive=True),
+                                         RetentionTier("bars_1h", "1h")], lateness="0s")
+    storage.bulk_insert_data("bars_5min", minute_bars("AAPL", "2023-01-02 09:00", 36, freq="5min"))
+    upsert_bars = storage.upsert_bars
+
+    def upsert_then_insert(collection_name, bars, **options):
+        stats = upsert_bars(collection_name, bars, **options)
+        if collection_name == "bars_5min_archive":
+            # a late bar behind the expiry cutoff lands between the archive and the delete
+            storage.insert_data("bars_5min", minute_bars("MSFT", "2023-01-02 09:00", 1).iloc[0].to_dict())
+        return stats
+
+    monkeypatch.setattr(storage, "upsert_bars", upsert_then_insert)
+    assert manager.run_once(now="2023-01-02 12:10")["bars_5min"]["expired"] == 26
+    assert storage.db["bars_5min"].find_one({"symbol": "MSFT"}) is not None, "Expected the unarchived bar to be kept"
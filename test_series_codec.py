@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import SeriesCodec
+
+
+def test_price_round_trip_keeps_missing_values():
+    prices = np.array([101.25, 101.5, np.nan, 99.0001, 1e6, 0.0])
+    decoded = SeriesCodec.decode(SeriesCodec.encode_prices(prices, decimals=4))
+    np.testing.assert_allclose(decoded, prices, atol=1e-9)
+    assert np.isnan(decoded[2])
+
+
+def test_integer_and_date_round_trip():
+    volumes = np.array([0, 5, -3, 2 ** 62, 7], dtype="int64")
+    assert (SeriesCodec.decode(SeriesCodec.encode_integers(volumes)) == volumes).all()
+
+    dates = pd.bdate_range("2000-01-03", periods=5000).to_numpy()
+    encoded = SeriesCodec.encode_dates(dates)
+    assert (SeriesCodec.decode(encoded) == dates).all()
+    assert len(encoded) < 200, "Expected an evenly spaced calendar to compress to almost nothing"
+
+
+def test_codec_report():
+    rng = np.random.default_rng(0)
+    close = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.01, 10000))), 2)
+    report = SeriesCodec.codec_report({"close": close, "volume": rng.integers(0, 10 ** 6, 10000)})
+
+    assert report["close"]["compression_ratio"] > 2
+    assert report["close"]["max_abs_error"] < 1e-9
+    assert report["volume"]["decode_values_per_second"] > 0
+
+
+def test_out_of_range_values_raise():
+    with pytest.raises(ValueError):
+        SeriesCodec.encode_prices([100.0, 1e15], decimals=4)
+    with pytest.raises(ValueError):
+        SeriesCodec.encode_prices([np.inf])
+    with pytest.raises(ValueError):
+        SeriesCodec.encode_integers(np.array([0.0, 1e19]))
+
+    prices = np.array([-9e14, 9e14])
+    np.testing.assert_array_equal(SeriesCodec.decode(SeriesCodec.encode_prices(prices, decimals=4)), prices)
@@ -0,0 +1,76 @@
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from StorageBackends import MongoBackend, ParquetBackend, StorageBackend
+
+
+def make_history(make_bars):
+    return pd.concat([
+        make_bars("AAPL", periods=400, start="2022-06-01"),
+        make_bars("MSFT", periods=400, start="2022-06-01"),
+    ])
+
+
+def test_parquet_backend_partitions_by_symbol_and_year(tmp_path, make_bars):
+    backend = ParquetBackend(str(tmp_path))
+    assert backend.insert("bars", make_history(make_bars)) == 800
+
+    assert sorted(os.listdir(tmp_path / "bars")) == ["symbol=AAPL", "symbol=MSFT"]
+    assert sorted(os.listdir(tmp_path / "bars" / "symbol=AAPL")) == ["year=2022", "year=2023"]
+
+
+def test_parquet_backend_prunes_partitions_and_columns(tmp_path, make_bars):
+    backend = ParquetBackend(str(tmp_path))
+    backend.insert("bars", make_history(make_bars))
+
+    assert len(backend._partition_files("bars", "AAPL", "2023-02-01", "2023-03-01")) == 1
+    frame = backend.query("bars", symbols="AAPL", start="2023-02-01", end="2023-02-05", fields=["close"])
+    assert list(frame.columns) == ["symbol", "date", "close"]
+    assert len(frame) == 5
+    assert backend.query("bars", symbols="TSLA").empty
+
+
+def test_backends_return_the_same_frame(tmp_path, storage, make_bars):
+    history = make_history(make_bars)
+    parquet, mongo = ParquetBackend(str(tmp_path / "store")), MongoBackend(storage)
+    parquet.insert("bars", history)
+    mongo.insert("bars", history)
+
+    query = dict(symbols=["MSFT", "AAPL"], start="2022-12-20", end="2023-01-10", fields=["close", "volume"])
+    pd.testing.assert_frame_equal(parquet.query("bars", **query), mongo.query("bars", **query))
+
+
+def test_backends_keep_the_stored_bar_on_overlapping_inserts(tmp_path, storage, make_bars):
+    from pymongo.errors import BulkWriteError
+
+    history = make_history(make_bars)
+    parquet, mongo = ParquetBackend(str(tmp_path / "store")), MongoBackend(storage)
+    parquet.insert("bars", history)
+    mongo.insert("bars", history)
+
+    # a refetch overlapping the stored bars, with revised values, plus 10 new bars
+    refetch = make_bars("AAPL", periods=30, start="2023-06-16").assign(close=-1.0)
+    assert parquet.insert("bars", refetch) == 10
+    with pytest.raises(BulkWriteError):
+        mongo.insert("bars", refetch)
+
+    query = dict(symbols="AAPL", start="2023-06-01", end="2023-08-01", fields=["close"])
+    frame = parquet.query("bars", **query)
+    assert frame["date"].is_unique and len(frame) == 45
+    assert (frame["close"] == -1.0).sum() == 10, "Expected the stored bars to be kept"
+    pd.testing.assert_frame_equal(frame, mongo.query("bars", **query))
+
+
+def test_storage_backend_is_abstract():
+    class InsertOnly(StorageBackend):
+        def insert(self, collection_name, data):
+            return 0
+
+    with pytest.raises(TypeError):
+        StorageBackend()
+    with pytest.raises(TypeError):
+        InsertOnly()
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("keras")
+pytest.importorskip("talib")
+
+from ModelRegistry import ModelRegistry
+from StrategyCreator import StrategyCreator
+
+
+def test_resuming_training_leaves_the_checkpoint_untouched(tmp_path):
+    dates = pd.date_range("2023-01-02", periods=60, freq="D")
+    close = 100.0 + np.cumsum(np.random.default_rng(0).normal(0, 1, 60))
+    strategy = StrategyCreator(pd.DataFrame({"Close": close}, index=dates), registry=ModelRegistry(str(tmp_path)))
+    strategy.adp.get_indicators = lambda frame: frame[["Close"]]
+    strategy.create_model(input_dim=5, output_dim=3, hidden_layers=[4], activation="relu", dropout_rate=0,
+                          learning_rate=0.01)
+    strategy.train_model("2023-01-02", "2023-03-02", window_size=5, batch_size=8, epochs=1)
+    checkpoint = strategy.model_key
+    weights = [values.copy() for values in strategy.registry.load(checkpoint).get_weights()]
+
+    strategy.train_model("2023-01-02", "2023-03-02", window_size=5, batch_size=8, epochs=3, resume_from=checkpoint)
+
+    assert strategy.model_key != checkpoint
+    assert len(strategy.registry.metadata(strategy.model_key)["loss"]) == 3
+    reloaded = strategy.registry.load(checkpoint).get_weights()
+    assert all(np.array_equal(before, after) for before, after in zip(weights, reloaded)), \
+        "Expected the checkpoint to keep the weights it was saved with"
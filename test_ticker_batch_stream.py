@@ -0,0 +1,44 @@
+from itertools import islice
+
+import numpy as np
+import pytest
+
+from BacktestEngine import SIGNAL_BUY
+from TickerBatchStream import TickerBatchStream
+
+
+def make_loader(lengths):
+    # each ticker's features encode the ticker number, so batches show where windows came from
+    def load(ticker):
+        number = int(ticker[1:])
+        bars = lengths[number]
+        features = np.column_stack([np.full(bars, number, dtype="float64"), np.arange(bars, dtype="float64")])
+        return features, np.arange(bars, dtype="float64")
+    return load
+
+
+def test_stream_mixes_tickers_in_full_batches():
+    lengths = [30, 25, 40, 3, 35, 28]  # T3 is too short for a window and is skipped
+    tickers = [f"T{number}" for number in range(len(lengths))]
+    stream = TickerBatchStream(tickers, make_loader(lengths), window_size=5, batch_size=16,
+                               shards_in_memory=2, workers=2, prefetch=2, seed=0)
+
+    assert stream.count_windows() == sum(bars - 5 for bars in lengths if bars > 5)
+    steps = stream.steps_per_epoch()
+    with stream:
+        batches = list(islice(iter(stream), steps * 2))
+
+    assert all(X.shape == (16, 5, 2) and y.shape == (16, 3) for X, y in batches), "Expected only full batches"
+    seen = set(np.concatenate([X[:, 0, 0] for X, _ in batches]).astype(int))
+    assert seen == {0, 1, 2, 4, 5}
+    assert all(y[:, SIGNAL_BUY].sum() == 16 for _, y in batches), "Expected rising closes to label every window buy"
+    assert not stream.threads, "Expected the worker threads to stop"
+
+
+def test_loader_errors_reach_the_consumer():
+    def load(ticker):
+        raise OSError(f"cannot read {ticker}")
+
+    stream = TickerBatchStream(["AAPL"], load, window_size=5, batch_size=4, workers=1)
+    with pytest.raises(OSError):
+        next(iter(stream))
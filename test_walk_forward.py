@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from PerformanceMetrics import compute_metrics
+from WalkForward import aggregate_folds, walk_forward_folds
+
+
+def test_rolling_and_anchored_folds(make_bars):
+    index = make_bars(periods=10).index
+
+    rolling = walk_forward_folds(index, train_size=4, test_size=2)
+    assert [fold["fold"] for fold in rolling] == [0, 1, 2]
+    assert [(fold["train_start"], fold["test_start"], fold["test_end"]) for fold in rolling] == [
+        (index[0], index[4], index[5]), (index[2], index[6], index[7]), (index[4], index[8], index[9])]
+    assert all(fold["train_end"] < fold["test_start"] for fold in rolling)
+    assert [fold["context_start"] for fold in rolling] == [fold["train_start"] for fold in rolling]
+    with_context = walk_forward_folds(index, train_size=4, test_size=2, context_size=1)
+    assert [fold["context_start"] for fold in with_context] == [index[3], index[5], index[7]]
+
+    anchored = walk_forward_folds(index, train_size=4, test_size=3, step=2, anchored=True)
+    assert [fold["train_start"] for fold in anchored] == [index[0]] * 2
+    assert [fold["train_end"] for fold in anchored] == [index[3], index[5]]
+
+    with pytest.raises(ValueError):
+        walk_forward_folds(index, train_size=8, test_size=3)
+
+
+def test_aggregate_folds_scores_each_fold_and_the_chain():
+    results = [{"fold": 1, "returns": np.array([0.1, -0.5])}, {"fold": 0, "returns": np.array([0.0, 0.1])}]
+
+    frame = aggregate_folds(results, {"Bars": len, "Max Drawdown": lambda r: compute_metrics(r)["Max Drawdown"]})
+    assert list(frame["fold"]) == [0, 1, "All Folds"]
+    assert list(frame["Bars"]) == [2, 2, 4]
+    assert frame["Max Drawdown"].tolist() == pytest.approx([0.0, 0.5, 0.5])
+
+    assert aggregate_folds(results)["Win Rate"].tolist() == pytest.approx([1.0, 0.5, 2 / 3])
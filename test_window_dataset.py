@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from WindowDataset import WindowDataset, sliding_windows
+
+
+def loop_windows(features, close, window_size):
+    # the reference: the loop train_model used before the strided builder
+    X, y = [], []
+    for i in range(window_size, len(features)):
+        X.append(features[i - window_size:i])
+        y.append(0 if close[i] > close[i - 1] else 1 if close[i] < close[i - 1] else 2)
+    return np.array(X), np.eye(3)[np.array(y)]
+
+
+def test_windows_match_loop_and_share_memory():
+    rng = np.random.default_rng(0)
+    features = rng.random((50, 4))
+    close = 100 + np.cumsum(rng.normal(size=50))
+
+    dataset = WindowDataset(features, close, window_size=5, dtype="float64")
+    X, y = dataset.materialize()
+    expected_X, expected_y = loop_windows(features, close, 5)
+
+    assert np.shares_memory(dataset.windows, dataset.features), "Expected the windows to be a view"
+    np.testing.assert_array_equal(X, expected_X)
+    np.testing.assert_array_equal(y, expected_y)
+
+    flat = WindowDataset(features, close, window_size=5, flatten=True, dtype="float64")
+    assert flat.input_shape == (20,)
+    np.testing.assert_array_equal(flat.materialize()[0], expected_X.reshape(len(expected_X), -1))
+
+
+def test_mask_drops_windows_with_missing_values():
+    features = np.arange(40, dtype="float64").reshape(20, 2)
+    features[:3, 0] = np.nan  # indicator warm-up
+    close = np.arange(20, dtype="float64")
+
+    dataset = WindowDataset(features, close, window_size=4)
+    assert len(dataset) == 20 - 4 - 3, "Expected windows touching the first three rows to be masked"
+    assert not np.isnan(dataset.materialize()[0]).any()
+
+
+def test_batches_cover_dataset_once():
+    dataset = WindowDataset(np.random.default_rng(1).random((30, 3)), np.arange(30.0), window_size=4)
+    batches = list(dataset.iter_batches(batch_size=8, shuffle=True, seed=3))
+
+    assert [len(X) for X, _ in batches] == [8, 8, 8, 2]
+    assert dataset.steps(8) == 4
+    assert sliding_windows(dataset.features, 4).shape == (27, 4, 3)
+    with pytest.raises(ValueError):
+        WindowDataset(np.zeros((3, 2)), np.zeros(3), window_size=3)